@@ -0,0 +1,505 @@
+# backend/accounting_engine/importer.py
+"""
+XYLO — Streaming Transaction Importer
+
+Imports bank / ledger CSV exports into the transactions table without loading
+the file into memory:
+- Reads rows incrementally from a path, binary stream or text stream
+- Fast-path ISO date parsing (bank exports repeat the same few dates)
+- Inserts in configurable batches with executemany, one DB transaction per batch
+- Reports progress and per-row errors (with CSV line numbers)
+- Optionally journal-posts every imported row in bulk through the rules engine
+- Skips rows already in the ledger via a fingerprint unique index, checked in
+  bulk per batch (overlapping monthly exports re-import cleanly); identical
+  rows close together in one file are numbered, so genuine repeats are kept
+- Optional parallel mode: a process pool parses line-aligned chunks of a large
+  file while a single writer inserts them in order
+- Parsed invoice batches (invoice_parser.parse_invoices) go through the same
+  batched, deduplicated, bulk-posting writer via import_invoices
+
+Memory stays flat regardless of file size: only one batch of rows and a bounded
+list of error samples are held at a time.
+
+Expected CSV headers: date,description,amount,currency,source,reference
+"""
+
+import csv
+import io
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date as _date
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+import backend.accounting_engine.stubs as acct
+import backend.accounting_engine.rules as rules
+
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_ERROR_SAMPLES = 1000
+
+# Accepted non-ISO date layouts (tried in order after the fast path)
+_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+
+# Memoised date strings -> ISO dates (cleared when it reaches the limit)
+_DATE_CACHE: Dict[str, str] = {}
+_DATE_CACHE_LIMIT = 4096
+
+
+# ------------------------------------------------------------
+# Parsing Helpers
+# ------------------------------------------------------------
+def parse_date(value: str) -> str:
+    """
+    Normalise a CSV date cell to an ISO date string (YYYY-MM-DD).
+    Fast path: plain ISO dates/datetimes go through the C-level fromisoformat,
+    and results are memoised since statements repeat the same dates.
+    """
+    hit = _DATE_CACHE.get(value)
+    if hit is not None:
+        return hit
+
+    text = value.strip()
+    try:
+        if len(text) == 10 and text[4] == "-":
+            iso = _date.fromisoformat(text).isoformat()
+        else:
+            iso = datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        for fmt in _DATE_FORMATS:
+            try:
+                iso = datetime.strptime(text, fmt).date().isoformat()
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Unrecognised date '{value}'")
+
+    if len(_DATE_CACHE) >= _DATE_CACHE_LIMIT:
+        _DATE_CACHE.clear()
+    _DATE_CACHE[value] = iso
+    return iso
+
+
+def _open_text(source: Union[str, bytes, IO], encoding: str) -> IO[str]:
+    """
+    Returns a text stream suitable for csv.reader over a path, bytes, or file object.
+    """
+    if isinstance(source, str):
+        return open(source, "r", encoding=encoding, newline="")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding=encoding, newline="")
+
+
+# ------------------------------------------------------------
+# Row Normalisation
+# ------------------------------------------------------------
+def make_row_normalizer(
+    header: List[str],
+    user_id: Optional[str],
+    default_source: str = "csv_import",
+    fingerprint_fields: Optional[tuple] = None,
+) -> Callable[[List[str]], tuple]:
+    """
+    Builds a function mapping a raw CSV record to a transactions insert tuple
+    in acct.TX_COLUMNS order. Column positions are resolved once from the header
+    instead of per row. When 'fingerprint_fields' is given the dedupe fingerprint
+    is filled in, otherwise it is None. Raises ValueError for malformed rows.
+    """
+    index = {name.strip().lower(): i for i, name in enumerate(header)}
+
+    def col(name):
+        i = index.get(name)
+        return (lambda rec: rec[i] if i < len(rec) else "") if i is not None else (lambda rec: "")
+
+    get_date = col("date")
+    get_amount = col("amount")
+    get_desc = col("description")
+    get_currency = col("currency")
+    get_source = col("source")
+    get_ref = col("reference")
+    row_user = col("user_id") if user_id is None else (lambda rec: user_id)
+    today = datetime.utcnow().date().isoformat()
+    created_at = datetime.utcnow().isoformat()
+
+    def normalize(rec: List[str]) -> tuple:
+        date_str = get_date(rec)
+        amount_str = get_amount(rec).strip()
+        try:
+            amount = float(amount_str.replace(",", "")) if amount_str else 0.0
+        except ValueError:
+            raise ValueError(f"Invalid amount '{amount_str}'")
+        row = (
+            str(uuid.uuid4()),
+            row_user(rec) or None,
+            get_source(rec) or default_source,
+            get_ref(rec) or None,
+            parse_date(date_str) if date_str else today,
+            amount,
+            get_currency(rec) or "INR",
+            get_desc(rec),
+            created_at,
+            None,
+        )
+        if fingerprint_fields:
+            row = row[:-1] + (acct.transaction_fingerprint(row, fingerprint_fields),)
+        return row
+
+    return normalize
+
+
+def _posting_engine(post: bool, engine: Optional[rules.RuleEngine]) -> Optional[rules.RuleEngine]:
+    if not post:
+        return None
+    return engine or rules.get_default_engine()
+
+
+# ------------------------------------------------------------
+# Batch Writer (shared by streaming and parallel imports)
+# ------------------------------------------------------------
+class _BatchWriter:
+    """
+    Buffers normalised rows and writes them with one executemany + commit per batch.
+    With dedupe on, duplicates are dropped per batch: within the batch by fingerprint,
+    and against the ledger with a single bulk lookup on the unique fingerprint index.
+    With number_repeats (one writer per CSV file) the nth identical row gets its own
+    fingerprint, so real repeats are kept and a re-import still matches. Repeats are
+    counted over the current and previous batch only (same-day rows sit together in
+    a statement); an identical row further back is treated as a duplicate.
+    Only rows actually inserted are posted and reported in created_transactions.
+    Keeps the running import summary (counts, skipped duplicates, bounded error samples).
+    """
+
+    def __init__(self, conn, batch_size: int, progress=None, collect_ids: bool = False, dedupe: bool = False,
+                 engine=None, number_repeats: bool = False):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.progress = progress
+        self.dedupe = dedupe
+        self.engine = engine
+        # fingerprint -> times seen, for the current and the previous batch
+        self.seen: Optional[Dict[str, int]] = {} if dedupe and number_repeats else None
+        self.seen_before: Dict[str, int] = {}
+        self.batch: List[tuple] = []
+        self.summary: Dict[str, Any] = {"rows": 0, "count": 0, "duplicates": 0, "error_count": 0, "errors": []}
+        if engine is not None:
+            self.summary["posted"] = 0
+        if collect_ids:
+            self.summary["created_transactions"] = []
+
+    def add(self, row: tuple):
+        self.summary["rows"] += 1
+        if self.seen is not None:
+            fp = row[-1]
+            n = self.seen.get(fp, self.seen_before.get(fp, 0))
+            self.seen[fp] = n + 1
+            if n:
+                row = row[:-1] + (acct.repeat_fingerprint(fp, n),)
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def error(self, where, message: str, key: str = "line"):
+        self.summary["rows"] += 1
+        self.summary["error_count"] += 1
+        if len(self.summary["errors"]) < MAX_ERROR_SAMPLES:
+            self.summary["errors"].append({key: where, "error": message})
+
+    def flush(self):
+        if not self.batch:
+            return
+        rows = self.batch
+        if self.dedupe:
+            rows = self._drop_duplicates(rows)
+        # OR IGNORE still guards against a concurrent import inserting the same rows
+        inserted = acct.insert_transactions(self.conn, rows, ignore_duplicates=self.dedupe)
+        if inserted < len(rows):
+            # a concurrent import won some fingerprints: keep only the rows stored under our ids
+            stored = acct.stored_transaction_ids(self.conn, [r[0] for r in rows])
+            rows = [r for r in rows if r[0] in stored]
+        if self.engine is not None:
+            self.summary["posted"] += self._post(rows)
+        self.conn.commit()
+        self.summary["count"] += inserted
+        self.summary["duplicates"] += len(self.batch) - inserted
+        if "created_transactions" in self.summary:
+            self.summary["created_transactions"].extend(r[0] for r in rows)
+        self.batch = []
+        if self.seen is not None:
+            self.seen_before, self.seen = self.seen, {}
+        if self.progress:
+            self.progress(self.summary)
+
+    def _post(self, rows: List[tuple]) -> int:
+        """
+        Journal-post the batch in the same DB transaction as the insert.
+        """
+        # TX_COLUMNS: 0 id, 2 source, 3 reference, 4 date, 5 amount, 7 description
+        postings = self.engine.classify_batch((r[7], r[2], r[3], r[5]) for r in rows)
+        return acct.post_transactions_bulk(
+            self.conn,
+            [(r[0], r[4], r[7] or "Auto-posted", p["debit"], p["credit"], r[5]) for r, p in zip(rows, postings)],
+        )
+
+    def _drop_duplicates(self, rows: List[tuple]) -> List[tuple]:
+        fp_pos = len(acct.TX_COLUMNS) - 1
+        unique = {}
+        for row in rows:
+            unique.setdefault(row[fp_pos], row)
+        stored = acct.existing_fingerprints(self.conn, list(unique))
+        return [row for fp, row in unique.items() if fp not in stored]
+
+
+# ------------------------------------------------------------
+# Streaming Import
+# ------------------------------------------------------------
+def import_transactions_stream(
+    source: Union[str, bytes, IO],
+    user_id: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    encoding: str = "utf-8-sig",
+    collect_ids: bool = False,
+    dedupe: bool = True,
+    fingerprint_fields: Optional[tuple] = None,
+    post: bool = False,
+    engine: Optional[rules.RuleEngine] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a CSV of transactions into the database in batches.
+
+    :param source: file path, bytes, binary stream or text stream
+    :param user_id: owner for all rows (defaults to the CSV's user_id column)
+    :param batch_size: rows per executemany / commit
+    :param progress: called after every committed batch with the running summary
+    :param collect_ids: also return created transaction ids (grows with the file)
+    :param dedupe: skip rows already in the ledger (re-imported overlapping exports)
+    :param fingerprint_fields: fields identifying a duplicate (default acct.FINGERPRINT_FIELDS)
+    :param post: also post journal entries for imported rows via the rules engine
+    :param engine: rules engine to post with (default rules.get_default_engine())
+    :return: summary {count, rows, duplicates, errors, error_count[, posted, created_transactions]}
+    """
+    acct._ensure_schema()
+    stream = _open_text(source, encoding)
+    reader = csv.reader(stream)
+    conn = acct._get_conn()
+    writer = _BatchWriter(conn, batch_size, progress, collect_ids, dedupe, _posting_engine(post, engine), number_repeats=True)
+    fp_fields = (fingerprint_fields or acct.FINGERPRINT_FIELDS) if dedupe else None
+
+    try:
+        header = next(reader, None)
+        normalize = make_row_normalizer(header or [], user_id, fingerprint_fields=fp_fields)
+        for rec in reader:
+            if not rec:
+                continue
+            try:
+                row = normalize(rec)
+            except Exception as e:
+                writer.error(reader.line_num, str(e))
+                continue
+            writer.add(row)
+        writer.flush()
+    finally:
+        conn.close()
+        if isinstance(source, str):
+            stream.close()
+        elif stream is not source:
+            stream.detach()  # leave the caller's binary stream open
+
+    return writer.summary
+
+
+# ------------------------------------------------------------
+# Parallel Import (process pool parses, single writer inserts)
+# ------------------------------------------------------------
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def _read_header(path: str, encoding: str):
+    """
+    Returns (header_columns, byte_offset_of_first_data_line).
+    """
+    with open(path, "rb") as f:
+        first = f.readline()
+        return next(csv.reader([first.decode(encoding)]), []), f.tell()
+
+
+def split_csv_chunks(path: str, start: int, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (start, end) byte ranges of roughly 'chunk_bytes' that begin and end on
+    line boundaries. Assumes no quoted field contains a newline, which holds for
+    bank statement exports.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # advance to the end of the current line
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def _parse_chunk(path: str, start: int, end: int, header: List[str], user_id: Optional[str], encoding: str, fp_fields: Optional[tuple]):
+    """
+    Worker: parse and validate one byte range.
+    Returns (rows, errors, line_count); error line numbers are relative to the chunk.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    normalize = make_row_normalizer(header, user_id, fingerprint_fields=fp_fields)
+    reader = csv.reader(io.StringIO(data.decode(encoding), newline=""))
+    rows, errors = [], []
+    for rec in reader:
+        if not rec:
+            continue
+        try:
+            rows.append(normalize(rec))
+        except Exception as e:
+            errors.append((reader.line_num, str(e)))
+    return rows, errors, data.count(b"\n")
+
+
+def iter_parsed_chunks(
+    path: str,
+    user_id: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    encoding: str = "utf-8",
+    fingerprint_fields: Optional[tuple] = None,
+) -> Iterator[Tuple[List[tuple], List[Tuple[int, str]]]]:
+    """
+    Parse a CSV file across a process pool and yield (rows, errors) per chunk
+    in file order. Error line numbers are absolute (header is line 1).
+    At most 2 x workers chunks are in flight, so memory stays bounded even if
+    the consumer is slower than the parsers. Fingerprints (if requested) are
+    computed in the workers too.
+    """
+    header, data_start = _read_header(path, "utf-8-sig" if encoding == "utf-8" else encoding)
+    workers = workers or os.cpu_count() or 1
+    chunks = split_csv_chunks(path, data_start, chunk_bytes)
+    line_base = 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, end in chunks:
+            pending.append(pool.submit(_parse_chunk, path, start, end, header, user_id, encoding, fingerprint_fields))
+            if len(pending) >= workers * 2:
+                rows, errors, lines = pending.popleft().result()
+                yield rows, [(line_base + n, msg) for n, msg in errors]
+                line_base += lines
+        while pending:
+            rows, errors, lines = pending.popleft().result()
+            yield rows, [(line_base + n, msg) for n, msg in errors]
+            line_base += lines
+
+
+def import_transactions_parallel(
+    path: str,
+    user_id: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    encoding: str = "utf-8",
+    dedupe: bool = True,
+    fingerprint_fields: Optional[tuple] = None,
+    post: bool = False,
+    engine: Optional[rules.RuleEngine] = None,
+) -> Dict[str, Any]:
+    """
+    Import a large CSV file: chunks are parsed/validated in a process pool and the
+    normalised rows are funnelled, in file order, to a single SQLite writer.
+    Returns the same summary shape as import_transactions_stream.
+    """
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    writer = _BatchWriter(conn, batch_size, progress, dedupe=dedupe, engine=_posting_engine(post, engine),
+                          number_repeats=True)
+    fp_fields = (fingerprint_fields or acct.FINGERPRINT_FIELDS) if dedupe else None
+    try:
+        for rows, errors in iter_parsed_chunks(path, user_id, workers, chunk_bytes, encoding, fp_fields):
+            # errors are reported in line order but counted before the chunk's rows
+            for line, message in errors:
+                writer.error(line, message)
+            for row in rows:
+                writer.add(row)
+        writer.flush()
+    finally:
+        conn.close()
+    return writer.summary
+
+
+# ------------------------------------------------------------
+# Parsed Invoice Import
+# ------------------------------------------------------------
+def invoice_row(invoice: Dict[str, Any], user_id: Optional[str], fingerprint_fields: Optional[tuple] = None) -> tuple:
+    """
+    Maps an invoice_parser.parse_invoice result to a transactions insert tuple,
+    shaped like the rows invoice_adapter.process_invoice creates for one upload.
+    """
+    number = invoice.get("invoice_number")
+    row = (
+        str(uuid.uuid4()),
+        user_id,
+        "invoice_upload",
+        number,
+        invoice.get("date") or datetime.utcnow().date().isoformat(),
+        float(invoice.get("amount") or 0.0),
+        "INR",
+        f"Invoice {number} from {invoice.get('vendor')}",
+        datetime.utcnow().isoformat(),
+        None,
+    )
+    if fingerprint_fields:
+        row = row[:-1] + (acct.transaction_fingerprint(row, fingerprint_fields),)
+    return row
+
+
+def import_invoices(
+    results: Iterable[Dict[str, Any]],
+    user_id: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    dedupe: bool = True,
+    fingerprint_fields: Optional[tuple] = None,
+    post: bool = True,
+    engine: Optional[rules.RuleEngine] = None,
+) -> Dict[str, Any]:
+    """
+    Write parsed invoices as transactions in batches and (by default) journal-post
+    them in bulk. 'results' is any iterable of invoice_parser.parse_invoices results
+    ({"path", "ok", "invoice" | "error"}), consumed as it is produced, so parsing
+    and writing overlap. Failed files are reported in summary["errors"] by path.
+    Returns the same summary shape as import_transactions_stream.
+    """
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    writer = _BatchWriter(conn, batch_size, progress, dedupe=dedupe, engine=_posting_engine(post, engine))
+    fp_fields = (fingerprint_fields or acct.FINGERPRINT_FIELDS) if dedupe else None
+    try:
+        for result in results:
+            if not result.get("ok"):
+                writer.error(result.get("path"), result.get("error") or "parse failed", key="path")
+                continue
+            writer.add(invoice_row(result["invoice"], user_id, fp_fields))
+        writer.flush()
+    finally:
+        conn.close()
+    return writer.summary
+
+
+# Demo
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "samples/demo_data/sample_transactions.csv"
+    mode = import_transactions_parallel if "--parallel" in sys.argv else import_transactions_stream
+    result = mode(path, progress=lambda s: print(f"[importer] {s['count']} rows imported"))
+    print({k: v for k, v in result.items() if k != "errors"}, result["errors"][:10])
@@ -0,0 +1,230 @@
+# backend/accounting_engine/rules.py
+"""
+XYLO — Posting Rules Engine
+
+Maps transactions to a debit/credit account pair using ordered rules over:
+- description keywords / phrases (case-insensitive, whole words)
+- description regexes
+- source (manual, invoice_upload, bank_import, ...)
+- reference prefixes (INV-, BILL-, REF-, ...)
+- amount sign (refunds and bank debits are negative)
+
+All rule keywords are compiled into ONE trie-shaped regex (shared prefixes are
+factored out, so the C regex engine walks a keyword automaton once per
+description) and per-rule regexes are pre-compiled. Classification of a row is
+then a single scan plus one dict lookup (decisions are memoised on the keyword
+hits, source, reference prefix and sign), which keeps 1M-row batches in the
+seconds range.
+
+The first matching rule (list order) wins. Rules are plain dicts:
+    {
+        "name": "utilities",
+        "keywords": ["electricity", "internet bill"],
+        "pattern": r"\\bwater\\s+bill\\b",        # optional
+        "sources": ["manual", "bank_import"],    # optional
+        "reference_prefixes": ["BILL-"],         # optional
+        "sign": "positive" | "negative",         # optional
+        "debit": "5200",
+        "credit": "1100",
+    }
+A rule without keywords/pattern matches on its other conditions alone.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# ------------------------------------------------------------
+# Default Rules (Chart of Accounts codes from stubs.seed_default_accounts)
+# ------------------------------------------------------------
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"name": "refund", "keywords": ["refund", "refunded", "chargeback"], "debit": "4000", "credit": "1100"},
+    {"name": "salaries", "keywords": ["salary", "salaries", "payroll", "wages"], "debit": "5300", "credit": "1100"},
+    {"name": "rent", "keywords": ["rent", "lease rental"], "debit": "5100", "credit": "1100"},
+    {
+        "name": "utilities",
+        "keywords": ["electricity", "internet", "broadband", "water bill", "phone bill", "utility", "utilities"],
+        "debit": "5200",
+        "credit": "1100",
+    },
+    {"name": "office_expense", "keywords": ["office supplies", "stationery", "printing"], "debit": "5400", "credit": "1100"},
+    {"name": "cost_of_goods", "keywords": ["raw materials", "raw material", "inventory purchase", "purchase"], "debit": "5000", "credit": "1100"},
+    {"name": "sales", "keywords": ["sale", "sales", "payment received", "receipt"], "sign": "positive", "debit": "1100", "credit": "4000"},
+    {"name": "bank_debit", "sign": "negative", "debit": "5900", "credit": "1100"},
+    {"name": "default_income", "debit": "1100", "credit": "4000"},
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_DECISION_CACHE_LIMIT = 65536
+
+# Words inside a keyword phrase may be separated by any run of punctuation/space
+_SEPARATOR = r"[^a-z0-9]+"
+
+
+# ------------------------------------------------------------
+# Keyword Trie → Regex
+# ------------------------------------------------------------
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Builds a regex alternation shaped like a trie over 'phrases', e.g.
+    ["rent", "refund", "refunded"] -> "re(?:nt|fund(?:ed)?)".
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node: Dict[str, Any]) -> str:
+        terminal = "" in node
+        branches = [(_SEPARATOR if ch == " " else re.escape(ch)) + emit(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if terminal else body
+
+    return emit(trie)
+
+
+def _normalise_phrase(phrase: str) -> str:
+    return " ".join(_WORD_RE.findall(phrase.lower()))
+
+
+# ------------------------------------------------------------
+# Compiled Rule Engine
+# ------------------------------------------------------------
+class RuleEngine:
+    """
+    Compiled, immutable set of posting rules.
+    Use classify() for one transaction or classify_batch() for bulk posting.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        self.rules = [dict(r) for r in (rules if rules is not None else DEFAULT_RULES)]
+        if not self.rules:
+            raise ValueError("At least one posting rule is required.")
+
+        keyword_rules: Dict[str, List[int]] = {}
+        self._patterns: List[Tuple[int, Any]] = []
+        self._unconditional: List[int] = []  # rules matched without a keyword/pattern hit
+
+        for i, rule in enumerate(self.rules):
+            if "debit" not in rule or "credit" not in rule:
+                raise ValueError(f"Rule '{rule.get('name', i)}' needs both 'debit' and 'credit' accounts.")
+            rule.setdefault("name", f"rule_{i}")
+            rule["_sources"] = frozenset(rule.get("sources") or ())
+            rule["_prefixes"] = tuple(p.upper() for p in rule.get("reference_prefixes") or ())
+            keywords = [_normalise_phrase(k) for k in rule.get("keywords") or ()]
+            for kw in filter(None, keywords):
+                keyword_rules.setdefault(kw, []).append(i)
+            if rule.get("pattern"):
+                self._patterns.append((i, re.compile(rule["pattern"], re.IGNORECASE)))
+            if not keywords and not rule.get("pattern"):
+                self._unconditional.append(i)
+
+        self._keyword_rules = keyword_rules
+        self._uses_sources = any(r["_sources"] for r in self.rules)
+        self._prefix_len = max((len(p) for r in self.rules for p in r["_prefixes"]), default=0)
+        self._decisions: Dict[tuple, Dict[str, Any]] = {}
+        # longest-first is implicit in the trie; \b keeps matches on word boundaries
+        self._keyword_re = re.compile(r"\b(?:" + _trie_pattern(keyword_rules) + r")\b") if keyword_rules else None
+
+    # --------------------------------------------------------
+    def _matches(self, rule: Dict[str, Any], source: Optional[str], reference: Optional[str], negative: bool) -> bool:
+        if rule["_sources"] and source not in rule["_sources"]:
+            return False
+        if rule["_prefixes"] and not (reference or "").upper().startswith(rule["_prefixes"]):
+            return False
+        sign = rule.get("sign")
+        if sign == "positive" and negative:
+            return False
+        if sign == "negative" and not negative:
+            return False
+        return True
+
+    def _decide(self, hits: tuple, pattern_hits: tuple, source: Optional[str], reference: Optional[str], negative: bool) -> Dict[str, Any]:
+        found = set(self._unconditional)
+        found.update(pattern_hits)
+        for hit in hits:
+            found.update(self._keyword_rules.get(hit) or self._keyword_rules[_normalise_phrase(hit)])
+        for i in sorted(found):
+            rule = self.rules[i]
+            if self._matches(rule, source, reference, negative):
+                return {"rule": rule["name"], "debit": rule["debit"], "credit": rule["credit"]}
+        raise ValueError("No posting rule matches transaction.")
+
+    def classify(self, description: str, source: Optional[str] = None, reference: Optional[str] = None, amount: float = 0.0) -> Dict[str, Any]:
+        """
+        Returns {"rule", "debit", "credit"} for the first matching rule.
+        Raises ValueError if no rule matches (add a catch-all rule to avoid this).
+        """
+        description = description or ""
+        hits = tuple(self._keyword_re.findall(description.lower())) if self._keyword_re is not None else ()
+        pattern_hits = tuple(i for i, rx in self._patterns if rx.search(description))
+        # Everything a decision depends on; descriptions differ per row but their keyword hits rarely do
+        key = (
+            hits,
+            pattern_hits,
+            source if self._uses_sources else None,
+            (reference or "")[: self._prefix_len].upper() if self._prefix_len else None,
+            amount < 0,
+        )
+        decision = self._decisions.get(key)
+        if decision is None:
+            try:
+                decision = self._decide(hits, pattern_hits, source, reference, amount < 0)
+            except ValueError:
+                raise ValueError(f"No posting rule matches transaction '{description}'.")
+            if len(self._decisions) >= _DECISION_CACHE_LIMIT:
+                self._decisions.clear()
+            self._decisions[key] = decision
+        return decision
+
+    def classify_batch(self, rows: Iterable[Tuple[str, Optional[str], Optional[str], float]]) -> List[Dict[str, Any]]:
+        """
+        Classify many (description, source, reference, amount) tuples.
+        """
+        classify = self.classify
+        return [classify(*row) for row in rows]
+
+
+# ------------------------------------------------------------
+# Loading
+# ------------------------------------------------------------
+def load_rules(path: str) -> List[Dict[str, Any]]:
+    """
+    Load a JSON list of rule dicts (same shape as DEFAULT_RULES).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Rules file '{path}' must contain a JSON list.")
+    return rules
+
+
+@lru_cache(maxsize=None)
+def get_default_engine() -> RuleEngine:
+    """
+    Process-wide engine compiled once from XYLO_RULES_FILE (if set) or DEFAULT_RULES.
+    """
+    path = os.environ.get("XYLO_RULES_FILE")
+    return RuleEngine(load_rules(path) if path else None)
+
+
+# Demo
+if __name__ == "__main__":
+    engine = get_default_engine()
+    for desc, amt in [
+        ("Electricity Bill September", 4800.0),
+        ("Salary - October (Staff)", 18000.0),
+        ("Refund Issued - Order #INV-1002", -7899.99),
+        ("Sale - Retail Customer A", 12500.0),
+        ("ATM withdrawal", -2000.0),
+    ]:
+        print(desc, "->", engine.classify(desc, amount=amt))
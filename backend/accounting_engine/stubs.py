@@ -14,14 +14,28 @@ for production use.
 """
 
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import uuid
+import json
+import hashlib
 import os
 
 DB_PATH = os.environ.get("XYLO_DB", "xylo_dev.db")
 
+# Transaction fields that identify a duplicate on import, within one user_id
+# (see transaction_fingerprint)
+FINGERPRINT_FIELDS = tuple(
+    f.strip() for f in os.environ.get("XYLO_FINGERPRINT_FIELDS", "date,amount,reference,description").split(",") if f.strip()
+)
+
+# How long a stored Idempotency-Key response can be replayed (seconds)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("XYLO_IDEMPOTENCY_TTL", "86400"))
+# How long a key stays reserved while its request runs (seconds); a worker that
+# dies mid-request only blocks retries of that key for this long
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get("XYLO_IDEMPOTENCY_LEASE", "300"))
+
 
 def _get_conn():
     conn = sqlite3.connect(DB_PATH)
@@ -29,7 +43,14 @@ def _get_conn():
     return conn
 
 
+# DB paths whose schema has already been created in this process
+_SCHEMA_READY = set()
+_SEEDED = set()
+
+
 def _ensure_schema():
+    if DB_PATH in _SCHEMA_READY:
+        return
     conn = _get_conn()
     cur = conn.cursor()
 
@@ -59,10 +80,18 @@ def _ensure_schema():
             description TEXT,
             metadata TEXT,
             created_at TEXT,
-            processed INTEGER DEFAULT 0
+            processed INTEGER DEFAULT 0,
+            fingerprint TEXT
         )
         """
     )
+    # older dev databases predate the fingerprint column
+    tx_cols = {r["name"] for r in cur.execute("PRAGMA table_info(transactions)").fetchall()}
+    if "fingerprint" not in tx_cols:
+        cur.execute("ALTER TABLE transactions ADD COLUMN fingerprint TEXT")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_fingerprint ON transactions(fingerprint) WHERE fingerprint IS NOT NULL"
+    )
 
     # journal_entries (header)
     cur.execute(
@@ -76,6 +105,7 @@ def _ensure_schema():
         )
         """
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_journal_entries_tx ON journal_entries(transaction_id)")
 
     # journal_lines (debit/credit lines)
     cur.execute(
@@ -102,17 +132,222 @@ def _ensure_schema():
         """
     )
 
+    # idempotency_keys (stored API responses for safe client retries)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            scope TEXT,
+            key TEXT,
+            response TEXT, -- NULL while the original request is still running
+            request_hash TEXT, -- digest of the request body the key was first used with
+            created_at TEXT,
+            expires_at TEXT,
+            PRIMARY KEY (scope, key)
+        )
+        """
+    )
+    idem_cols = {r["name"] for r in cur.execute("PRAGMA table_info(idempotency_keys)").fetchall()}
+    if "request_hash" not in idem_cols:
+        cur.execute("ALTER TABLE idempotency_keys ADD COLUMN request_hash TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at)")
+
+    # scheduler_tasks (last handled slot per automation task, survives restarts)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_tasks (
+            name TEXT PRIMARY KEY,
+            schedule TEXT,
+            last_fire TEXT, -- intended fire time of the last scheduled run
+            last_run TEXT,  -- when the last run (scheduled or manual) finished
+            last_status TEXT,
+            updated_at TEXT
+        )
+        """
+    )
+
+    # scheduler_runs (run history)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_runs (
+            run_id TEXT PRIMARY KEY,
+            task TEXT,
+            scheduled_for TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            status TEXT,
+            error TEXT,
+            manual INTEGER DEFAULT 0
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scheduler_runs_task ON scheduler_runs(task, finished_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scheduler_runs_finished_at ON scheduler_runs(finished_at)")
+
+    # email_outbox (emails waiting for the background delivery worker)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_addr TEXT NOT NULL,
+            subject TEXT,
+            body TEXT,
+            html INTEGER DEFAULT 0,
+            attachments TEXT,       -- JSON list of file paths
+            dedupe_key TEXT,        -- optional: enqueue at most once per key
+            status TEXT NOT NULL,   -- pending | sending | sent | dead
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TEXT,   -- UTC
+            claimed_until TEXT,     -- UTC; a 'sending' row past this is retried
+            last_error TEXT,
+            created_at TEXT,
+            sent_at TEXT
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(next_attempt_at) WHERE status = 'pending'")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_claimed ON email_outbox(claimed_until) WHERE status = 'sending'")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_status ON email_outbox(status)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_email_outbox_dedupe ON email_outbox(dedupe_key) WHERE dedupe_key IS NOT NULL")
+
+    # scheduler_leases (which scheduler instance may run a task right now)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            task TEXT PRIMARY KEY,
+            owner TEXT,      -- instance holding the lease, NULL once released
+            holders INTEGER, -- the owner's runs in flight; released when the last ends
+            slot TEXT,       -- latest scheduled slot claimed (never reclaimed)
+            acquired_at TEXT,
+            expires_at TEXT  -- UTC; an expired lease may be taken over
+        )
+        """
+    )
+    lease_cols = {r["name"] for r in cur.execute("PRAGMA table_info(scheduler_leases)").fetchall()}
+    if "holders" not in lease_cols:
+        cur.execute("ALTER TABLE scheduler_leases ADD COLUMN holders INTEGER")
+
+    # invoices (receivables; reminders are driven from the unpaid ones)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoices (
+            id TEXT PRIMARY KEY,
+            invoice_number TEXT UNIQUE,
+            customer_name TEXT,
+            customer_email TEXT,
+            amount REAL,
+            currency TEXT,
+            description TEXT,
+            issue_date TEXT,
+            due_date TEXT,      -- ISO date
+            paid INTEGER DEFAULT 0,
+            paid_at TEXT,
+            transaction_id TEXT,
+            created_at TEXT
+        )
+        """
+    )
+    # only unpaid invoices are ever scanned by due date, so index just those
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invoices_unpaid_due ON invoices(due_date, id) WHERE paid = 0")
+
+    # reminder_state (one row per unpaid invoice; deleted once it is paid)
+    has_reminder_state = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reminder_state'"
+    ).fetchone() is not None
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reminder_state (
+            invoice_id TEXT PRIMARY KEY,
+            reminder_count INTEGER DEFAULT 0,
+            last_sent_at TEXT,
+            next_eligible_date TEXT  -- ISO date; first one is the day after due_date
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reminder_state_next ON reminder_state(next_eligible_date, invoice_id)")
+    if not has_reminder_state:
+        _seed_reminder_state(cur)
+
     conn.commit()
     conn.close()
+    _SCHEMA_READY.add(DB_PATH)
 
 
 # --- Utilities ---
 
 
+def _seed_reminder_state(cur):
+    """Create reminder_state rows for unpaid invoices that don't have one."""
+    cur.execute(
+        """INSERT OR IGNORE INTO reminder_state(invoice_id, reminder_count, next_eligible_date)
+           SELECT id, 0, date(due_date, '+1 day') FROM invoices
+           WHERE paid = 0"""
+    )
+
+
 def _decimal(x) -> Decimal:
     return Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+# Column order of rows passed to insert_transactions
+TX_COLUMNS = ("id", "user_id", "source", "reference", "date", "amount", "currency", "description", "created_at", "fingerprint")
+_TX_INDEX = {name: i for i, name in enumerate(TX_COLUMNS)}
+
+
+def transaction_fingerprint(row: tuple, fields: Optional[tuple] = None) -> str:
+    """
+    Stable identity hash of a transaction row (TX_COLUMNS order) over 'fields'
+    (default FINGERPRINT_FIELDS). Amounts are rounded to paise and descriptions
+    are case/whitespace-normalised so re-exported statements match. The owner
+    (user_id) is always hashed in, so identical rows of two tenants never collide.
+    """
+    parts = [(row[_TX_INDEX["user_id"]] or "").strip()]
+    for name in fields or FINGERPRINT_FIELDS:
+        if name == "user_id":
+            continue
+        value = row[_TX_INDEX[name]]
+        if name == "amount":
+            value = f"{float(value or 0):.2f}"
+        elif name == "description":
+            value = " ".join((value or "").split()).lower()
+        else:
+            value = (value or "").strip()
+        parts.append(value)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def repeat_fingerprint(fingerprint: str, occurrence: int) -> str:
+    """
+    Fingerprint of the nth repeat (occurrence >= 1) of an identical row within
+    one import file, so genuine same-day duplicates are kept apart.
+    """
+    return hashlib.sha256(f"{fingerprint}#{occurrence}".encode("utf-8")).hexdigest()
+
+
+def existing_fingerprints(conn: sqlite3.Connection, fingerprints: List[str]) -> set:
+    """
+    Returns the subset of 'fingerprints' already stored, using the unique index
+    with one IN query per 500 values (one round trip per import batch).
+    """
+    found = set()
+    cur = conn.cursor()
+    for i in range(0, len(fingerprints), 500):
+        chunk = fingerprints[i:i + 500]
+        q = f"SELECT fingerprint FROM transactions WHERE fingerprint IN ({','.join('?' * len(chunk))})"
+        found.update(r[0] for r in cur.execute(q, chunk).fetchall())
+    return found
+
+
+def stored_transaction_ids(conn: sqlite3.Connection, ids: List[str]) -> set:
+    """Returns the subset of transaction 'ids' present, one IN query per 500 values."""
+    found = set()
+    cur = conn.cursor()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        q = f"SELECT id FROM transactions WHERE id IN ({','.join('?' * len(chunk))})"
+        found.update(r[0] for r in cur.execute(q, chunk).fetchall())
+    return found
+
+
 # --- Public API ---
 
 
@@ -134,37 +369,172 @@ def seed_default_accounts():
         ("5000", "Cost of Goods Sold", "expense", "debit"),
         ("5100", "Rent Expense", "expense", "debit"),
         ("5200", "Utilities Expense", "expense", "debit"),
+        ("5300", "Salaries Expense", "expense", "debit"),
+        ("5400", "Office & Admin Expense", "expense", "debit"),
+        ("5900", "Uncategorised Expense", "expense", "debit"),
     ]
 
-    for code, name, typ, nb in default_accounts:
-        cur.execute("SELECT 1 FROM accounts WHERE code = ?", (code,))
-        if cur.fetchone() is None:
-            cur.execute(
-                "INSERT INTO accounts(code, name, type, normal_balance) VALUES (?, ?, ?, ?)",
-                (code, name, typ, nb),
-            )
+    cur.executemany(
+        "INSERT OR IGNORE INTO accounts(code, name, type, normal_balance) VALUES (?, ?, ?, ?)",
+        default_accounts,
+    )
 
     conn.commit()
     conn.close()
 
 
-def create_transaction(user_id: Optional[str], amount: float, description: str, source: str = "manual", reference: Optional[str] = None) -> str:
+def init_db():
+    """
+    Create the schema and seed the default accounts once per process.
+    Called from the API lifespan hook; cheap to call again afterwards.
+    """
+    if DB_PATH in _SEEDED:
+        return
+    _ensure_schema()
+    seed_default_accounts()
+    _SEEDED.add(DB_PATH)
+
+
+def create_transaction(
+    user_id: Optional[str],
+    amount: float,
+    description: str,
+    source: str = "manual",
+    reference: Optional[str] = None,
+    date: Optional[str] = None,
+    currency: str = "INR",
+    dedupe: bool = True,
+) -> str:
     """
     Create a raw transaction record (source). Returns transaction_id.
+    'date' is an ISO date string and defaults to today.
+    With dedupe (the default) the row is fingerprinted and, if an identical
+    transaction of the same user already exists, its id is returned instead of
+    inserting a duplicate; INSERT OR IGNORE makes concurrent creates safe.
     """
     _ensure_schema()
     tx_id = str(uuid.uuid4())
     created_at = datetime.utcnow().isoformat()
+    row = (tx_id, user_id, source, reference, date or datetime.utcnow().date().isoformat(), float(amount), currency, description, created_at, None)
+    if dedupe:
+        row = row[:-1] + (transaction_fingerprint(row),)
+    conn = _get_conn()
+    try:
+        if not insert_transactions(conn, [row], ignore_duplicates=dedupe):
+            return conn.execute("SELECT id FROM transactions WHERE fingerprint = ?", (row[-1],)).fetchone()["id"]
+        conn.commit()
+    finally:
+        conn.close()
+    return tx_id
+
+
+def transaction_journal_entry(transaction_id: str) -> Optional[str]:
+    """Returns the id of the journal entry posted for a transaction, if any."""
     conn = _get_conn()
+    try:
+        row = conn.execute(
+            "SELECT id FROM journal_entries WHERE transaction_id = ? ORDER BY created_at LIMIT 1", (transaction_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row["id"] if row else None
+
+
+def insert_transactions(conn: sqlite3.Connection, rows: List[tuple], ignore_duplicates: bool = False) -> int:
+    """
+    Bulk-insert transaction rows (TX_COLUMNS order) with a single executemany on 'conn'.
+    With ignore_duplicates=True rows whose fingerprint already exists are skipped.
+    Does not commit: the caller decides the transaction boundary. Returns rows inserted.
+    """
     cur = conn.cursor()
-    cur.execute(
-        """INSERT INTO transactions(id, user_id, source, reference, date, amount, currency, description, created_at, processed)
-           VALUES (?,?,?,?,?,?,?,?,?,0)""",
-        (tx_id, user_id, source, reference, datetime.utcnow().date().isoformat(), float(amount), "INR", description, created_at),
+    cur.executemany(
+        f"""INSERT {'OR IGNORE ' if ignore_duplicates else ''}INTO transactions(id, user_id, source, reference, date, amount, currency, description, created_at, fingerprint, processed)
+           VALUES (?,?,?,?,?,?,?,?,?,?,0)""",
+        rows,
+    )
+    return cur.rowcount if ignore_duplicates else len(rows)
+
+
+def create_invoice(
+    invoice_number: str,
+    amount: float,
+    due_date: str,
+    customer_email: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    description: str = "",
+    issue_date: Optional[str] = None,
+    currency: str = "INR",
+    transaction_id: Optional[str] = None,
+) -> str:
+    """
+    Record an unpaid invoice. Dates are ISO date strings; 'issue_date'
+    defaults to today. Returns invoice_id.
+    """
+    _ensure_schema()
+    inv_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    conn = _get_conn()
+    conn.execute(
+        """INSERT INTO invoices(id, invoice_number, customer_name, customer_email, amount, currency, description,
+                                issue_date, due_date, paid, transaction_id, created_at)
+           VALUES (?,?,?,?,?,?,?,?,?,0,?,?)""",
+        (inv_id, invoice_number, customer_name, customer_email, float(amount), currency, description,
+         issue_date or now.date().isoformat(), due_date, transaction_id, now.isoformat()),
+    )
+    conn.execute(
+        "INSERT INTO reminder_state(invoice_id, reminder_count, next_eligible_date) VALUES (?, 0, date(?, '+1 day'))",
+        (inv_id, due_date),
     )
     conn.commit()
     conn.close()
-    return tx_id
+    return inv_id
+
+
+def mark_invoice_paid(invoice_number: str, paid_at: Optional[str] = None) -> bool:
+    """
+    Mark an invoice paid (drops it out of the unpaid index and stops its
+    reminders). Returns False if it does not exist or was already paid.
+    """
+    _ensure_schema()
+    conn = _get_conn()
+    cur = conn.execute(
+        "UPDATE invoices SET paid = 1, paid_at = ? WHERE invoice_number = ? AND paid = 0",
+        (paid_at or datetime.utcnow().isoformat(), invoice_number),
+    )
+    if cur.rowcount == 1:
+        conn.execute(
+            "DELETE FROM reminder_state WHERE invoice_id = (SELECT id FROM invoices WHERE invoice_number = ?)",
+            (invoice_number,),
+        )
+    conn.commit()
+    conn.close()
+    return cur.rowcount == 1
+
+
+def import_invoices_from_transactions(terms_days: int = 10) -> int:
+    """
+    One-off migration for dev databases that used positive transactions as
+    stand-in invoices: creates an unpaid invoice (due 'terms_days' after the
+    transaction date) for each referenced positive transaction not imported
+    yet. Runs as a single INSERT ... SELECT. Returns invoices created.
+    """
+    _ensure_schema()
+    conn = _get_conn()
+    cur = conn.execute(
+        """INSERT OR IGNORE INTO invoices(id, invoice_number, amount, currency, description,
+                                          issue_date, due_date, paid, transaction_id, created_at)
+           SELECT lower(hex(randomblob(16))), reference, amount, currency, description,
+                  date(date), date(date, '+' || ? || ' days'), 0, id, ?
+           FROM transactions
+           WHERE amount > 0 AND reference IS NOT NULL AND reference != ''""",
+        (int(terms_days), datetime.utcnow().isoformat()),
+    )
+    created = cur.rowcount
+    if created:
+        _seed_reminder_state(conn.cursor())
+    conn.commit()
+    conn.close()
+    return created
 
 
 def create_journal_entry(transaction_id: Optional[str], entry_date: str, description: str, lines: List[Dict[str, Any]]) -> str:
@@ -209,6 +579,37 @@ def create_journal_entry(transaction_id: Optional[str], entry_date: str, descrip
     return je_id
 
 
+def post_transactions_bulk(conn: sqlite3.Connection, postings: List[tuple]) -> int:
+    """
+    Post many two-line journal entries at once on 'conn' (caller commits).
+    Each posting is (transaction_id, entry_date, description, debit_account, credit_account, amount);
+    the amount is posted as its absolute value so debits always equal credits.
+    Uses three executemany calls instead of per-entry inserts. Returns entries posted.
+    """
+    created_at = datetime.utcnow().isoformat()
+    entries, lines, processed = [], [], []
+    for tx_id, entry_date, description, debit_code, credit_code, amount in postings:
+        value = float(_decimal(abs(amount)))
+        je_id = str(uuid.uuid4())
+        entries.append((je_id, tx_id, entry_date, description, created_at))
+        lines.append((str(uuid.uuid4()), je_id, debit_code, value, 0.0))
+        lines.append((str(uuid.uuid4()), je_id, credit_code, 0.0, value))
+        if tx_id:
+            processed.append((tx_id,))
+
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO journal_entries(id, transaction_id, entry_date, description, created_at) VALUES (?,?,?,?,?)",
+        entries,
+    )
+    cur.executemany(
+        "INSERT INTO journal_lines(id, journal_entry_id, account_code, debit, credit) VALUES (?,?,?,?,?)",
+        lines,
+    )
+    cur.executemany("UPDATE transactions SET processed = 1 WHERE id = ?", processed)
+    return len(entries)
+
+
 def compute_trial_balance(from_date: Optional[str] = None, to_date: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Returns a list of accounts with total debits and credits within optional date range.
@@ -307,6 +708,108 @@ def compute_balance_sheet(as_of: Optional[str] = None) -> Dict[str, Any]:
     return {"assets": round(assets, 2), "liabilities": round(liabilities, 2), "equity": round(equity, 2), "reconciles": round(assets - (liabilities + equity), 2)}
 
 
+# --- Idempotency Keys ---
+
+
+class IdempotencyInProgress(Exception):
+    """Raised when a request with the same Idempotency-Key is still being processed."""
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an Idempotency-Key is reused with a different request body."""
+
+
+def idempotency_request_hash(payload: Any) -> str:
+    """Digest of a request body: raw bytes, or anything JSON-serialisable."""
+    if not isinstance(payload, bytes):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def run_idempotent(
+    key: str,
+    scope: str,
+    func: Callable[[], Dict[str, Any]],
+    ttl_seconds: Optional[int] = None,
+    request_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run 'func' at most once per (scope, key) and return its JSON-serialisable result.
+    A replay with the same key returns the stored response via a primary-key lookup.
+    The key is reserved before 'func' runs, so concurrent retries cannot both execute it;
+    the reservation is a short lease (IDEMPOTENCY_LEASE_SECONDS), extended to the replay
+    TTL once the response is stored. With 'request_hash' (see idempotency_request_hash)
+    a key reused for a different request raises IdempotencyKeyReused.
+    """
+    _ensure_schema()
+    now = datetime.utcnow()
+    ttl = IDEMPOTENCY_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    reserved_at = now.isoformat()
+
+    conn = _get_conn()
+    cur = conn.cursor()
+    try:
+        row = cur.execute(
+            "SELECT response, request_hash, expires_at FROM idempotency_keys WHERE scope = ? AND key = ?",
+            (scope, key),
+        ).fetchone()
+        if row is not None and row["expires_at"] > reserved_at:
+            if request_hash and row["request_hash"] and row["request_hash"] != request_hash:
+                raise IdempotencyKeyReused(f"Idempotency-Key '{key}' was already used with a different request.")
+            if row["response"] is None:
+                raise IdempotencyInProgress(f"Request with Idempotency-Key '{key}' is still in progress.")
+            return json.loads(row["response"])
+
+        # reserve the key (replacing an expired entry or lapsed lease that hasn't been evicted yet)
+        if row is not None:
+            cur.execute(
+                "DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND expires_at <= ?", (scope, key, reserved_at)
+            )
+        try:
+            cur.execute(
+                "INSERT INTO idempotency_keys(scope, key, response, request_hash, created_at, expires_at) VALUES (?,?,NULL,?,?,?)",
+                (scope, key, request_hash, reserved_at, (now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)).isoformat()),
+            )
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            raise IdempotencyInProgress(f"Request with Idempotency-Key '{key}' is still in progress.")
+
+        # only touch our own reservation: after a lapsed lease a retry may hold the key
+        ours = "scope = ? AND key = ? AND created_at = ?"
+        try:
+            response = func()
+        except Exception:
+            # release the reservation so the client can retry
+            cur.execute(f"DELETE FROM idempotency_keys WHERE {ours}", (scope, key, reserved_at))
+            conn.commit()
+            raise
+
+        cur.execute(
+            f"UPDATE idempotency_keys SET response = ?, expires_at = ? WHERE {ours}",
+            (json.dumps(response), (datetime.utcnow() + timedelta(seconds=ttl)).isoformat(), scope, key, reserved_at),
+        )
+        conn.commit()
+        return response
+    finally:
+        conn.close()
+
+
+def purge_expired_idempotency_keys(as_of: Optional[str] = None) -> int:
+    """
+    Delete expired idempotency keys. Uses the expires_at index, so the cost is
+    proportional to the number of expired rows. Returns the number removed.
+    """
+    _ensure_schema()
+    conn = _get_conn()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (as_of or datetime.utcnow().isoformat(),))
+    removed = cur.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+
 # Simple demo runner
 if __name__ == "__main__":
     # initialize schema + seed accounts
@@ -6,16 +6,11 @@ This module provides small wrapper functions that the FastAPI endpoints can impo
 It isolates the accounting implementation (stubs or full engine) so the API stays clean.
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Union, BinaryIO
 from datetime import datetime
 import backend.accounting_engine.stubs as acct
-import csv
-import io
-
-# Initialize / ensure schema and seed demo accounts
-acct._ensure_schema()
-acct.seed_default_accounts()
-
+import backend.accounting_engine.importer as importer
+import backend.accounting_engine.rules as rules
 
 def create_transaction_and_post(
     user_id: Optional[str],
@@ -24,24 +19,46 @@ def create_transaction_and_post(
     description: Optional[str] = None,
     source: str = "manual",
     reference: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Convenience function: creates a transaction record, then creates a basic journal entry.
-    For demo purposes: posts a simple debit to Bank (1100) and credit to Sales (4000) when amount > 0.
-    Replace this logic with the production rules engine later.
+    Convenience function: creates a transaction record, then posts a journal entry.
+    The debit/credit accounts come from the posting rules engine (e.g. electricity
+    bills -> Utilities Expense / Bank); unmatched positive amounts fall back to
+    Debit Bank (1100) / Credit Sales (4000).
+
+    When 'idempotency_key' is given, a retry with the same key returns the original
+    transaction/journal ids instead of posting again (reusing it with different
+    arguments raises acct.IdempotencyKeyReused). Without a key, an identical
+    transaction already recorded (acct.FINGERPRINT_FIELDS, same user) is returned
+    with its existing journal entry.
     """
-    tx_id = acct.create_transaction(user_id=user_id, amount=amount, description=description or "", source=source, reference=reference)
+    acct.init_db()
+    if idempotency_key:
+        return acct.run_idempotent(
+            idempotency_key,
+            "add_transaction",
+            lambda: create_transaction_and_post(user_id, date, amount, description, source, reference),
+            request_hash=acct.idempotency_request_hash([user_id, date, amount, description, source, reference]),
+        )
 
-    # Build a simple journal entry: Debit Bank (1100) / Credit Sales (4000)
     entry_date = date.date().isoformat()
-    lines = [
-        {"account_code": "1100", "debit": float(amount), "credit": 0.0},
-        {"account_code": "4000", "debit": 0.0, "credit": float(amount)},
-    ]
+    tx_id = acct.create_transaction(
+        user_id=user_id, amount=amount, description=description or "", source=source, reference=reference, date=entry_date
+    )
 
-    je_id = acct.create_journal_entry(transaction_id=tx_id, entry_date=entry_date, description=description or "Auto-posted", lines=lines)
+    posting = rules.get_default_engine().classify(description or "", source, reference, amount)
+    # an identical transaction already recorded (same fingerprint) keeps its original entry
+    je_id = acct.transaction_journal_entry(tx_id)
+    if je_id is None:
+        value = abs(float(amount))
+        lines = [
+            {"account_code": posting["debit"], "debit": value, "credit": 0.0},
+            {"account_code": posting["credit"], "debit": 0.0, "credit": value},
+        ]
+        je_id = acct.create_journal_entry(transaction_id=tx_id, entry_date=entry_date, description=description or "Auto-posted", lines=lines)
 
-    return {"transaction_id": tx_id, "journal_entry_id": je_id}
+    return {"transaction_id": tx_id, "journal_entry_id": je_id, "rule": posting["rule"]}
 
 
 def get_trial_balance(from_date: Optional[str] = None, to_date: Optional[str] = None) -> Dict[str, Any]:
@@ -70,31 +87,32 @@ def get_balance_sheet(as_of: Optional[str] = None) -> Dict[str, Any]:
     return bs
 
 
-def import_transactions_from_csv_bytes(csv_bytes: bytes, user_id: Optional[str] = None) -> Dict[str, Any]:
+def import_transactions_from_csv_bytes(csv_bytes: bytes, user_id: Optional[str] = None, post: bool = False) -> Dict[str, Any]:
     """
     Import transactions from uploaded CSV content (bytes), create transactions, and optionally post them.
-    Returns a summary of created transaction IDs.
+    Returns a summary of created transaction IDs and per-row errors.
     Expected CSV headers: date,description,amount,currency,source,reference
     """
-    text = csv_bytes.decode("utf-8")
-    reader = csv.DictReader(io.StringIO(text))
-    created = []
-    for row in reader:
-        try:
-            date_str = row.get("date") or datetime.utcnow().date().isoformat()
-            date = datetime.fromisoformat(date_str) if "T" in date_str else datetime.fromisoformat(date_str + "T00:00:00")
-            amount = float(row.get("amount", "0") or "0")
-            description = row.get("description") or ""
-            source = row.get("source") or "csv_import"
-            reference = row.get("reference")
-            tx_id = acct.create_transaction(user_id=user_id, amount=amount, description=description, source=source, reference=reference)
-            created.append(tx_id)
-        except Exception as e:
-            # skip malformed rows but continue
-            print(f"[adapter_accounting] skipping row due to error: {e}")
-            continue
-
-    return {"created_transactions": created, "count": len(created)}
+    if post:
+        acct.init_db()
+    return importer.import_transactions_stream(csv_bytes, user_id=user_id, collect_ids=True, post=post)
+
+
+def import_transactions_from_csv_file(
+    source: Union[str, BinaryIO],
+    user_id: Optional[str] = None,
+    batch_size: int = importer.DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    post: bool = False,
+) -> Dict[str, Any]:
+    """
+    Stream a (possibly multi-GB) CSV file or upload stream into the ledger in batches.
+    Memory stays flat; the summary holds counts and a bounded sample of row errors.
+    With post=True every imported row is also journal-posted through the rules engine.
+    """
+    if post:
+        acct.init_db()
+    return importer.import_transactions_stream(source, user_id=user_id, batch_size=batch_size, progress=progress, post=post)
 
 
 # Expose a small convenience to be used by API main
@@ -104,4 +122,5 @@ __all__ = [
     "get_profit_and_loss",
     "get_balance_sheet",
     "import_transactions_from_csv_bytes",
+    "import_transactions_from_csv_file",
 ]
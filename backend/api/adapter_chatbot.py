@@ -92,8 +92,10 @@ def dispatch(intent: str, entities: Dict[str, Any]) -> Dict[str, Any]:
 
     # Reminders
     if intent == "INTENT_SEND_REMINDER":
-        # simple example
-        scheduler.run_task_now("daily_summary")
+        # simple example; runs on the scheduler's pool, the reply doesn't wait for it
+        run = scheduler.run_task_now("daily_summary")
+        if run.status == "skipped":
+            return {"reply": "Reminder task is already running."}
         return {"reply": "Reminder task has been triggered."}
 
     # Fallback
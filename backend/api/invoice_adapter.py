@@ -10,6 +10,7 @@ This module connects:
 This keeps the API very slim and clean.
 """
 
+import hashlib
 import os
 import uuid
 from typing import Dict, Any
@@ -17,11 +18,8 @@ from datetime import datetime
 
 import backend.automation.invoice_parser as parser
 import backend.accounting_engine.stubs as acct
-
-
-# Ensure DB + default accounts
-acct._ensure_schema()
-acct.seed_default_accounts()
+import backend.accounting_engine.importer as importer
+import backend.accounting_engine.rules as rules
 
 
 # ------------------------------------------------------------
@@ -43,17 +41,39 @@ def save_temp_file(upload_file) -> str:
     return path
 
 
+def _upload_digest(upload_file) -> str:
+    """Hash of the uploaded file's contents (read in blocks, then rewound)."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: upload_file.file.read(1 << 20), b""):
+        digest.update(block)
+    upload_file.file.seek(0)
+    return digest.hexdigest()
+
+
 # ------------------------------------------------------------
 # Core Handler
 # ------------------------------------------------------------
-def process_invoice(upload_file, user_id=None) -> Dict[str, Any]:
+def process_invoice(upload_file, user_id=None, idempotency_key=None) -> Dict[str, Any]:
     """
     Full pipeline:
     - Save file
     - Parse invoice data
     - Create a transaction in DB
     - Auto-post a journal entry
+
+    A retried upload carrying the same 'idempotency_key' returns the stored result
+    without saving, parsing or posting the invoice again; the same key with a
+    different file raises acct.IdempotencyKeyReused.
     """
+    acct.init_db()
+    if idempotency_key:
+        return acct.run_idempotent(
+            idempotency_key,
+            "invoice_upload",
+            lambda: process_invoice(upload_file, user_id=user_id),
+            request_hash=_upload_digest(upload_file),
+        )
+
     # 1. Save file
     file_path = save_temp_file(upload_file)
 
@@ -65,24 +85,30 @@ def process_invoice(upload_file, user_id=None) -> Dict[str, Any]:
     vendor = data["vendor"]
 
     # 3. Create a transaction
+    description = f"Invoice {invoice_number} from {vendor}"
     tx_id = acct.create_transaction(
         user_id=user_id,
         amount=amount,
-        description=f"Invoice {invoice_number} from {vendor}",
+        description=description,
         source="invoice_upload",
         reference=invoice_number,
+        date=date_iso,
     )
 
-    # 4. Auto-post a journal entry
-    je_id = acct.create_journal_entry(
-        transaction_id=tx_id,
-        entry_date=date_iso,
-        description=f"Auto-entry for invoice {invoice_number}",
-        lines=[
-            {"account_code": "1100", "debit": amount, "credit": 0.0},  # Debit Bank
-            {"account_code": "4000", "debit": 0.0, "credit": amount},  # Credit Sales/Revenue
-        ],
-    )
+    # 4. Auto-post a journal entry (accounts chosen by the posting rules engine)
+    posting = rules.get_default_engine().classify(description, "invoice_upload", invoice_number, amount)
+    # a re-uploaded invoice maps to the same transaction; don't post it twice
+    je_id = acct.transaction_journal_entry(tx_id)
+    if je_id is None:
+        je_id = acct.create_journal_entry(
+            transaction_id=tx_id,
+            entry_date=date_iso,
+            description=f"Auto-entry for invoice {invoice_number}",
+            lines=[
+                {"account_code": posting["debit"], "debit": abs(amount), "credit": 0.0},
+                {"account_code": posting["credit"], "debit": 0.0, "credit": abs(amount)},
+            ],
+        )
 
     # 5. Return structured response
     return {
@@ -95,10 +121,28 @@ def process_invoice(upload_file, user_id=None) -> Dict[str, Any]:
         },
         "transaction_id": tx_id,
         "journal_entry_id": je_id,
+        "posting_rule": posting["rule"],
         "file_saved_as": file_path,
     }
 
 
+# ------------------------------------------------------------
+# Batch Handler (vendor invoice dumps)
+# ------------------------------------------------------------
+def process_invoice_batch(paths, user_id=None, workers=None, timeout=parser.DEFAULT_TIMEOUT_SECONDS, progress=None) -> Dict[str, Any]:
+    """
+    Parse a directory (or list of files) of invoices across a process pool and
+    bulk-post them. Returns the importer summary; files that failed or timed
+    out are listed in summary["errors"] by path.
+    """
+    acct.init_db()
+    if isinstance(paths, str):
+        results = parser.parse_invoice_directory(paths, workers=workers, timeout=timeout)
+    else:
+        results = parser.parse_invoices(paths, workers=workers, timeout=timeout)
+    return importer.import_invoices(results, user_id=user_id, progress=progress)
+
+
 # ------------------------------------------------------------
 # Demo
 # ------------------------------------------------------------
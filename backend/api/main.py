@@ -13,13 +13,41 @@ This file exposes example endpoints for:
 Replace stub logic with real module calls (accounting_engine, automation, ai_chatbot).
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Callable
+from contextlib import asynccontextmanager
 from datetime import datetime
+import os
 import uuid
 
-app = FastAPI(title="XYLO API", version="0.1.0")
+import backend.accounting_engine.stubs as acct
+
+# Run the automation scheduler inside this process:
+#   "off"    (default) - run it elsewhere, e.g. python -m backend.automation.scheduler
+#   "async"  - as a task on this app's event loop
+#   "thread" - in a background thread
+SCHEDULER_MODE = os.environ.get("XYLO_SCHEDULER", "off").lower()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One-time startup work lives here (not at import time) so workers boot fast
+    acct.init_db()
+    scheduler = None
+    if SCHEDULER_MODE in ("async", "thread"):
+        from backend.automation import scheduler
+        if SCHEDULER_MODE == "async":
+            await scheduler.start_async_scheduler()
+        else:
+            scheduler.start_scheduler()
+    yield
+    if scheduler is not None and SCHEDULER_MODE == "async":
+        await scheduler.stop_async_scheduler()
+
+
+app = FastAPI(title="XYLO API", version="0.1.0", lifespan=lifespan)
 
 
 # -------------------------
@@ -62,6 +90,27 @@ DEMO_USERS: Dict[str, dict] = {}
 DEMO_TRANSACTIONS: Dict[str, dict] = {}
 
 
+# -------------------------
+# Idempotency-Key support
+# -------------------------
+def _idempotent(key: Optional[str], scope: str, handler: Callable[[], GenericResponse], payload: Any = None) -> Any:
+    """
+    Runs 'handler' once per Idempotency-Key; retries get the stored response back.
+    'payload' is the request body: reusing a key with a different body is a 422.
+    Requests without the header are processed normally.
+    """
+    if not key:
+        return handler()
+    try:
+        return acct.run_idempotent(
+            key, scope, lambda: jsonable_encoder(handler()), request_hash=acct.idempotency_request_hash(payload)
+        )
+    except acct.IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except acct.IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 # -------------------------
 # Auth Endpoints (stubs)
 # -------------------------
@@ -95,11 +144,14 @@ def me():
 # Accounting Endpoints (stubs)
 # -------------------------
 @app.post("/accounting/add_transaction", response_model=GenericResponse)
-def add_transaction(tx: TransactionCreate):
-    tx_id = str(uuid.uuid4())
-    DEMO_TRANSACTIONS[tx_id] = tx.dict()
-    # In real system: call accounting_engine.create_journal_entries(...)
-    return GenericResponse(status="success", data={"transaction_id": tx_id}, timestamp=datetime.utcnow())
+def add_transaction(tx: TransactionCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    def _create():
+        tx_id = str(uuid.uuid4())
+        DEMO_TRANSACTIONS[tx_id] = tx.dict()
+        # In real system: call accounting_engine.create_journal_entries(...)
+        return GenericResponse(status="success", data={"transaction_id": tx_id}, timestamp=datetime.utcnow())
+
+    return _idempotent(idempotency_key, "add_transaction", _create, payload=jsonable_encoder(tx))
 
 
 @app.get("/accounting/trial_balance", response_model=GenericResponse)
@@ -133,6 +185,17 @@ def send_payment_reminder(invoice_reference: str):
     return GenericResponse(status="success", data={"invoice": invoice_reference, "sent": True}, timestamp=datetime.utcnow())
 
 
+@app.get("/automation/scheduler/metrics", response_model=GenericResponse)
+def scheduler_metrics(task: Optional[str] = None):
+    # Metrics of the scheduler running in this process (see XYLO_SCHEDULER)
+    from backend.automation import scheduler
+
+    data = scheduler.get_metrics(task)
+    if task is not None and task not in data["tasks"] and task not in scheduler.TASK_REGISTRY:
+        raise HTTPException(status_code=404, detail=f"Task '{task}' not found")
+    return GenericResponse(status="success", data=data, timestamp=datetime.utcnow())
+
+
 # -------------------------
 # Chatbot Endpoint (stub)
 # -------------------------
@@ -147,13 +210,20 @@ def chatbot_message(q: ChatQuery):
 # Invoice Upload (stub)
 # -------------------------
 @app.post("/invoices/upload", response_model=GenericResponse)
-async def upload_invoice(file: UploadFile = File(...)):
+async def upload_invoice(file: UploadFile = File(...), idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     # In real system:
     # 1. save file
     # 2. run invoice OCR/parser -> extract fields
     # 3. create transaction and journal entries
-    file_info = {"filename": file.filename, "content_type": file.content_type}
-    return GenericResponse(status="success", data={"uploaded": file_info}, timestamp=datetime.utcnow())
+    def _upload():
+        file_info = {"filename": file.filename, "content_type": file.content_type}
+        return GenericResponse(status="success", data={"uploaded": file_info}, timestamp=datetime.utcnow())
+
+    payload = None
+    if idempotency_key:
+        payload = await file.read()
+        await file.seek(0)
+    return _idempotent(idempotency_key, "invoice_upload", _upload, payload=payload)
 
 
 # -------------------------
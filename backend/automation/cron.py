@@ -0,0 +1,185 @@
+# backend/automation/cron.py
+"""
+XYLO — Cron Expressions for the Scheduler
+
+Standard 5-field cron expressions compiled once into integer bitsets:
+
+    ┌─ minute (0-59)
+    │ ┌─ hour (0-23)
+    │ │ ┌─ day of month (1-31, or L = last day of the month)
+    │ │ │ ┌─ month (1-12 or jan-dec)
+    │ │ │ │ ┌─ day of week (0-7 or sun-sat; 0 and 7 are Sunday)
+    * * * * *
+
+Each field accepts *, lists (1,15), ranges (mon-fri), and steps (*/15, 8-18/2).
+As in Vixie cron, when both day fields are restricted a day matches either.
+
+next_after() jumps field by field with bit scans: to the next matching month,
+then day (via a memoised per-month bitset of matching days), hour and minute.
+It never steps day by day or minute by minute. An optional IANA
+timezone (zoneinfo) interprets the expression in that zone's wall-clock time.
+
+Examples:
+    "0 22 L * *"          month-end close at 22:00 on the last day of each month
+    "0 9 1 1,4,7,10 *"    quarterly report, 09:00 on the first day of each quarter
+    "*/15 9-18 * * mon-fri"
+"""
+
+import calendar
+from datetime import datetime, timedelta
+from typing import Optional
+
+MONTH_NAMES = {name: i for i, name in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+DAY_NAMES = {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+# Give up if no match within this many years (e.g. "0 0 30 2 *" never fires)
+_HORIZON_YEARS = 8
+
+
+def _next_bit(bits: int, start: int) -> Optional[int]:
+    """Index of the lowest set bit >= start, or None."""
+    rest = bits >> start
+    if not rest:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+
+def _parse_field(expr: str, lo: int, hi: int, names: Optional[dict] = None) -> int:
+    def value(token: str) -> int:
+        token = token.lower()
+        if names and token in names:
+            return names[token]
+        if not token.isdigit():
+            raise ValueError(f"invalid value '{token}'")
+        return int(token)
+
+    bits = 0
+    for part in expr.split(","):
+        span, _, step_str = part.partition("/")
+        step = int(step_str) if step_str else 1
+        if step <= 0:
+            raise ValueError(f"invalid step in '{part}'")
+        if span == "*":
+            first, last = lo, hi
+        elif "-" in span:
+            a, b = span.split("-", 1)
+            first, last = value(a), value(b)
+        else:
+            first = value(span)
+            last = hi if step_str else first  # "5/15" means 5-max/15
+        if not (lo <= first <= last <= hi):
+            raise ValueError(f"'{part}' is out of range {lo}-{hi}")
+        for v in range(first, last + 1, step):
+            bits |= 1 << v
+    return bits
+
+
+class CronTrigger:
+    """
+    Compiled cron expression. next_after(dt) returns the first matching minute
+    strictly after 'dt' (naive datetimes in the server's local time, like the
+    rest of the scheduler).
+    """
+
+    def __init__(self, expr: str, tz: Optional[str] = None):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields, got {len(fields)}: '{expr}'")
+        minute, hour, dom, month, dow = fields
+        self.expr = expr
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+
+        dom_parts = dom.split(",")
+        self.last_day = "L" in (p.upper() for p in dom_parts)
+        dom_rest = ",".join(p for p in dom_parts if p.upper() != "L")
+        self.days = _parse_field(dom_rest, 1, 31) if dom_rest else 0
+        self.months = _parse_field(month, 1, 12, MONTH_NAMES)
+        weekdays = _parse_field(dow, 0, 7, DAY_NAMES)
+        self.weekdays = (weekdays | (weekdays >> 7)) & 0x7F  # 7 is also Sunday
+
+        self.dom_restricted = dom != "*"
+        self.dow_restricted = dow != "*"
+        self._month_cache = {}
+
+        self.tz = None
+        if tz:
+            from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+            try:
+                self.tz = ZoneInfo(tz)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"unknown timezone '{tz}'")
+
+        # reject expressions that can never fire (e.g. 30 February)
+        self._next_wall(datetime(2000, 1, 1))
+
+    # --------------------------------------------------------
+    def _month_days(self, year: int, month: int) -> int:
+        """Bitset of matching days (bit d = day d) for one month, memoised."""
+        key = (year, month)
+        bits = self._month_cache.get(key)
+        if bits is None:
+            first_weekday, ndays = calendar.monthrange(year, month)
+            dom = self.days & ((1 << (ndays + 1)) - 2)
+            if self.last_day:
+                dom |= 1 << ndays
+            dow = 0
+            cron_weekday = (first_weekday + 1) % 7  # cron counts from Sunday = 0
+            for day in range(1, ndays + 1):
+                if (self.weekdays >> ((cron_weekday + day - 1) % 7)) & 1:
+                    dow |= 1 << day
+            if self.dom_restricted and self.dow_restricted:
+                bits = dom | dow
+            elif self.dom_restricted:
+                bits = dom
+            else:
+                bits = dow
+            if len(self._month_cache) >= 256:
+                self._month_cache.clear()
+            self._month_cache[key] = bits
+        return bits
+
+    def _next_wall(self, after: datetime) -> datetime:
+        """Next matching wall-clock minute strictly after 'after' (naive)."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        horizon = t.year + _HORIZON_YEARS
+        while t.year <= horizon:
+            month = _next_bit(self.months, t.month)
+            if month is None:
+                t = datetime(t.year + 1, _next_bit(self.months, 1), 1)
+                continue
+            if month != t.month:
+                t = datetime(t.year, month, 1)
+                continue
+            day = _next_bit(self._month_days(t.year, t.month), t.day)
+            if day is None:
+                t = datetime(t.year + (t.month == 12), t.month % 12 + 1, 1)
+                continue
+            if day != t.day:
+                t = datetime(t.year, t.month, day)
+            hour = _next_bit(self.hours, t.hour)
+            if hour is None:
+                t = datetime(t.year, t.month, t.day) + timedelta(days=1)
+                continue
+            if hour != t.hour:
+                t = t.replace(hour=hour, minute=0)
+            minute = _next_bit(self.minutes, t.minute)
+            if minute is None:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            return t.replace(minute=minute)
+        raise ValueError(f"cron expression '{self.expr}' never fires")
+
+    def next_after(self, dt: datetime) -> datetime:
+        if self.tz is None:
+            return self._next_wall(dt)
+        wall = dt.astimezone(self.tz).replace(tzinfo=None)
+        while True:
+            wall = self._next_wall(wall)
+            local = wall.replace(tzinfo=self.tz).astimezone().replace(tzinfo=None)
+            if local > dt:  # a DST fold can map a later wall time to an earlier instant
+                return local
+
+    def __repr__(self):
+        return f"<CronTrigger '{self.expr}'{f' {self.tz.key}' if self.tz else ''}>"
@@ -7,29 +7,392 @@ This module provides:
 - Support for attachments
 - Simple HTML or text emails
 - Standardised email wrapper for automation tasks
+- A pool of logged-in SMTP connections reused across messages (one TLS
+  handshake + login per connection, not per email), and send_bulk() to push a
+  batch through it concurrently
+- Attachments read and base64-encoded once per file version and shared by
+  every message that attaches them (AttachmentCache)
 
 For production:
 - Configure environmental variables (SMTP server, credentials)
 - Replace smtplib with transactional email (SendGrid, SES, Mailgun)
 """
 
+import atexit
+import os
 import smtplib
 import ssl
-from email.message import EmailMessage
-from typing import Optional, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage, MIMEPart
+from typing import Any, Dict, Iterable, Optional, List, Union
 
 
 # ------------------------------------------------------------
 # Configuration (use environment variables in production)
 # ------------------------------------------------------------
-SMTP_HOST = "smtp.gmail.com"
-SMTP_PORT = 465  # SSL
-SMTP_USERNAME = "your-email@gmail.com"  # placeholder
-SMTP_PASSWORD = "your-app-password"     # placeholder
+SMTP_HOST = os.environ.get("XYLO_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("XYLO_SMTP_PORT", "465"))  # SSL
+SMTP_USE_SSL = os.environ.get("XYLO_SMTP_SSL", "1") != "0"  # 0 = plain SMTP (local relays, tests)
+SMTP_USERNAME = os.environ.get("XYLO_SMTP_USERNAME", "your-email@gmail.com")  # placeholder
+SMTP_PASSWORD = os.environ.get("XYLO_SMTP_PASSWORD", "your-app-password")     # placeholder
 
 SENDER_NAME = "XYLO Automation"
 SENDER_EMAIL = SMTP_USERNAME
 
+# Connection pool
+SMTP_POOL_SIZE = int(os.environ.get("XYLO_SMTP_POOL_SIZE", "4"))
+SMTP_TIMEOUT_SECONDS = 30.0
+# Idle connections older than this are dropped instead of reused (servers
+# typically close idle sessions after a few minutes)
+SMTP_MAX_IDLE_SECONDS = 60.0
+
+# Encoded attachments kept in memory (MB of base64 text, 0 disables)
+ATTACHMENT_CACHE_MAX_BYTES = int(float(os.environ.get("XYLO_ATTACHMENT_CACHE_MB", "64")) * 1024 * 1024)
+
+
+# ------------------------------------------------------------
+# Attachment cache
+# ------------------------------------------------------------
+class AttachmentCache:
+    """
+    Ready-to-attach MIME parts, keyed by (path, mtime, size).
+
+    The first message attaching a file reads and base64-encodes it; later
+    messages reuse the same part object, so a report mailed to 500 recipients
+    is read and encoded once and held in memory once. A file changed on disk
+    gets a new key. Least recently used parts are dropped past 'max_bytes';
+    a single file larger than that is never cached, but one send_bulk() call
+    still encodes it only once (see part()'s 'batch').
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = ATTACHMENT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._parts: "OrderedDict[tuple, MIMEPart]" = OrderedDict()
+        self._sizes: Dict[tuple, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _encode(path: str) -> MIMEPart:
+        with open(path, "rb") as f:
+            data = f.read()
+        part = MIMEPart()
+        part.set_content(data, maintype="application", subtype="octet-stream", filename=path.split("/")[-1])
+        return part
+
+    def part(self, path: str, batch: Optional[Dict[tuple, MIMEPart]] = None) -> MIMEPart:
+        """
+        The MIME part for 'path'. Parts too large for the cache are kept in
+        'batch' instead, when given, so the caller's other messages share them.
+        """
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        if batch is not None and key in batch:
+            return batch[key]
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+                self.hits += 1
+                return part
+            self.misses += 1
+
+        part = self._encode(path)
+        size = len(part.get_payload())
+        if size > self.max_bytes:
+            if batch is not None:
+                batch[key] = part
+            return part
+        with self._lock:
+            if key not in self._parts:
+                self._parts[key] = part
+                self._sizes[key] = size
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                old, _ = self._parts.popitem(last=False)
+                self._bytes -= self._sizes.pop(old)
+        return part
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._parts), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+_ATTACHMENTS = AttachmentCache()
+
+
+class _BatchAttachments:
+    """One send_bulk() call's view of an AttachmentCache, sharing oversize parts too."""
+
+    def __init__(self, cache: AttachmentCache):
+        self.cache = cache
+        self.oversize: Dict[tuple, MIMEPart] = {}
+
+    def part(self, path: str) -> MIMEPart:
+        return self.cache.part(path, self.oversize)
+
+
+# ------------------------------------------------------------
+# Message building
+# ------------------------------------------------------------
+def build_message(
+    to: str,
+    subject: str,
+    body: str,
+    attachments: Optional[List[str]] = None,
+    html: bool = False,
+    attachment_cache: Optional[Union[AttachmentCache, "_BatchAttachments"]] = None,
+) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = f"{SENDER_NAME} <{SENDER_EMAIL}>"
+    msg["To"] = to
+    msg["Subject"] = subject
+
+    if html:
+        msg.add_alternative(body, subtype="html")
+    else:
+        msg.set_content(body)
+
+    # Attach files (encoded once, shared across messages)
+    if attachments:
+        cache = attachment_cache or _ATTACHMENTS
+        for path in attachments:
+            try:
+                part = cache.part(path)
+            except Exception as e:
+                print(f"[email_service] Could not attach '{path}': {e}")
+                continue
+            if msg.get_content_type() != "multipart/mixed":
+                msg.make_mixed()
+            msg.attach(part)
+    return msg
+
+
+# ------------------------------------------------------------
+# SMTP connection pool
+# ------------------------------------------------------------
+def _connection_lost(e: Exception) -> bool:
+    """
+    True if 'e' means the SMTP session is gone (reconnect and retry), False for
+    per-message rejections, after which smtplib has reset the session.
+    """
+    if isinstance(e, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code == 421  # service closing transmission channel
+    if isinstance(e, smtplib.SMTPException):
+        return False
+    return isinstance(e, OSError)  # reset, broken pipe, timeout
+
+
+def is_permanent_failure(e: Exception) -> bool:
+    """
+    True for 5xx SMTP replies (unknown mailbox, message refused): retrying the
+    same message will not help. Connection problems and 4xx are temporary.
+    """
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return isinstance(e, (ValueError, TypeError))  # message could not be built
+
+
+class SMTPPool:
+    """
+    Up to 'size' logged-in SMTP connections, kept open and reused.
+
+    send() checks out an idle connection (or opens one while under 'size'),
+    sends, and puts it back. A connection that turns out to be dead (idle
+    timeout, server restart) is replaced once and the message retried on the
+    new one. Thread-safe; send_many() sends a batch over all connections
+    concurrently.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_ssl: Optional[bool] = None,
+        context: Optional[ssl.SSLContext] = None,
+        timeout: float = SMTP_TIMEOUT_SECONDS,
+        max_idle: float = SMTP_MAX_IDLE_SECONDS,
+    ):
+        self.size = size or SMTP_POOL_SIZE
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.username = SMTP_USERNAME if username is None else username
+        self.password = SMTP_PASSWORD if password is None else password
+        self.use_ssl = SMTP_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # one SSL context for every connection (loading CA certs is not free)
+        self._context = context or (ssl.create_default_context() if self.use_ssl else None)
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[tuple] = []  # (connection, last_used), most recent last
+        self._closed = False
+        self.connections_opened = 0
+        self.reconnects = 0
+        self.messages_sent = 0
+
+    # --------------------------------------------------------
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, context=self._context, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.username:
+                conn.login(self.username, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        stale = []
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("SMTP pool is closed")
+                conn = None
+                while self._idle:
+                    candidate, last_used = self._idle.pop()
+                    if time.monotonic() - last_used <= self.max_idle:
+                        conn = candidate
+                        break
+                    stale.append(candidate)
+            for old in stale:
+                self._close(old)
+            return conn or self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn: Optional[smtplib.SMTP]):
+        """Return a healthy connection to the pool (None only frees the slot)."""
+        if conn is not None:
+            with self._lock:
+                if not self._closed:
+                    self._idle.append((conn, time.monotonic()))
+                    conn = None
+            if conn is not None:
+                self._close(conn)
+        self._slots.release()
+
+    # --------------------------------------------------------
+    def send(self, msg: EmailMessage):
+        """
+        Send one message. Raises smtplib.SMTPException / OSError on failure.
+        """
+        conn = self._checkout()
+        try:
+            try:
+                conn.send_message(msg)
+            except Exception as e:
+                if not _connection_lost(e):
+                    raise
+                self._close(conn)
+                conn = None
+                conn = self._connect()
+                with self._lock:
+                    self.reconnects += 1
+                conn.send_message(msg)
+        except Exception as e:
+            if conn is not None and _connection_lost(e):
+                self._close(conn)
+                conn = None
+            raise
+        finally:
+            self._checkin(conn)
+        with self._lock:
+            self.messages_sent += 1
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> List[Optional[Exception]]:
+        """
+        Send a batch over up to 'size' connections at once. Returns one entry
+        per message, in order: None if sent, else the exception.
+        """
+        messages = list(messages)
+
+        def _send(msg: EmailMessage) -> Optional[Exception]:
+            try:
+                self.send(msg)
+                return None
+            except Exception as e:
+                return e
+
+        if len(messages) <= 1:
+            return [_send(m) for m in messages]
+        with ThreadPoolExecutor(max_workers=min(self.size, len(messages)), thread_name_prefix="xylo-smtp") as pool:
+            return list(pool.map(_send, messages))
+
+    def close(self):
+        """QUIT every idle connection; connections in use close when returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "connections_opened": self.connections_opened,
+                "reconnects": self.reconnects,
+                "messages_sent": self.messages_sent,
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_pool: Optional[SMTPPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """
+    Process-wide pool configured from the XYLO_SMTP_* settings, created on
+    first use and closed at exit.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SMTPPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
 
 # ------------------------------------------------------------
 # Public Function: send_email
@@ -40,52 +403,22 @@ def send_email(
     body: str,
     attachments: Optional[List[str]] = None,
     html: bool = False,
+    pool: Optional[SMTPPool] = None,
 ) -> bool:
     """
-    Sends an email via SMTP.
+    Sends an email via SMTP, over a pooled connection.
 
     :param to: recipient email
     :param subject: subject line
     :param body: email content
     :param attachments: list of file paths
     :param html: interpret body as HTML
+    :param pool: SMTPPool to use (default: the process-wide pool)
     :return: success (True/False)
     """
     try:
-        msg = EmailMessage()
-        msg["From"] = f"{SENDER_NAME} <{SENDER_EMAIL}>"
-        msg["To"] = to
-        msg["Subject"] = subject
-
-        if html:
-            msg.add_alternative(body, subtype="html")
-        else:
-            msg.set_content(body)
-
-        # Attach files
-        if attachments:
-            for path in attachments:
-                try:
-                    with open(path, "rb") as f:
-                        data = f.read()
-                        filename = path.split("/")[-1]
-                        msg.add_attachment(
-                            data,
-                            maintype="application",
-                            subtype="octet-stream",
-                            filename=filename,
-                        )
-                except Exception as e:
-                    print(f"[email_service] Could not attach '{path}': {e}")
-
-        # SSL context
-        context = ssl.create_default_context()
-
-        # Connect and send
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context) as server:
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-
+        msg = build_message(to, subject, body, attachments, html)
+        (pool or get_pool()).send(msg)
         print(f"[XYLO Email] Sent email to {to} — '{subject}'")
         return True
 
@@ -94,6 +427,40 @@ def send_email(
         return False
 
 
+def send_bulk(emails: Iterable[Dict[str, Any]], pool: Optional[SMTPPool] = None) -> List[bool]:
+    """
+    Sends many emails concurrently over the pool's connections.
+
+    :param emails: dicts of send_email arguments (to, subject, body, attachments, html)
+    :param pool: SMTPPool to use (default: the process-wide pool)
+    :return: success flag per email, in order
+    """
+    pool = pool or get_pool()
+    attachments = _BatchAttachments(_ATTACHMENTS)
+    messages: List[Optional[EmailMessage]] = []
+    errors: List[Optional[Exception]] = []
+    for email in emails:
+        try:
+            messages.append(build_message(**email, attachment_cache=attachments))
+            errors.append(None)
+        except Exception as e:
+            messages.append(None)
+            errors.append(e)
+
+    sent = pool.send_many(m for m in messages if m is not None)
+    it = iter(sent)
+    for i, msg in enumerate(messages):
+        if msg is not None:
+            errors[i] = next(it)
+
+    failed = [e for e in errors if e]
+    if errors:
+        print(f"[XYLO Email] Sent {len(errors) - len(failed)}/{len(errors)} emails ({pool.size} connections)")
+    for error in failed[:5]:
+        print(f"[XYLO Email] Error sending email: {type(error).__name__}: {error}")
+    return [e is None for e in errors]
+
+
 # For quick smoke testing:
 if __name__ == "__main__":
     print("Sending test email...")
@@ -13,46 +13,303 @@ This module extracts useful accounting data from invoices such as:
 It supports:
 - PDF invoices (using PyPDF2 text extraction)
 - Image/PDF text as plain string (future: OCR library)
+- Cached text for previously seen PDFs (content-addressed, see text_cache.py)
+- Page streaming for long PDFs: pages are decoded one at a time and fed to the
+  field extractor, stopping as soon as every field is found (optionally only
+  the first / last N pages are considered)
+- Batches / whole directories across a process pool (parse_invoices), with
+  per-file timeouts and results yielded as they complete
+
+CLI:
+    python -m backend.automation.invoice_parser invoices/ --workers 8 --timeout 30
+    python -m backend.automation.invoice_parser a.pdf b.pdf --post --user-id u1
 
 This version is intentionally simple but effective.
 Can be upgraded to Tesseract OCR or cloud OCR later.
 """
 
+import io
+import os
 import re
-from typing import Dict, Any, Optional
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None  # optional dependency
+from backend.automation.text_cache import TextCache, get_text_cache
+
+# Bump whenever text extraction output changes, to invalidate cached text
+EXTRACTOR_VERSION = "1"
+
+
+@lru_cache(maxsize=None)
+def _load_pypdf2():
+    """
+    Import PyPDF2 on first PDF read (optional dependency, slow to import).
+    Returns the module, or None if it is not installed.
+    """
+    try:
+        import PyPDF2
+    except Exception:
+        return None
+    return PyPDF2
+
+
+# ------------------------------------------------------------
+# Compiled Field Patterns
+# ------------------------------------------------------------
+# One alternation covers every labelled field, so a single finditer() walks the
+# text once. It runs on a lowercased copy without IGNORECASE, and every branch
+# begins with a plain literal character: that lets the regex engine skip ahead
+# using the set of possible first characters instead of trying every branch at
+# every position. Word boundaries are checked in Python on the (few) hits for
+# the same reason. Each branch ends with an empty marker group (?P<f12>) so
+# m.lastgroup identifies which field matched; its value is in (?P<v12>...).
+_NUM = r"\d[\d,]*(?:\.\d+)?"
+_CURRENCY = r"(?:rs\.?|inr|₹|\$)"
+_MONTHS = "jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec"
+_NUMERIC_DATE = r"\d{2}[/.-]\d{2}[/.-]\d{4}|\d{4}-\d{2}-\d{2}"
+_MONTH_DATE = rf"(?:{_MONTHS})[a-z]*\.?\s+\d{{1,2}},?\s+\d{{4}}"
+_DAY_MONTH_DATE = rf"\d{{1,2}}\s+(?:{_MONTHS})[a-z]*\.?,?\s+\d{{4}}"
+_ANY_DATE = rf"{_NUMERIC_DATE}|{_MONTH_DATE}|{_DAY_MONTH_DATE}"
+
+# (field kind, label/rank key, branch regex); "{v}" marks the value group,
+# branches without one use the whole match as the value.
+_FIELD_BRANCHES = [
+    ("invoice_number", "inv", r"inv[-\s]?\d+"),
+    ("invoice_number", "inv_label", r"invoice\s*(?:number|no\.?|#)[:\s#]*{v}[a-z0-9-]+)"),
+    ("invoice_number", "bill", r"bill\s*#\s*{v}[a-z0-9-]+)"),
+    ("total", "grand total", rf"grand\s+total\s*[:\-]?\s*{_CURRENCY}?\s*{{v}}{_NUM})"),
+    ("total", "amount due", rf"amount\s+due\s*[:\-]?\s*{_CURRENCY}?\s*{{v}}{_NUM})"),
+    ("total", "balance due", rf"balance\s+due\s*[:\-]?\s*{_CURRENCY}?\s*{{v}}{_NUM})"),
+    ("total", "total", rf"total(?:\s+amount)?\s*[:\-]?\s*{_CURRENCY}?\s*{{v}}{_NUM})"),
+    ("amount", None, rf"amount\s*[:\-]?\s*{_CURRENCY}?\s*{{v}}{_NUM})"),
+    ("cur_amount", None, rf"rs\.?\s*{{v}}{_NUM})"),
+    ("cur_amount", None, rf"inr\s*{{v}}{_NUM})"),
+    ("cur_amount", None, rf"₹\s*{{v}}{_NUM})"),
+    ("cur_amount", None, rf"\$\s*{{v}}{_NUM})"),
+    # the vendor is whatever follows the first colon on the line ("Vendor
+    # Name: ACME" gives "ACME"), or the rest of the line without a colon
+    ("vendor", None, r"from\b(?:[^:\n]*:)?[ \t]*{v}[^\n]*)"),
+    ("vendor", None, r"vendor\b(?:[^:\n]*:)?[ \t]*{v}[^\n]*)"),
+    ("vendor", None, r"supplier\b(?:[^:\n]*:)?[ \t]*{v}[^\n]*)"),
+    ("date", "invoice date", rf"invoice\s+date\s*[:\-]?\s*{{v}}{_ANY_DATE})"),
+    ("date", "bill date", rf"bill\s+date\s*[:\-]?\s*{{v}}{_ANY_DATE})"),
+    ("date", "due date", rf"due\s+date\s*[:\-]?\s*{{v}}{_ANY_DATE})"),
+    ("date", "date", rf"date\s*[:\-]?\s*{{v}}{_ANY_DATE})"),
+] + [
+    # "Jan 12, 2025" style dates, one branch per distinct first letter
+    ("date", None, rf"{first}(?:{'|'.join(m[1:] for m in _MONTHS.split('|') if m[0] == first)})[a-z]*\.?\s+\d{{1,2}},?\s+\d{{4}}")
+    for first in sorted({m[0] for m in _MONTHS.split("|")})
+]
+
+
+def _build_field_pattern() -> str:
+    branches = []
+    for i, (_, _, rx) in enumerate(_FIELD_BRANCHES):
+        branches.append(rx.replace("{v}", f"(?P<v{i}>") + f"(?P<f{i}>)")
+    return "|".join(branches)
+
+
+_FIELD_PATTERN = _build_field_pattern()
+_FIELD_RE = re.compile(_FIELD_PATTERN)
+# Used only when lowercasing changes the text length (rare non-ASCII case folds)
+_FIELD_RE_CASELESS = re.compile(_FIELD_PATTERN, re.IGNORECASE)
+# marker group name -> (kind, label, value group name or None)
+_FIELD_MARKERS = {
+    f"f{i}": (kind, label, f"v{i}" if "{v}" in rx else None) for i, (kind, label, rx) in enumerate(_FIELD_BRANCHES)
+}
+
+# Unlabelled fallbacks: searched (first hit only) until found
+_DATE_RE = re.compile(rf"(?:{_ANY_DATE})", re.IGNORECASE)
+_DECIMAL_RE = re.compile(r"(?<![\w.])\d[\d,]*\.\d{2}(?![\w.])")
+
+# Higher wins; equal priority keeps the labelled total latest in the document
+# (totals sit at the bottom)
+_TOTAL_PRIORITY = {"grand total": 3, "amount due": 2, "balance due": 2, "total": 1}
+# Higher wins; equal priority keeps the date earliest in the document
+_DATE_PRIORITY = {"invoice date": 3, "bill date": 3, "date": 2, None: 1, "due date": 0}
+# Unlabelled amount fallbacks, best first
+_AMOUNT_FALLBACKS = ("amount", "cur_amount", "decimal")
+_INVOICE_PRIORITY = {"inv": 2, "inv_label": 1, "bill": 0}
+
+
+def _to_float(token: str) -> Optional[float]:
+    try:
+        return float(token.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _normalise_date(value: str) -> Optional[str]:
+    try:
+        if value[4:5] == "-":
+            return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+        parts = re.findall(r"[A-Za-z]+|\d+", value)
+        if len(parts) == 3 and all(p.isdigit() for p in parts):
+            day, month, year = parts
+            return datetime(int(year), int(month), int(day)).date().isoformat()
+        if parts[0].isdigit():
+            day, month, year = parts
+        else:
+            month, day, year = parts
+        return datetime.strptime(f"{day} {month[:3]} {year}", "%d %b %Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+# ------------------------------------------------------------
+# Single-Pass Extractor
+# ------------------------------------------------------------
+class InvoiceFieldExtractor:
+    """
+    Accumulates invoice fields from text fed in one or more pieces (whole text,
+    lines, or pages). Each piece is scanned once by the compiled field pattern;
+    unlabelled date/amount fallbacks stop at their first hit.
+
+    Ties are settled by document position, (piece index, offset), not by feed
+    order, so pages fed out of order (page 1, last page, then the middle) give
+    the same fields as the whole text fed at once.
+    """
+
+    def __init__(self):
+        self.invoice_number: Optional[str] = None
+        self._inv_rank = -1
+        self._inv_pos: Tuple[int, int] = (-1, -1)
+        self.date: Optional[str] = None
+        self._date_rank = -1
+        self._date_pos: Tuple[int, int] = (-1, -1)
+        self.vendor: Optional[str] = None
+        self._vendor_pos: Tuple[int, int] = (-1, -1)
+        self.total: Optional[float] = None
+        self._total_rank = 0
+        self._total_pos: Tuple[int, int] = (-1, -1)
+        self._fallbacks: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._fed = 0
+
+    def feed(self, text: str, index: Optional[int] = None) -> "InvoiceFieldExtractor":
+        """
+        Scan one piece of text. 'index' is its position in the document (page
+        number); by default pieces are taken to arrive in document order.
+        """
+        if index is None:
+            index = self._fed
+        self._fed = max(self._fed, index) + 1
+        low = text.lower()
+        if len(low) == len(text):
+            matches = _FIELD_RE.finditer(low)
+        else:
+            low, matches = text, _FIELD_RE_CASELESS.finditer(text)
+
+        for m in matches:
+            start = m.start()
+            if start and low[start - 1].isalnum():
+                continue  # keyword inside a longer word ("subtotal", "candidate")
+            kind, label, value_group = _FIELD_MARKERS[m.lastgroup]
+            vstart, vend = m.span(value_group) if value_group else m.span()
+            pos = (index, start)
+
+            if kind == "invoice_number":
+                rank = _INVOICE_PRIORITY[label]
+                if rank > self._inv_rank or (rank == self._inv_rank and pos < self._inv_pos):
+                    self.invoice_number, self._inv_rank, self._inv_pos = text[vstart:vend], rank, pos
+            elif kind == "total":
+                rank = _TOTAL_PRIORITY[label]
+                value = _to_float(low[vstart:vend])
+                if value is not None and (rank > self._total_rank or (rank == self._total_rank and pos > self._total_pos)):
+                    self.total, self._total_rank, self._total_pos = value, rank, pos
+            elif kind in _AMOUNT_FALLBACKS:
+                if kind not in self._fallbacks or pos < self._fallbacks[kind][0]:
+                    value = _to_float(low[vstart:vend])
+                    if value is not None:
+                        self._fallbacks[kind] = (pos, value)
+            elif kind == "vendor":
+                line_start = low.rfind("\n", 0, start) + 1
+                if (self.vendor is None or pos < self._vendor_pos) and not low[line_start:start].strip():
+                    vendor = text[vstart:vend].strip()
+                    if vendor:
+                        self.vendor, self._vendor_pos = vendor, pos
+            else:  # date
+                rank = _DATE_PRIORITY[label]
+                if rank > self._date_rank or (rank == self._date_rank and pos < self._date_pos):
+                    iso = _normalise_date(low[vstart:vend])
+                    if iso:
+                        self.date, self._date_rank, self._date_pos = iso, rank, pos
+
+        # first unlabelled date / decimal number, only while still needed (or
+        # when this piece comes before the one they were found in)
+        unlabelled = _DATE_PRIORITY[None]
+        if self._date_rank < unlabelled or (self._date_rank == unlabelled and self._date_pos[0] > index):
+            for m in _DATE_RE.finditer(text):
+                iso = _normalise_date(m.group(0))
+                if iso:
+                    self.date, self._date_rank, self._date_pos = iso, unlabelled, (index, m.start())
+                    break
+        if self.total is None and ("decimal" not in self._fallbacks or self._fallbacks["decimal"][0][0] > index):
+            m = _DECIMAL_RE.search(text)
+            if m:
+                self._fallbacks["decimal"] = ((index, m.start()), _to_float(m.group(0)))
+        return self
+
+    @property
+    def complete(self) -> bool:
+        """
+        True once every field is found with its best possible evidence
+        (a labelled grand total / amount due, a labelled invoice date).
+        """
+        return (
+            self.invoice_number is not None
+            and self.vendor is not None
+            and self._date_rank >= _DATE_PRIORITY["invoice date"]
+            and self._total_rank >= _TOTAL_PRIORITY["amount due"]
+        )
+
+    @property
+    def amount(self) -> Optional[float]:
+        if self.total is not None:
+            return self.total
+        for kind in _AMOUNT_FALLBACKS:
+            if kind in self._fallbacks:
+                return self._fallbacks[kind][1]
+        return None
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "invoice_number": self.invoice_number,
+            "date": self.date,
+            "vendor": self.vendor,
+            "amount": self.amount,
+        }
+
+
+def extract_fields(text: str) -> Dict[str, Any]:
+    """
+    Extract invoice number, date, vendor and amount in one pass over 'text'.
+    The amount prefers labelled totals: Grand Total > Amount Due > Total,
+    then 'Amount:', a currency-prefixed value, or the first decimal number.
+    Missing fields are None.
+    """
+    return InvoiceFieldExtractor().feed(text).result()
 
 
 # ------------------------------------------------------------
-# Utility: extract numeric amount from text
+# Single-Field Helpers (kept for callers that need one field)
 # ------------------------------------------------------------
 def extract_amount(text: str) -> Optional[float]:
     """
     Extracts monetary value.
     Supports patterns like:
+    - Grand Total: 1,180.00 / Amount Due: Rs 1240.50 / Total 900
     - Rs 1240.50
     - INR 1200
     - 1,200.00
     - Amount: 2300
     """
-    text = text.replace(",", "")
-    match = re.search(r"(\d+\.\d+|\d+)", text)
-    if match:
-        try:
-            return float(match.group(1))
-        except:
-            return None
-    return None
+    return extract_fields(text)["amount"]
 
 
-# ------------------------------------------------------------
-# Basic Extraction Rules
-# ------------------------------------------------------------
 def extract_invoice_number(text: str) -> Optional[str]:
     """
     Recognises patterns:
@@ -60,38 +317,15 @@ def extract_invoice_number(text: str) -> Optional[str]:
     - Invoice No: 4501
     - Bill #00124
     """
-    patterns = [
-        r"(INV[-\s]?\d+)",
-        r"Invoice\s*No[:\s]*([A-Za-z0-9-]+)",
-        r"Bill\s*#\s*([A-Za-z0-9-]+)",
-    ]
-    for p in patterns:
-        m = re.search(p, text, flags=re.IGNORECASE)
-        if m:
-            return m.group(1)
-    return None
+    return extract_fields(text)["invoice_number"]
 
 
 def extract_date(text: str) -> Optional[str]:
     """
-    Looks for DD/MM/YYYY, YYYY-MM-DD, DD-MM-YYYY.
-    """
-    patterns = [
-        r"(\d{2}/\d{2}/\d{4})",
-        r"(\d{4}-\d{2}-\d{2})",
-        r"(\d{2}-\d{2}-\d{4})",
-    ]
-    for p in patterns:
-        m = re.search(p, text)
-        if m:
-            try:
-                # Normalise date to ISO
-                return datetime.fromisoformat(
-                    m.group(1).replace("/", "-")
-                ).date().isoformat()
-            except:
-                continue
-    return None
+    Looks for DD/MM/YYYY, YYYY-MM-DD, DD-MM-YYYY, DD.MM.YYYY, "12 Jan 2025"
+    and "Jan 12, 2025"; an 'Invoice Date' label beats unlabelled or due dates.
+    """
+    return extract_fields(text)["date"]
 
 
 def extract_vendor(text: str) -> Optional[str]:
@@ -99,52 +333,167 @@ def extract_vendor(text: str) -> Optional[str]:
     Simple heuristic:
     - Looks for lines starting with 'From', 'Vendor', 'Supplier'
     """
-    lines = text.split("\n")
-    for ln in lines:
-        if ln.lower().startswith(("from", "vendor", "supplier")):
-            return ln.split(":", 1)[-1].strip()
-    return None
+    return extract_fields(text)["vendor"]
+
+
+class InvoiceParseTimeout(Exception):
+    """Raised inside a batch worker when one file exceeds its time budget."""
 
 
 # ------------------------------------------------------------
 # PDF Reader
 # ------------------------------------------------------------
-def extract_text_from_pdf(path: str) -> str:
+def _pdf_text(data: bytes) -> str:
+    PyPDF2 = _load_pypdf2()
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return "".join([page.extract_text() or "" for page in reader.pages])
+
+
+def _extractor_version(PyPDF2) -> str:
+    return f"{EXTRACTOR_VERSION}/PyPDF2-{PyPDF2.__version__}"
+
+
+def extract_text_from_pdf(path: str, use_cache: bool = True) -> str:
+    """
+    Text of every page. With 'use_cache', a PDF whose bytes were extracted before
+    (by the same extractor version) is served from the text cache without decoding.
+    """
+    PyPDF2 = _load_pypdf2()
     if PyPDF2 is None:
         raise ImportError("PyPDF2 not installed. Install PyPDF2 to process PDFs.")
     try:
         with open(path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            return text
+            data = f.read()
+        if not use_cache:
+            return _pdf_text(data)
+        return get_text_cache().get_or_extract(data, _extractor_version(PyPDF2), _pdf_text)
+    except InvoiceParseTimeout:
+        raise
     except Exception as e:
         print(f"[invoice_parser] Error reading PDF: {e}")
         return ""
 
 
+def _page_order(count: int, first: Optional[int] = None, last: Optional[int] = None) -> List[int]:
+    """
+    Page indexes to visit. With first/last: the first N then the last N pages,
+    in document order. Otherwise page 1, the last page, then the pages between
+    (header fields sit on page 1 and totals on the last page).
+    """
+    if first is None and last is None:
+        order = [0, count - 1] + list(range(1, count - 1))
+    else:
+        order = list(range(min(first or 0, count))) + list(range(max(count - (last or 0), 0), count))
+    return list(dict.fromkeys(i for i in order if 0 <= i < count))
+
+
+def iter_pdf_pages(
+    path: str, first: Optional[int] = None, last: Optional[int] = None, use_cache: bool = True, indexed: bool = False
+) -> Iterator[Any]:
+    """
+    Yields the text of each visited page (see _page_order), or (page_index,
+    text) pairs with indexed=True. Pages are decoded only
+    when the consumer asks for them, so stopping early skips the rest of the file.
+    Decoded pages (and the page count) are cached individually in the text cache.
+    """
+    PyPDF2 = _load_pypdf2()
+    if PyPDF2 is None:
+        raise ImportError("PyPDF2 not installed. Install PyPDF2 to process PDFs.")
+    with open(path, "rb") as f:
+        data = f.read()
+
+    cache = get_text_cache() if use_cache else None
+    if cache is not None and not cache.enabled:
+        cache = None
+    base = TextCache.key(data, _extractor_version(PyPDF2)) if cache else None
+    reader = None
+
+    def open_reader():
+        nonlocal reader
+        if reader is None:
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return reader
+
+    count = cache.get(TextCache.derive(base, "pages")) if cache else None
+    if count is None:
+        count = str(len(open_reader().pages))
+        if cache:
+            cache.put(TextCache.derive(base, "pages"), count)
+
+    for i in _page_order(int(count), first, last):
+        key = TextCache.derive(base, f"page{i}") if cache else None
+        text = cache.get(key) if cache else None
+        if text is None:
+            text = open_reader().pages[i].extract_text() or ""
+            if cache:
+                cache.put(key, text)
+        yield (i, text) if indexed else text
+
+
+def extract_fields_from_pages(pages: Iterable[Any], early_exit: bool = True) -> Tuple[Dict[str, Any], str, int]:
+    """
+    Feed page texts to one InvoiceFieldExtractor, stopping once every field is
+    found (extractor.complete). 'pages' yields texts in document order, or
+    (page_index, text) pairs in any order (iter_pdf_pages(indexed=True)).
+    Returns (fields, preview_text, pages_read); preview_text holds at most the
+    first 301 characters seen.
+    """
+    extractor = InvoiceFieldExtractor()
+    preview = ""
+    read = 0
+    for page in pages:
+        index, text = page if isinstance(page, tuple) else (None, page)
+        read += 1
+        if len(preview) <= 300:
+            preview += text[: 301 - len(preview)]
+        if extractor.feed(text, index).complete and early_exit:
+            break
+    return extractor.result(), preview, read
+
+
+def text_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters of this process's PDF text cache.
+    """
+    return get_text_cache().stats()
+
+
 # ------------------------------------------------------------
 # Main Entry Function
 # ------------------------------------------------------------
-def parse_invoice(file_path: str) -> Dict[str, Any]:
+def parse_invoice(file_path: str, stream_pages: bool = False, first_pages: Optional[int] = None, last_pages: Optional[int] = None) -> Dict[str, Any]:
     """
     Extract structured invoice data.
-    """
 
-    # Read PDF or fallback to plain text
-    if file_path.lower().endswith(".pdf"):
-        text = extract_text_from_pdf(file_path)
+    For PDFs, 'stream_pages' (implied by first_pages / last_pages) reads page by
+    page and stops once every field is found instead of extracting the whole
+    document; first_pages / last_pages limit the scan to those pages.
+    """
+    is_pdf = file_path.lower().endswith(".pdf")
+    if is_pdf and (stream_pages or first_pages is not None or last_pages is not None):
+        try:
+            fields, text, _ = extract_fields_from_pages(iter_pdf_pages(file_path, first_pages, last_pages, indexed=True))
+        except (InvoiceParseTimeout, ImportError):
+            raise
+        except Exception as e:
+            print(f"[invoice_parser] Error reading PDF: {e}")
+            fields, text = extract_fields(""), ""
     else:
-        # plain text fallback
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
+        # Read PDF or fallback to plain text
+        if is_pdf:
+            text = extract_text_from_pdf(file_path)
+        else:
+            # plain text fallback
+            with open(file_path, "r", encoding="utf-8") as f:
+                text = f.read()
+
+        # Extract fields (single pass)
+        fields = extract_fields(text)
 
-    # Extract fields
-    invoice_no = extract_invoice_number(text) or "Unknown"
-    invoice_date = extract_date(text) or datetime.utcnow().date().isoformat()
-    vendor = extract_vendor(text) or "Unknown Vendor"
-    amount = extract_amount(text) or 0.0
+    invoice_no = fields["invoice_number"] or "Unknown"
+    invoice_date = fields["date"] or datetime.utcnow().date().isoformat()
+    vendor = fields["vendor"] or "Unknown Vendor"
+    amount = fields["amount"] or 0.0
 
     return {
         "invoice_number": invoice_no,
@@ -155,9 +504,173 @@ def parse_invoice(file_path: str) -> Dict[str, Any]:
     }
 
 
+# ------------------------------------------------------------
+# Batch Parsing (process pool)
+# ------------------------------------------------------------
+DEFAULT_TIMEOUT_SECONDS = 30.0
+INVOICE_EXTENSIONS = (".pdf", ".txt")
+
+
+def _raise_timeout(signum, frame):
+    raise InvoiceParseTimeout()
+
+
+def _parse_one(path: str, timeout: Optional[float], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker: parse one file under a SIGALRM deadline.
+    On platforms without setitimer (Windows) the timeout is not enforced.
+    """
+    started = time.perf_counter()
+    cache = get_text_cache()
+    hits, misses = cache.hits, cache.misses
+    alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        invoice = parse_invoice(path, **options)
+        if invoice["raw_text_preview"].strip():
+            result = {"path": path, "ok": True, "invoice": invoice}
+        else:  # unreadable/scanned PDF: report it instead of posting an empty invoice
+            result = {"path": path, "ok": False, "error": "no text extracted"}
+    except InvoiceParseTimeout:
+        result = {"path": path, "ok": False, "error": f"timed out after {timeout:g}s"}
+    except Exception as e:
+        result = {"path": path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    if cache.misses > misses:
+        result["text_cache"] = "miss"  # at least part of the file had to be decoded
+    elif cache.hits > hits:
+        result["text_cache"] = "hit"
+    return result
+
+
+def iter_invoice_files(directory: str, extensions: Tuple[str, ...] = INVOICE_EXTENSIONS, recursive: bool = True) -> Iterator[str]:
+    """
+    Yields invoice file paths under 'directory' (sorted, lazily per folder).
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
+
+
+def parse_invoices(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+    **parse_options,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse many invoices across a process pool; yields one result per file in
+    completion order (not input order):
+        {"path", "ok": True, "invoice": {...parse_invoice...}, "seconds"}
+        {"path", "ok": False, "error": "...", "seconds"}
+    A file that fails or exceeds 'timeout' seconds is reported and the batch
+    carries on. At most 4 x workers files are in flight, so 'paths' may be a lazy
+    iterator over a huge dump. 'parse_options' (stream_pages, first_pages,
+    last_pages) are passed to parse_invoice. The output plugs straight into
+    importer.import_invoices for bulk posting.
+    """
+    workers = workers or os.cpu_count() or 1
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while True:
+            for path in paths:
+                pending[pool.submit(_parse_one, path, timeout, parse_options)] = path
+                if len(pending) >= workers * 4:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:  # worker crashed or result could not be pickled
+                    yield {"path": path, "ok": False, "error": f"{type(e).__name__}: {e}", "seconds": None}
+
+
+def parse_invoice_directory(directory: str, recursive: bool = True, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    parse_invoices over every PDF / text invoice under 'directory'.
+    """
+    return parse_invoices(iter_invoice_files(directory, recursive=recursive), **kwargs)
+
+
+def _cli(argv=None) -> int:
+    import argparse
+    import json
+    import sys
+
+    ap = argparse.ArgumentParser(description="Parse invoice files or directories in parallel.")
+    ap.add_argument("paths", nargs="+", help="invoice files and/or directories")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS, help="seconds per file (0 = no limit)")
+    ap.add_argument("--no-recursive", action="store_true", help="do not descend into subdirectories")
+    ap.add_argument("--stream-pages", action="store_true", help="read PDFs page by page, stopping once all fields are found")
+    ap.add_argument("--first-pages", type=int, default=None, help="only scan the first N pages of each PDF")
+    ap.add_argument("--last-pages", type=int, default=None, help="only scan the last N pages of each PDF")
+    ap.add_argument("--post", action="store_true", help="create transactions and journal-post them in bulk")
+    ap.add_argument("--user-id", default=None, help="owner of posted transactions")
+    args = ap.parse_args(argv)
+
+    def expand():
+        for p in args.paths:
+            if os.path.isdir(p):
+                yield from iter_invoice_files(p, recursive=not args.no_recursive)
+            else:
+                yield p
+
+    counts = {"ok": 0, "failed": 0, "hit": 0, "miss": 0}
+
+    def emit(results):
+        # one JSON line per file on stdout, as it completes
+        for r in results:
+            counts["ok" if r["ok"] else "failed"] += 1
+            if "text_cache" in r:
+                counts[r["text_cache"]] += 1
+            print(json.dumps(r, default=str), flush=True)
+            yield r
+
+    started = time.perf_counter()
+    options = {"stream_pages": args.stream_pages, "first_pages": args.first_pages, "last_pages": args.last_pages}
+    results = emit(parse_invoices(expand(), workers=args.workers, timeout=args.timeout or None, **options))
+    if args.post:
+        import backend.accounting_engine.stubs as acct
+        from backend.accounting_engine.importer import import_invoices
+
+        acct.init_db()  # schema + default chart of accounts, as process_invoice_batch does
+        summary = import_invoices(results, user_id=args.user_id)
+        print(f"[invoice_parser] posted: {json.dumps({k: v for k, v in summary.items() if k != 'errors'})}", file=sys.stderr)
+    else:
+        for _ in results:
+            pass
+    elapsed = time.perf_counter() - started
+    total = counts["ok"] + counts["failed"]
+    print(
+        f"[invoice_parser] {total} files ({counts['failed']} failed) in {elapsed:.2f}s"
+        f" ({total / elapsed if elapsed else 0:.1f} files/s); text cache {counts['hit']} hits / {counts['miss']} misses",
+        file=sys.stderr,
+    )
+    return 1 if counts["failed"] else 0
+
+
 # ------------------------------------------------------------
 # Demo
 # ------------------------------------------------------------
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        sys.exit(_cli())
     sample = parse_invoice("sample_invoice.pdf")
     print(sample)
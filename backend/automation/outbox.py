@@ -0,0 +1,419 @@
+# backend/automation/outbox.py
+"""
+XYLO — Email Outbox
+
+Callers enqueue emails into the email_outbox table (one INSERT, no network)
+and a background delivery worker sends them over the pooled SMTP connections
+of email_service. A slow or unreachable SMTP server delays delivery but never
+blocks the caller, and no email is lost when a send fails or the process dies.
+
+Delivery:
+- The worker claims due rows in batches ('sending' with a claim deadline), so
+  several processes can run workers against one database. A row whose worker
+  died is claimed again once its deadline passes (counting as a failed attempt)
+- Temporary failures (connection errors, 4xx) are retried with exponential
+  backoff plus jitter. Permanent ones (5xx), or OUTBOX_MAX_ATTEMPTS failures,
+  move the row to 'dead' with its last error (the dead-letter queue;
+  requeue_dead() retries them)
+- Throughput is capped at OUTBOX_RATE_PER_SECOND emails/s (token bucket), so a
+  large reminder run doesn't trip provider rate limits
+
+Config:
+    XYLO_OUTBOX_RATE          max emails per second per worker (default 20)
+    XYLO_OUTBOX_MAX_ATTEMPTS  attempts before dead-lettering (default 8)
+    XYLO_OUTBOX_WORKER        0 = don't start the worker on first enqueue
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import backend.accounting_engine.stubs as acct
+import backend.automation.email_service as emailer
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_RATE_PER_SECOND = float(os.environ.get("XYLO_OUTBOX_RATE", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("XYLO_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_AUTOSTART = os.environ.get("XYLO_OUTBOX_WORKER", "1") != "0"
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_BACKOFF_BASE_SECONDS = 30.0
+OUTBOX_BACKOFF_MAX_SECONDS = 3600.0
+# A claimed batch not finished within this long is handed to another worker
+OUTBOX_CLAIM_SECONDS = 300.0
+# Longest the worker sleeps without checking for due retries
+OUTBOX_POLL_SECONDS = 5.0
+
+_COLUMNS = "to_addr, subject, body, html, attachments, dedupe_key, status, attempts, next_attempt_at, created_at"
+
+
+def _utcnow() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _row(email: Dict[str, Any], now: str) -> tuple:
+    attachments = email.get("attachments")
+    return (
+        email["to"],
+        email.get("subject", ""),
+        email.get("body", ""),
+        int(bool(email.get("html", False))),
+        json.dumps(list(attachments)) if attachments else None,
+        email.get("dedupe_key"),
+        "pending",
+        0,
+        now,
+        now,
+    )
+
+
+# ------------------------------------------------------------
+# Enqueue
+# ------------------------------------------------------------
+def enqueue_email(
+    to: str,
+    subject: str,
+    body: str,
+    attachments: Optional[List[str]] = None,
+    html: bool = False,
+    dedupe_key: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Queue one email for delivery; returns its outbox id. With a 'dedupe_key'
+    already in the outbox nothing is queued and None is returned.
+    """
+    ids = enqueue_many([{"to": to, "subject": subject, "body": body, "attachments": attachments,
+                         "html": html, "dedupe_key": dedupe_key}])
+    return ids[0]
+
+
+def enqueue_many(emails: Iterable[Dict[str, Any]]) -> List[Optional[int]]:
+    """
+    Queue many emails in one transaction. Each dict takes send_email
+    arguments (to, subject, body, attachments, html) plus an optional
+    dedupe_key. Returns outbox ids in order (None for duplicates).
+    """
+    acct._ensure_schema()
+    now = _utcnow()
+    ids: List[Optional[int]] = []
+    conn = acct._get_conn()
+    try:
+        cur = conn.cursor()
+        for email in emails:
+            cur.execute(
+                f"INSERT INTO email_outbox({_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?) ON CONFLICT DO NOTHING",
+                _row(email, now),
+            )
+            ids.append(cur.lastrowid if cur.rowcount == 1 else None)
+        conn.commit()
+    finally:
+        conn.close()
+    if any(i is not None for i in ids):
+        _notify_worker()
+    return ids
+
+
+# ------------------------------------------------------------
+# Claim + outcome bookkeeping
+# ------------------------------------------------------------
+def _claim(limit: int) -> List[Any]:
+    """
+    Atomically take up to 'limit' due rows (oldest first).
+    Rows left in 'sending' by a worker that died or hung are released first; the
+    lost claim counts as a failed attempt, so a message that kills its worker
+    every time is dead-lettered after OUTBOX_MAX_ATTEMPTS like any other.
+    """
+    now = datetime.utcnow()
+    conn = acct._get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        expired = conn.execute(
+            "SELECT id, to_addr, attempts FROM email_outbox WHERE status = 'sending' AND claimed_until < ?",
+            (now.isoformat(),),
+        ).fetchall()
+        for row in expired:
+            attempts = row["attempts"] + 1
+            status = "dead" if attempts >= OUTBOX_MAX_ATTEMPTS else "pending"
+            if status == "dead":
+                logger.warning("outbox email %s to %s dead-lettered after %d attempt(s): claim expired", row["id"], row["to_addr"], attempts)
+            conn.execute(
+                "UPDATE email_outbox SET status = ?, attempts = ?, last_error = 'claim expired', claimed_until = NULL WHERE id = ?",
+                (status, attempts, row["id"]),
+            )
+        rows = conn.execute(
+            """
+            SELECT * FROM email_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at
+            LIMIT ?
+            """,
+            (now.isoformat(), limit),
+        ).fetchall()
+        if rows:
+            marks = ",".join("?" * len(rows))
+            conn.execute(
+                f"UPDATE email_outbox SET status = 'sending', claimed_until = ? WHERE id IN ({marks})",
+                [(now + timedelta(seconds=OUTBOX_CLAIM_SECONDS)).isoformat(), *(r["id"] for r in rows)],
+            )
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _record_outcomes(rows: List[Any], errors: List[Optional[Exception]]) -> Dict[str, int]:
+    """Write a batch's results back in one transaction; returns counts."""
+    now = datetime.utcnow()
+    sent, retry, dead = [], [], []
+    for row, error in zip(rows, errors):
+        attempts = row["attempts"] + 1
+        if error is None:
+            sent.append((attempts, now.isoformat(), row["id"]))
+            continue
+        message = f"{type(error).__name__}: {error}"[:1000]
+        if emailer.is_permanent_failure(error) or attempts >= OUTBOX_MAX_ATTEMPTS:
+            dead.append((attempts, message, row["id"]))
+            logger.warning("outbox email %s to %s dead-lettered after %d attempt(s): %s", row["id"], row["to_addr"], attempts, message)
+        else:
+            retry.append((attempts, message, (now + timedelta(seconds=_backoff(attempts))).isoformat(), row["id"]))
+
+    conn = acct._get_conn()
+    try:
+        conn.executemany(
+            "UPDATE email_outbox SET status = 'sent', attempts = ?, sent_at = ?, claimed_until = NULL, last_error = NULL WHERE id = ?",
+            sent,
+        )
+        conn.executemany(
+            "UPDATE email_outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?, claimed_until = NULL WHERE id = ?",
+            retry,
+        )
+        conn.executemany(
+            "UPDATE email_outbox SET status = 'dead', attempts = ?, last_error = ?, claimed_until = NULL WHERE id = ?",
+            dead,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return {"sent": len(sent), "retry": len(retry), "dead": len(dead)}
+
+
+def _message(row) -> Any:
+    attachments = json.loads(row["attachments"]) if row["attachments"] else None
+    return emailer.build_message(row["to_addr"], row["subject"], row["body"], attachments, bool(row["html"]))
+
+
+def deliver_batch(limit: int = OUTBOX_BATCH_SIZE, pool: Optional[emailer.SMTPPool] = None) -> Dict[str, int]:
+    """
+    Claim up to 'limit' due emails and send them concurrently over the SMTP
+    pool. Returns {"claimed", "sent", "retry", "dead"}.
+    """
+    acct._ensure_schema()
+    rows = _claim(limit)
+    if not rows:
+        return {"claimed": 0, "sent": 0, "retry": 0, "dead": 0}
+
+    messages, errors = [], [None] * len(rows)
+    for i, row in enumerate(rows):
+        try:
+            messages.append((i, _message(row)))
+        except Exception as e:
+            errors[i] = e
+    results = (pool or emailer.get_pool()).send_many(msg for _, msg in messages)
+    for (i, _), error in zip(messages, results):
+        errors[i] = error
+    return dict(claimed=len(rows), **_record_outcomes(rows, errors))
+
+
+# ------------------------------------------------------------
+# Background delivery worker
+# ------------------------------------------------------------
+_wakeup = threading.Event()
+_stop = threading.Event()
+_worker_thread: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _notify_worker():
+    if OUTBOX_AUTOSTART:
+        start_delivery_worker()
+    _wakeup.set()
+
+
+def _next_due_in() -> float:
+    """Seconds until the earliest pending retry (capped at the poll interval)."""
+    conn = acct._get_conn()
+    try:
+        row = conn.execute("SELECT MIN(next_attempt_at) AS due FROM email_outbox WHERE status = 'pending'").fetchone()
+    finally:
+        conn.close()
+    if row is None or row["due"] is None:
+        return OUTBOX_POLL_SECONDS
+    wait = (datetime.fromisoformat(row["due"]) - datetime.utcnow()).total_seconds()
+    return min(max(wait, 0.0), OUTBOX_POLL_SECONDS)
+
+
+def _worker(rate: float, batch_size: int):
+    tokens, last = float(batch_size), time.monotonic()
+    while not _stop.is_set():
+        # token bucket: at most 'rate' emails per second, bursts up to one batch
+        now = time.monotonic()
+        tokens = min(float(batch_size), tokens + (now - last) * rate)
+        last = now
+        if tokens < 1:
+            time.sleep((1 - tokens) / rate)
+            continue
+        try:
+            result = deliver_batch(min(batch_size, int(tokens)))
+        except Exception as e:
+            logger.exception("outbox delivery failed: %s", e)
+            _stop.wait(OUTBOX_POLL_SECONDS)
+            continue
+        tokens -= result["claimed"]
+        if result["claimed"]:
+            logger.info("outbox batch: %(claimed)d claimed, %(sent)d sent, %(retry)d to retry, %(dead)d dead-lettered", result)
+            continue
+        _wakeup.clear()
+        try:
+            timeout = _next_due_in()
+        except Exception:
+            timeout = OUTBOX_POLL_SECONDS
+        _wakeup.wait(timeout)
+
+
+def start_delivery_worker(rate: Optional[float] = None, batch_size: int = OUTBOX_BATCH_SIZE):
+    """Start the delivery thread for this process (no-op if it is running)."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _stop.clear()
+        _worker_thread = threading.Thread(
+            target=_worker, args=(rate or OUTBOX_RATE_PER_SECOND, batch_size), name="xylo-outbox", daemon=True
+        )
+        _worker_thread.start()
+
+
+def stop_delivery_worker(timeout: float = 10.0):
+    """Stop the delivery thread after its current batch; queued emails stay queued."""
+    global _worker_thread
+    with _worker_lock:
+        thread, _worker_thread = _worker_thread, None
+    if thread is not None:
+        _stop.set()
+        _wakeup.set()
+        thread.join(timeout)
+
+
+# ------------------------------------------------------------
+# Inspection + dead letters
+# ------------------------------------------------------------
+def outbox_stats() -> Dict[str, Any]:
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    try:
+        counts = {r["status"]: r["n"] for r in conn.execute("SELECT status, COUNT(*) AS n FROM email_outbox GROUP BY status")}
+        oldest = conn.execute("SELECT MIN(created_at) AS t FROM email_outbox WHERE status = 'pending'").fetchone()["t"]
+    finally:
+        conn.close()
+    return {
+        "pending": counts.get("pending", 0),
+        "sending": counts.get("sending", 0),
+        "sent": counts.get("sent", 0),
+        "dead": counts.get("dead", 0),
+        "oldest_pending": oldest,
+    }
+
+
+def delivery_status(ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """{id: {"status", "attempts", "last_error", "sent_at"}} for the given outbox ids."""
+    acct._ensure_schema()
+    ids = list(ids)
+    found: Dict[int, Dict[str, Any]] = {}
+    conn = acct._get_conn()
+    try:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT id, status, attempts, last_error, sent_at FROM email_outbox WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            found.update((r["id"], {k: r[k] for k in ("status", "attempts", "last_error", "sent_at")}) for r in rows)
+    finally:
+        conn.close()
+    return found
+
+
+def wait_for_delivery(ids: Iterable[int], timeout: float) -> Dict[int, Dict[str, Any]]:
+    """
+    Wait up to 'timeout' seconds until every id is 'sent' or 'dead' (emails
+    waiting for a retry count as unfinished). Returns delivery_status(ids).
+    """
+    ids = list(ids)
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    _notify_worker()
+    while True:
+        status = delivery_status(ids)
+        if all(s["status"] in ("sent", "dead") for s in status.values()) or time.monotonic() >= deadline:
+            return status
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0.0)))
+        delay = min(delay * 2, 1.0)
+
+
+def dead_letters(limit: int = 100) -> List[Dict[str, Any]]:
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT id, to_addr, subject, attempts, last_error, created_at FROM email_outbox WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(r) for r in rows]
+
+
+def requeue_dead(ids: Optional[List[int]] = None) -> int:
+    """Move dead-lettered emails (all, or 'ids') back to pending with fresh attempts."""
+    acct._ensure_schema()
+    now = _utcnow()
+    conn = acct._get_conn()
+    try:
+        if ids is None:
+            cur = conn.execute("UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'", (now,))
+        else:
+            marks = ",".join("?" * len(ids))
+            cur = conn.execute(
+                f"UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead' AND id IN ({marks})",
+                [now, *ids],
+            )
+        conn.commit()
+        requeued = cur.rowcount
+    finally:
+        conn.close()
+    if requeued:
+        _notify_worker()
+    return requeued
+
+
+def purge_sent(days: int = 30) -> int:
+    """Delete emails delivered more than 'days' ago."""
+    acct._ensure_schema()
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    conn = acct._get_conn()
+    try:
+        cur = conn.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
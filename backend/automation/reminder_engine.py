@@ -3,67 +3,176 @@
 XYLO — Reminder Engine
 
 Handles:
-- Overdue payment reminders
+- Overdue payment reminders (one digest per customer, or one per invoice),
+  repeated on a cadence tracked per invoice in reminder_state
 - Recurring alerts
-- Email notifications
+- Email notifications (queued in the outbox, delivered in the background)
 - Integration with scheduler + accounting engine
 
 This engine is designed to work with:
-- email_service.py
-- accounting_engine.stubs (for reading unpaid invoices)
+- outbox.py / email_service.py
+- accounting_engine.stubs (invoices table, for reading unpaid invoices)
 - scheduler.py for daily automation
 """
 
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+import hashlib
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
 
 import backend.accounting_engine.stubs as acct
-import backend.automation.email_service as emailer
+import backend.automation.outbox as outbox
 
 
 # ---------------------------------------------------------------------
-# Placeholder: In full system, invoices would have a 'due_date' and 'paid' flag.
-# For now, we infer overdue invoices from transactions with negative balances
-# or invoice references marked unpaid.
+# Overdue invoice lookup
 # ---------------------------------------------------------------------
+# Rows fetched per query while walking overdue invoices
+OVERDUE_CHUNK_SIZE = 500
 
-def _mock_find_overdue_invoices() -> List[Dict[str, Any]]:
+# How many days overdue an invoice is when its 1st, 2nd, 3rd ... reminder goes
+# out. After the last entry reminders repeat every <last entry> days, so the
+# default "1,7,14" sends them 1, 7, 14, 28, 42 ... days after the due date.
+# A cycle that runs late sends one reminder and moves on to the next point
+# still ahead, rather than catching up on the ones it missed.
+REMINDER_CADENCE_DAYS = tuple(
+    int(d) for d in os.environ.get("XYLO_REMINDER_CADENCE", "1,7,14").split(",") if d.strip()
+) or (7,)
+
+_INVOICE_COLUMNS = """
+    i.invoice_number, i.customer_name, i.customer_email, i.amount, i.currency, i.description,
+    i.issue_date AS date, i.due_date, i.id,
+    CAST(julianday(:today) - julianday(i.due_date) AS INTEGER) AS days_overdue
+"""
+
+# Overdue = unpaid and past due. 'paid = 0' matches the partial index on
+# invoices(due_date, id), so the scan only touches unpaid invoices due before
+# today and never the ledger. Pages are keyset-paginated on (due_date, id):
+# each query finishes before its rows are handed out, so no read transaction
+# stays open while the caller writes (e.g. to the outbox).
+_OVERDUE_SQL = f"""
+    SELECT {_INVOICE_COLUMNS}, i.due_date AS page_key
+    FROM invoices i
+    WHERE i.paid = 0 AND i.due_date < :today AND (i.due_date, i.id) > (:after_key, :after_id)
+    ORDER BY i.due_date, i.id
+    LIMIT :limit
+"""
+
+# Due for a reminder = next_eligible_date reached. Walks idx_reminder_state_next,
+# which only holds unpaid invoices, so the cost follows the invoices due today
+# and not how many have been reminded before. Same keyset paging as above.
+_ELIGIBLE_SQL = f"""
+    SELECT {_INVOICE_COLUMNS}, r.reminder_count, r.last_sent_at, r.next_eligible_date AS page_key
+    FROM reminder_state r JOIN invoices i ON i.id = r.invoice_id
+    WHERE r.next_eligible_date <= :today AND (r.next_eligible_date, r.invoice_id) > (:after_key, :after_id)
+      AND i.paid = 0 AND i.due_date < :today
+    ORDER BY r.next_eligible_date, r.invoice_id
+    LIMIT :limit
+"""
+
+
+def _iter_chunks(sql: str, as_of: Optional[str], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    acct._ensure_schema()
+    params = {"today": as_of or datetime.utcnow().date().isoformat(), "after_key": "", "after_id": "", "limit": chunk_size}
+    while True:
+        conn = acct._get_conn()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        params["after_key"], params["after_id"] = rows[-1]["page_key"], rows[-1]["id"]
+        chunk = [dict(r) for r in rows]
+        for invoice in chunk:
+            del invoice["page_key"]
+        yield chunk
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_overdue_chunks(as_of: Optional[str] = None, chunk_size: int = OVERDUE_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields lists of up to 'chunk_size' overdue invoices (oldest due first) as
+    of the ISO date 'as_of' (default today, UTC).
+    """
+    return _iter_chunks(_OVERDUE_SQL, as_of, chunk_size)
+
+
+def iter_eligible_chunks(as_of: Optional[str] = None, chunk_size: int = OVERDUE_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
     """
-    Mock overdue invoice detection.
-    In a full system, this will check invoice database table:
-        - invoice.due_date < today
-        - invoice.paid == false
+    Like iter_overdue_chunks, but only the overdue invoices due for a reminder
+    under REMINDER_CADENCE_DAYS (with their reminder_count and last_sent_at).
     """
-    # Use transactions as mock invoice records
+    return _iter_chunks(_ELIGIBLE_SQL, as_of, chunk_size)
+
+
+def find_overdue_invoices(as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+    """All overdue invoices as of 'as_of'; see iter_overdue_chunks."""
+    return [invoice for chunk in iter_overdue_chunks(as_of) for invoice in chunk]
+
+
+def _reminder_offset(n: int) -> int:
+    """Days overdue at which the nth (1-based) reminder of an invoice is due."""
+    if n <= len(REMINDER_CADENCE_DAYS):
+        return REMINDER_CADENCE_DAYS[n - 1]
+    return REMINDER_CADENCE_DAYS[-1] * (n - len(REMINDER_CADENCE_DAYS) + 1)
+
+
+def _next_reminder_date(due: date, sent: int, today: date) -> date:
+    """First cadence point after 'today' for an invoice that has had 'sent' reminders."""
+    n = sent + 1
+    while due + timedelta(days=_reminder_offset(n)) <= today:
+        n += 1
+    return due + timedelta(days=_reminder_offset(n))
+
+
+def _update_reminder_state(rows: List[tuple]):
     conn = acct._get_conn()
-    cur = conn.cursor()
-    rows = cur.execute("SELECT * FROM transactions WHERE amount > 0").fetchall()
-
-    overdue = []
-    today = datetime.utcnow().date()
-
-    for r in rows:
-        # Mock rule: everything older than 10 days is overdue
-        tx_date = datetime.fromisoformat(r["date"]).date()
-        if (today - tx_date).days > 10:
-            overdue.append(
-                {
-                    "invoice_number": r["reference"],
-                    "amount": r["amount"],
-                    "description": r["description"],
-                    "date": r["date"],
-                    "days_overdue": (today - tx_date).days,
-                }
-            )
+    try:
+        conn.executemany(
+            "UPDATE reminder_state SET reminder_count = ?, last_sent_at = ?, next_eligible_date = ? WHERE invoice_id = ?",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _record_reminders(invoices: List[Dict[str, Any]], as_of: Optional[str] = None):
+    """Count one more reminder for each invoice and schedule its next one."""
+    if not invoices:
+        return
+    today = date.fromisoformat(as_of) if as_of else datetime.utcnow().date()
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for invoice in invoices:
+        sent = invoice.get("reminder_count", 0) + 1
+        due = date.fromisoformat(invoice["due_date"])
+        rows.append((sent, now, _next_reminder_date(due, sent, today).isoformat(), invoice["id"]))
+    _update_reminder_state(rows)
 
-    conn.close()
-    return overdue
+
+def _defer_reminders(invoices: List[Dict[str, Any]]):
+    """
+    Push invoices picked up before their next cadence point (new invoices are
+    eligible from the day after they fall due) out to that point, unsent.
+    """
+    if not invoices:
+        return
+    rows = []
+    for invoice in invoices:
+        due = date.fromisoformat(invoice["due_date"])
+        next_date = due + timedelta(days=_reminder_offset(invoice["reminder_count"] + 1))
+        rows.append((invoice["reminder_count"], invoice["last_sent_at"], next_date.isoformat(), invoice["id"]))
+    _update_reminder_state(rows)
 
 
 # ---------------------------------------------------------------------
 # Send Reminder Email
 # ---------------------------------------------------------------------
-def send_payment_reminder(invoice: Dict[str, Any], to_email: str) -> bool:
+def _reminder_email(invoice: Dict[str, Any], to_email: str) -> Dict[str, Any]:
     subject = f"Payment Reminder — Invoice {invoice['invoice_number']}"
     body = (
         f"Dear Customer,\n\n"
@@ -71,33 +180,194 @@ def send_payment_reminder(invoice: Dict[str, Any], to_email: str) -> bool:
         f"is overdue by **{invoice['days_overdue']} days**.\n\n"
         f"Amount Due: ₹{invoice['amount']:.2f}\n"
         f"Description: {invoice['description']}\n"
-        f"Invoice Date: {invoice['date']}\n\n"
+        f"Invoice Date: {invoice['date']}\n"
+        f"Due Date: {invoice['due_date']}\n\n"
         f"Please clear the payment at your earliest convenience.\n"
         f"\nRegards,\nXYLO Automated Reminder System"
     )
 
-    return emailer.send_email(
-        to=to_email,
-        subject=subject,
-        body=body,
-        html=False,
+    return {"to": to_email, "subject": subject, "body": body, "html": False}
+
+
+def _digest_email(invoices: List[Dict[str, Any]], to_email: str) -> Dict[str, Any]:
+    invoices = sorted(invoices, key=lambda inv: (-inv["days_overdue"], inv["invoice_number"]))
+    total = sum(inv["amount"] for inv in invoices)
+    width = max(len("Invoice"), *(len(str(inv["invoice_number"])) for inv in invoices))
+    header = f"{'Invoice':<{width}}  {'Invoice Date':<12}  {'Due Date':<10}  {'Days Overdue':>12}  {'Amount Due':>14}"
+    lines = [header, "-" * len(header)]
+    for inv in invoices:
+        lines.append(
+            f"{inv['invoice_number']:<{width}}  {inv['date'] or '':<12}  {inv['due_date']:<10}  "
+            f"{inv['days_overdue']:>12}  {'₹' + format(inv['amount'], ',.2f'):>14}"
+        )
+    lines.append("-" * len(header))
+    lines.append(f"{'Total':<{width}}  {'':<12}  {'':<10}  {'':>12}  {'₹' + format(total, ',.2f'):>14}")
+
+    subject = f"Payment Reminder — {len(invoices)} overdue invoice{'s' if len(invoices) != 1 else ''}"
+    body = (
+        "Dear Customer,\n\n"
+        "The following invoices are past their due date:\n\n"
+        + "\n".join(lines)
+        + "\n\nPlease clear the outstanding amount at your earliest convenience.\n"
+        "\nRegards,\nXYLO Automated Reminder System"
     )
 
+    return {"to": to_email, "subject": subject, "body": body, "html": False}
+
+
+def _reminder_tag(invoice: Dict[str, Any]) -> str:
+    # which reminder this is (cadence-driven cycles), else the day it is sent
+    if "reminder_count" in invoice:
+        return f"#{invoice['reminder_count'] + 1}"
+    return datetime.utcnow().date().isoformat()
+
+
+def _dedupe_key(invoice: Dict[str, Any], to_email: str) -> str:
+    # each reminder is queued at most once per recipient, even if a cycle reruns
+    return f"reminder:{invoice['invoice_number']}:{to_email}:{_reminder_tag(invoice)}"
+
+
+def _digest_dedupe_key(invoices: List[Dict[str, Any]], to_email: str) -> str:
+    # at most one digest per recipient and set of (invoice, reminder number)
+    items = sorted(f"{inv['invoice_number']}{_reminder_tag(inv)}" for inv in invoices)
+    return f"reminder-digest:{to_email}:{hashlib.sha256(chr(31).join(items).encode('utf-8')).hexdigest()[:16]}"
+
+
+def send_payment_reminder(invoice: Dict[str, Any], to_email: str) -> bool:
+    """Queue a reminder; returns False if one was already queued today."""
+    email = _reminder_email(invoice, to_email)
+    return outbox.enqueue_email(**email, dedupe_key=_dedupe_key(invoice, to_email)) is not None
+
 
 # ---------------------------------------------------------------------
 # Main Overdue Reminder Runner
 # ---------------------------------------------------------------------
-def run_overdue_reminder_cycle(to_email: str = "client@example.com") -> Dict[str, Any]:
-    overdue = _mock_find_overdue_invoices()
+def _recipient(invoice: Dict[str, Any], to_email: Optional[str]) -> Optional[str]:
+    return invoice.get("customer_email") or to_email
+
+
+def run_overdue_reminder_cycle(
+    to_email: Optional[str] = "client@example.com",
+    as_of: Optional[str] = None,
+    digest: bool = True,
+    wait: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Queue reminders for the overdue invoices due for one under
+    REMINDER_CADENCE_DAYS, then record them in reminder_state so the next
+    cycle skips them until their next reminder date. Each invoice goes to its
+    customer_email, or to 'to_email' if it has none (invoices with neither
+    are skipped and stay eligible).
+
+    digest=True sends one email per customer listing all their invoices due
+    for a reminder; digest=False sends one email per invoice. Emails go through
+    the outbox, whose worker sends them concurrently over the SMTP pool (at
+    most XYLO_SMTP_POOL_SIZE at once, rate-limited). With 'wait' (seconds) the
+    cycle also waits for that delivery and reports each customer's outcome.
+    """
+    started = time.perf_counter()
+    find_seconds = enqueue_seconds = 0.0
+    customers: Dict[str, Dict[str, Any]] = {}
+    results: List[Dict[str, Any]] = []
+    skipped = 0
+
+    def _enqueue(emails: List[Dict[str, Any]]) -> List[Optional[int]]:
+        nonlocal enqueue_seconds
+        t0 = time.perf_counter()
+        ids = outbox.enqueue_many(emails)
+        enqueue_seconds += time.perf_counter() - t0
+        return ids
+
+    t0 = time.perf_counter()
+    for chunk in iter_eligible_chunks(as_of):
+        find_seconds += time.perf_counter() - t0
+        batch = []
+        early = [inv for inv in chunk if inv["days_overdue"] < _reminder_offset(inv["reminder_count"] + 1)]
+        if early:
+            _defer_reminders(early)
+            chunk = [inv for inv in chunk if inv["days_overdue"] >= _reminder_offset(inv["reminder_count"] + 1)]
+        for invoice in chunk:
+            recipient = _recipient(invoice, to_email)
+            if recipient is None:
+                skipped += 1
+                continue
+            customer = customers.setdefault(
+                recipient, {"customer": recipient, "invoices": [], "total_due": 0.0, "outbox_ids": []}
+            )
+            customer["invoices"].append(invoice)
+            customer["total_due"] += invoice["amount"]
+            if not digest:
+                batch.append(invoice)
+        if batch:
+            # one outbox transaction per chunk
+            ids = _enqueue(
+                [dict(_reminder_email(inv, _recipient(inv, to_email)), dedupe_key=_dedupe_key(inv, _recipient(inv, to_email))) for inv in batch]
+            )
+            for invoice, outbox_id in zip(batch, ids):
+                customers[_recipient(invoice, to_email)]["outbox_ids"].append(outbox_id)
+                invoice["outbox_id"] = outbox_id
+            # a duplicate (None) was already queued by an interrupted run, so it counts as sent
+            _record_reminders(batch, as_of)
+        t0 = time.perf_counter()
+    find_seconds += time.perf_counter() - t0
+
+    if digest:
+        groups = list(customers.values())
+        for i in range(0, len(groups), OVERDUE_CHUNK_SIZE):
+            page = groups[i:i + OVERDUE_CHUNK_SIZE]
+            ids = _enqueue(
+                [dict(_digest_email(c["invoices"], c["customer"]), dedupe_key=_digest_dedupe_key(c["invoices"], c["customer"])) for c in page]
+            )
+            for customer, outbox_id in zip(page, ids):
+                customer["outbox_ids"].append(outbox_id)
+                for invoice in customer["invoices"]:
+                    invoice["outbox_id"] = outbox_id
+            _record_reminders([inv for c in page for inv in c["invoices"]], as_of)
+
+    delivery: Dict[int, Dict[str, Any]] = {}
+    deliver_seconds = None
+    queued_ids = [i for c in customers.values() for i in c["outbox_ids"] if i is not None]
+    if wait and queued_ids:
+        t0 = time.perf_counter()
+        delivery = outbox.wait_for_delivery(queued_ids, wait)
+        deliver_seconds = round(time.perf_counter() - t0, 4)
 
-    results = []
-    for invoice in overdue:
-        success = send_payment_reminder(invoice, to_email)
-        results.append({"invoice": invoice["invoice_number"], "sent": success})
+    per_customer = []
+    for c in customers.values():
+        ids = c["outbox_ids"]
+        outcome = {
+            "customer": c["customer"],
+            "invoices": [inv["invoice_number"] for inv in c["invoices"]],
+            "total_due": round(c["total_due"], 2),
+            "emails": len(ids),
+            "queued": sum(1 for i in ids if i is not None),
+            "outbox_ids": ids,
+        }
+        if delivery:
+            statuses = [delivery[i]["status"] for i in ids if i in delivery]
+            outcome["delivered"] = statuses.count("sent")
+            outcome["failed"] = statuses.count("dead")
+            errors = [delivery[i]["last_error"] for i in ids if i in delivery and delivery[i]["last_error"]]
+            outcome["last_error"] = errors[-1] if errors else None
+        per_customer.append(outcome)
+        results.extend(
+            {"invoice": inv["invoice_number"], "customer": c["customer"], "queued": inv["outbox_id"] is not None, "outbox_id": inv["outbox_id"]}
+            for inv in c["invoices"]
+        )
 
     return {
         "timestamp": datetime.utcnow().isoformat(),
-        "total_overdue": len(overdue),
+        "mode": "digest" if digest else "per_invoice",
+        "total_eligible": len(results) + skipped,
+        "skipped_no_recipient": skipped,
+        "emails_queued": len(queued_ids),
+        "timing": {
+            "find_seconds": round(find_seconds, 4),
+            "enqueue_seconds": round(enqueue_seconds, 4),
+            "deliver_seconds": deliver_seconds,
+            "total_seconds": round(time.perf_counter() - started, 4),
+        },
+        "customers": per_customer,
         "results": results,
     }
 
@@ -4,77 +4,961 @@ XYLO — Automation Scheduler (Lightweight Version)
 
 This module provides:
 - A lightweight task scheduler (no external dependencies)
-- Ability to run daily, weekly, and custom-timed jobs
+- Ability to run daily, weekly, interval and 5-field cron jobs (with timezones)
 - A unified registry for automation tasks
 - Manual trigger support for the API backend
 - Thread-safe loop for background execution
+- Schedules parsed once at registration; the loop sleeps on a min-heap of
+  next fire times, so idle cost doesn't grow with the number of tasks
+- Runs execute on a thread or process pool (XYLO_SCHEDULER_EXECUTOR,
+  XYLO_SCHEDULER_WORKERS) with per-task max concurrency and timeouts; every
+  run, scheduled or manual, is tracked by a TaskRun handle
+- Task state and run history persisted in SQLite (scheduler_tasks /
+  scheduler_runs) and restored at start, with per-task catch-up of runs
+  missed while the process was down ("once", "all" or "skip")
+- An asyncio mode (start_async_scheduler) that runs the loop inside the
+  FastAPI event loop; tasks may be coroutines or plain functions
+- Per-task run metrics (scheduling lag, duration histograms, outcome counts,
+  last error) via get_metrics(), and structured logging on the
+  "backend.automation.scheduler" logger
+- Task leases in SQLite, so several processes (e.g. uvicorn workers) can each
+  run the scheduler and every slot still runs once
 
 This is perfect for development and demo environments.
 For production: replace with APScheduler / Celery / Redis workers.
 """
 
+import asyncio
+import functools
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import queue
+import signal
+import socket
 import threading
 import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import backend.accounting_engine.stubs as acct
+from backend.automation.cron import CronTrigger
+from backend.automation.scheduler_metrics import SchedulerMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def _log(level: int, event: str, **fields):
+    """
+    Structured log line "event key=value ...". The fields are also attached to
+    the record (record.event, record.fields) for JSON log handlers.
+    """
+    if logger.isEnabledFor(level):
+        text = " ".join(f"{k}={v}" for k, v in fields.items() if v is not None)
+        logger.log(level, "%s %s", event, text, extra={"event": event, "fields": fields})
+
+
+# -------------------------------------------------------------------
+# Schedule Triggers (parsed once, at registration)
+# -------------------------------------------------------------------
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _parse_hhmm(time_str: str) -> Tuple[int, int]:
+    hh, mm = map(int, time_str.split(":"))
+    if not (0 <= hh < 24 and 0 <= mm < 60):
+        raise ValueError(f"Invalid time '{time_str}'")
+    return hh, mm
+
+
+class DailyTrigger:
+    def __init__(self, time_str: str):
+        self.hour, self.minute = _parse_hhmm(time_str)
+
+    def next_after(self, dt: datetime) -> datetime:
+        target = dt.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        return target if target > dt else target + timedelta(days=1)
+
+
+class WeeklyTrigger:
+    def __init__(self, weekday: str, time_str: str):
+        if weekday.lower() not in WEEKDAYS:
+            raise ValueError(f"Invalid weekday '{weekday}'")
+        self.weekday = WEEKDAYS.index(weekday.lower())
+        self.hour, self.minute = _parse_hhmm(time_str)
+
+    def next_after(self, dt: datetime) -> datetime:
+        target = dt.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        target += timedelta(days=(self.weekday - dt.weekday()) % 7)
+        return target if target > dt else target + timedelta(days=7)
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: str):
+        self.seconds = int(seconds)
+        if self.seconds <= 0:
+            raise ValueError("Interval must be a positive number of seconds")
+
+    def next_after(self, dt: datetime) -> datetime:
+        return dt + timedelta(seconds=self.seconds)
+
+
+def parse_schedule(schedule: str):
+    """
+    Compile a schedule string into a trigger with next_after(datetime).
+    """
+    kind, _, rest = schedule.partition("@")
+    try:
+        if kind == "daily":
+            return DailyTrigger(rest)
+        if kind == "weekly":
+            weekday, time_str = rest.split("@")
+            return WeeklyTrigger(weekday, time_str)
+        if kind == "interval":
+            return IntervalTrigger(rest)
+        if kind == "cron":
+            expr, _, tz = rest.partition("@")
+            return CronTrigger(expr, tz or None)
+    except ValueError as e:
+        raise ValueError(f"Invalid schedule '{schedule}': {e}")
+    raise ValueError(f"Unsupported schedule '{schedule}'")
+
+
+def next_fire_time(schedule: str, after: Optional[datetime] = None) -> datetime:
+    """
+    First fire time of 'schedule' strictly after 'after' (default now).
+    """
+    return parse_schedule(schedule).next_after(after or datetime.now())
+
+
+def _first_fire(trigger, last_run: Optional[datetime], now: datetime) -> Tuple[datetime, datetime]:
+    """
+    When a newly registered task is first due, as (fire_at, slot). A slot
+    missed since last_run is due immediately; with no run on record, so is a
+    daily/weekly slot that already passed today (interval tasks run right away,
+    cron tasks wait for their next slot). 'slot' is the schedule's own fire
+    time (the same in every instance, so leases can key on it); only 'fire_at'
+    is moved up to now.
+    """
+    if last_run is None:
+        if isinstance(trigger, IntervalTrigger):
+            return now, now
+        if isinstance(trigger, CronTrigger):
+            due = trigger.next_after(now)
+            return due, due
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        last_run = midnight - timedelta(microseconds=1)
+    due = trigger.next_after(last_run)
+    return (now if due <= now else due), due
 
 
 # -------------------------------------------------------------------
-# Task Registry
+# Task Registry + Run Queue
 # -------------------------------------------------------------------
 
 TASK_REGISTRY: Dict[str, Dict[str, Any]] = {}
 
+# Min-heap of (fire_timestamp, seq, task_name). Re-registering a task leaves its
+# old entry in place; entries whose seq no longer matches the task are skipped.
+_HEAP: List[Tuple[float, int, str]] = []
+_SEQ = itertools.count()
+_COND = threading.Condition()
+
+# Upper bound on one sleep, so wall-clock jumps (NTP, DST) are noticed
+_MAX_SLEEP_SECONDS = 60.0
+
+_started = False
+
+# Set while the asyncio scheduler is running (see start_async_scheduler)
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_wakeup: Optional[asyncio.Event] = None
+_async_task: Optional["asyncio.Task"] = None
+
+
+def _wake():
+    """Wake whichever scheduler loop is running. Caller holds _COND."""
+    _COND.notify()
+    if _async_loop is not None:
+        _async_loop.call_soon_threadsafe(_async_wakeup.set)
 
-def register_task(name: str, schedule: str, func: Callable):
+
+def _schedule(task: Dict[str, Any], fire_at: datetime, slot: Optional[datetime] = None):
+    """
+    Queue the task's next run at 'fire_at', for schedule slot 'slot' (default
+    fire_at; earlier when a passed slot is run late). Caller holds _COND.
+    """
+    seq = next(_SEQ)
+    task["next_run"] = fire_at
+    task["_slot"] = slot or fire_at
+    task["_seq"] = seq
+    heapq.heappush(_HEAP, (fire_at.timestamp(), seq, task["name"]))
+
+
+def register_task(
+    name: str,
+    schedule: str,
+    func: Callable,
+    max_concurrency: int = 1,
+    timeout: Optional[float] = None,
+    catchup: str = "once",
+):
     """
     Register a task with a cron-like schedule string:
     - "daily@22:00"
     - "weekly@mon@09:30"
     - "interval@300" - every 300 seconds
+    - "cron@0 22 L * *" - 5-field cron (see cron.py), optionally in a
+      timezone: "cron@0 9 1 1,4,7,10 *@Asia/Kolkata"
+
+    The schedule is parsed here, once; invalid schedules raise ValueError.
+    'max_concurrency' caps overlapping runs of this task (a firing that would
+    exceed it is skipped); 'timeout' is in seconds (see TaskRun).
+    'catchup' decides what happens to slots missed while the scheduler was
+    down: "once" runs one catch-up run, "all" runs every missed slot in order
+    (up to MAX_CATCHUP_RUNS), "skip" waits for the next slot.
     """
-    TASK_REGISTRY[name] = {
-        "name": name,
-        "schedule": schedule,
-        "func": func,
-        "last_run": None,
-    }
+    trigger = parse_schedule(schedule)
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if catchup not in CATCHUP_POLICIES:
+        raise ValueError(f"Unknown catchup policy '{catchup}'")
+    # tasks registered after start pick up their persisted state right away
+    row = _load_state([name]).get(name) if _state_loaded else None
+    with _COND:
+        previous = TASK_REGISTRY.get(name)
+        task = {
+            "name": name,
+            "schedule": schedule,
+            "func": func,
+            "last_run": previous["last_run"] if previous else None,
+            "trigger": trigger,
+            "max_concurrency": max_concurrency,
+            "timeout": timeout,
+            "running": previous["running"] if previous else 0,
+            "catchup": catchup,
+            "last_fire": previous["last_fire"] if previous else None,
+            "_backlog": deque(),
+        }
+        TASK_REGISTRY[name] = task
+        now = datetime.now()
+        if _state_loaded:
+            _schedule(task, *_apply_state(task, row, now))
+        else:
+            _schedule(task, *_first_fire(trigger, task["last_run"], now))
+        # wake the loop only if this task is now the earliest deadline
+        if _HEAP[0][1] == task["_seq"]:
+            _wake()
+    _start_catchup(task)
+
+
+def unregister_task(name: str):
+    with _COND:
+        TASK_REGISTRY.pop(name, None)  # its heap entry is dropped lazily
+    _METRICS.forget(name)
+
+
+def _pop_due(now: float) -> Tuple[List[Tuple[Dict[str, Any], datetime]], Optional[float]]:
+    """
+    Pop every task due at 'now' and queue its following run.
+    Returns ([(task, slot)], next_deadline_timestamp).
+    Caller holds _COND.
+    """
+    due = []
+    now_dt = datetime.fromtimestamp(now)
+    while _HEAP:
+        fire_ts, seq, name = _HEAP[0]
+        task = TASK_REGISTRY.get(name)
+        if task is None or task.get("_seq") != seq:
+            heapq.heappop(_HEAP)  # stale entry
+            continue
+        if fire_ts > now:
+            return due, fire_ts
+        heapq.heappop(_HEAP)
+        fire_at = task["next_run"]
+        due.append((task, task["_slot"]))
+        _schedule(task, task["trigger"].next_after(max(fire_at, now_dt)))
+    return due, None
 
 
 # -------------------------------------------------------------------
-# Schedule Parsing Helpers
+# Task Execution (thread / process pool)
 # -------------------------------------------------------------------
 
-def _should_run_daily(last_run: datetime, time_str: str) -> bool:
-    now = datetime.now()
-    # Convert "HH:MM"
-    hh, mm = map(int, time_str.split(":"))
-    target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+EXECUTOR_KIND = os.environ.get("XYLO_SCHEDULER_EXECUTOR", "thread")
+EXECUTOR_WORKERS = int(os.environ.get("XYLO_SCHEDULER_WORKERS", "4"))
 
-    if last_run is None:
-        return now >= target
-    return last_run.date() < now.date() and now >= target
+# Finished and in-flight runs, for lookup by run id (oldest dropped first)
+RECENT_RUNS_LIMIT = 1000
+_RECENT_RUNS: "OrderedDict[str, TaskRun]" = OrderedDict()
 
+_executor = None
+_executor_kind = None
 
-def _should_run_weekly(last_run: datetime, weekday: str, time_str: str) -> bool:
-    now = datetime.now()
-    weekday_map = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
-    target_day = weekday_map.index(weekday.lower())
+_METRICS = SchedulerMetrics()
 
-    hh, mm = map(int, time_str.split(":"))
-    target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
 
-    if now.weekday() != target_day:
-        return False
-    if last_run is None:
-        return now >= target
-    return last_run.isocalendar()[1] < now.isocalendar()[1] and now >= target
+class TaskTimeout(Exception):
+    """A task run exceeded its timeout."""
 
 
-def _should_run_interval(last_run: datetime, seconds: int) -> bool:
-    if last_run is None:
+class TaskRun:
+    """
+    Handle for one run of a task. Status moves from "running" to one of
+    "succeeded", "failed", "timed_out", or is "skipped" straight away when the
+    task is already at its max concurrency.
+
+    Timeouts: in process mode the run is interrupted in its worker process. In
+    thread mode Python can't stop a thread, so the run is reported as timed_out
+    at the deadline while its concurrency slot stays held until it returns.
+    """
+
+    def __init__(self, name: str, scheduled_for: Optional[datetime], manual: bool):
+        self.run_id = uuid.uuid4().hex
+        self.name = name
+        self.scheduled_for = scheduled_for
+        self.manual = manual
+        self.status = "running"
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+
+    def _finish(self, status: str, error: Optional[str] = None) -> bool:
+        if self._done.is_set():
+            return False
+        self.status, self.error = status, error
+        self.finished_at = datetime.now()
+        self._done.set()
         return True
-    return datetime.now() >= last_run + timedelta(seconds=seconds)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the run finishes; returns False if 'timeout' elapsed first."""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "task": self.name,
+            "status": self.status,
+            "manual": self.manual,
+            "scheduled_for": self.scheduled_for.isoformat() if self.scheduled_for else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"<TaskRun {self.name} {self.status} {self.run_id}>"
+
+
+def configure_executor(kind: Optional[str] = None, max_workers: Optional[int] = None):
+    """
+    Choose where task runs execute: "thread" (default) or "process".
+    Process mode needs picklable (module-level) task functions.
+    Replaces the current pool; runs already submitted finish on the old one.
+    """
+    global _executor, EXECUTOR_KIND, EXECUTOR_WORKERS
+    kind = kind or EXECUTOR_KIND
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown executor kind '{kind}'")
+    EXECUTOR_KIND, EXECUTOR_WORKERS = kind, max_workers or EXECUTOR_WORKERS
+    with _COND:
+        old, _executor = _executor, None
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _get_executor():
+    global _executor, _executor_kind
+    with _COND:
+        if _executor is None:
+            if EXECUTOR_KIND == "process":
+                _executor = ProcessPoolExecutor(max_workers=EXECUTOR_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="xylo-task")
+            _executor_kind = EXECUTOR_KIND
+        return _executor, _executor_kind
+
+
+def shutdown_executor(wait: bool = True):
+    global _executor
+    with _COND:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _raise_task_timeout(signum, frame):
+    raise TaskTimeout()
+
+
+def _invoke(
+    func: Callable, timeout: Optional[float], in_process: bool, lease: Optional[tuple] = None
+) -> Tuple[float, str, Optional[str]]:
+    """
+    Runs in the pool. Returns (start_timestamp, status, error) so failures come
+    back with their start time (and without pickling exceptions across processes).
+    In a worker process the timeout is enforced with SIGALRM where available.
+    'lease' holds acquire_lease() arguments; the run is skipped if it is taken.
+    """
+    started = time.time()
+    if lease is not None and not acquire_lease(*lease):
+        return started, "skipped", LEASE_HELD
+    alarm = in_process and bool(timeout) and hasattr(signal, "setitimer")
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_task_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        func()
+        return started, "succeeded", None
+    except TaskTimeout:
+        return started, "timed_out", f"timed out after {timeout:g}s"
+    except Exception as e:
+        return started, "failed", f"{type(e).__name__}: {e}"
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        if lease is not None:
+            release_lease(lease[0], lease[3])
+
+
+def _run_coroutine(func: Callable, timeout: Optional[float]):
+    """Run an async task to completion on a private event loop (thread/process pool)."""
+    try:
+        asyncio.run(asyncio.wait_for(func(), timeout) if timeout else func())
+    except asyncio.TimeoutError:
+        raise TaskTimeout()
+
+
+async def _invoke_async(func: Callable, timeout: Optional[float], lease: Optional[tuple] = None) -> Tuple[float, str, Optional[str]]:
+    """Like _invoke, for async tasks running on the scheduler's event loop."""
+    started = time.time()
+    if lease is not None and not await asyncio.to_thread(acquire_lease, *lease):
+        return started, "skipped", LEASE_HELD
+    try:
+        if timeout:
+            await asyncio.wait_for(func(), timeout)
+        else:
+            await func()
+        return started, "succeeded", None
+    except asyncio.TimeoutError:
+        return started, "timed_out", f"timed out after {timeout:g}s"
+    except Exception as e:
+        return started, "failed", f"{type(e).__name__}: {e}"
+    finally:
+        if lease is not None:
+            await asyncio.to_thread(release_lease, lease[0], lease[3])
+
+
+# Futures of runs still executing (awaited on async shutdown)
+_INFLIGHT: set = set()
+
+
+def _track(run: TaskRun):
+    with _COND:
+        _RECENT_RUNS[run.run_id] = run
+        while len(_RECENT_RUNS) > RECENT_RUNS_LIMIT:
+            _RECENT_RUNS.popitem(last=False)
+
+
+def get_run(run_id: str) -> Optional[TaskRun]:
+    return _RECENT_RUNS.get(run_id)
+
+
+def _submit(task: Dict[str, Any], scheduled_for: Optional[datetime], manual: bool = False) -> TaskRun:
+    """
+    Hand one run of 'task' to the pool without waiting for it.
+    """
+    name = task["name"]
+    run = TaskRun(name, scheduled_for, manual)
+    _track(run)
+    with _COND:
+        if task["running"] >= task["max_concurrency"]:
+            run._finish("skipped", "previous run still in progress")
+            _log(logging.WARNING, "run_skipped", task=name, run_id=run.run_id, reason="previous run still in progress")
+            _METRICS.observe(name, "skipped", finished_at=run.finished_at)
+            _record(task, run)
+            return run
+        task["running"] += 1
+
+    _log(logging.DEBUG, "run_submitted", task=name, run_id=run.run_id, manual=manual, scheduled_for=_iso(scheduled_for))
+    func, timeout = task["func"], task["timeout"]
+    lease = _lease_args(task, scheduled_for, manual) if LEASES_ENABLED else None
+    is_async = inspect.iscoroutinefunction(func)
+    loop = _async_loop
+    kind = "loop"
+    try:
+        if is_async and loop is not None:
+            # coroutine tasks share the app's event loop; timeouts cancel them
+            future = asyncio.run_coroutine_threadsafe(_invoke_async(func, timeout, lease), loop)
+        else:
+            executor, kind = _get_executor()
+            if is_async:
+                func = functools.partial(_run_coroutine, func, timeout)
+            future = executor.submit(_invoke, func, timeout, kind == "process", lease)
+    except Exception as e:  # pool shut down, or func not picklable for a process pool
+        future = Future()
+        future.set_exception(e)
+
+    if timeout and kind == "thread" and not is_async:
+        timer = threading.Timer(timeout, _on_timeout, (run, timeout))
+        timer.daemon = True
+        timer.start()
+    _INFLIGHT.add(future)
+    future.add_done_callback(lambda f: _on_done(task, run, f))
+    if lease is not None:
+        _ensure_lease_renewer()
+    return run
+
+
+def _on_timeout(run: TaskRun, timeout: float):
+    if run._finish("timed_out", f"timed out after {timeout:g}s"):
+        _log(logging.WARNING, "run_timed_out", task=run.name, run_id=run.run_id, timeout=f"{timeout:g}s")
+
+
+def _on_done(task: Dict[str, Any], run: TaskRun, future: Future):
+    ended = time.time()
+    _INFLIGHT.discard(future)
+    error = None if future.cancelled() else future.exception()
+    started = None
+    if future.cancelled():
+        status, message = "failed", "cancelled at shutdown"
+    elif error is None:
+        started, status, message = future.result()
+        run.started_at = datetime.fromtimestamp(started)
+    else:  # never reached the pool (or the worker process died)
+        status, message = "failed", f"{type(error).__name__}: {error}"
+
+    with _COND:
+        task["running"] -= 1
+        if status != "skipped":  # e.g. another instance held the lease
+            task["last_run"] = datetime.now()
+        backlog = task["_backlog"].popleft() if task["_backlog"] else None
+    on_time = run._finish(status, message)
+
+    # lag includes time queued for a pool worker; duration is the real run
+    # time, even when the run was already reported as timed out
+    ran = started and status != "skipped"
+    lag = started - run.scheduled_for.timestamp() if ran and run.scheduled_for else None
+    duration = ended - started if ran else None
+    _METRICS.observe(run.name, run.status, lag, duration, run.error, run.finished_at)
+    fields = dict(
+        task=run.name,
+        run_id=run.run_id,
+        status=status,
+        manual=run.manual or None,
+        lag_ms=round(lag * 1000, 1) if lag is not None else None,
+        duration_ms=round(duration * 1000, 1) if duration is not None else None,
+        error=message,
+    )
+    if not on_time:
+        _log(logging.WARNING, "run_finished_after_timeout", **fields)
+    elif status == "skipped":
+        _log(logging.INFO, "run_skipped", **fields)
+    elif status == "succeeded":
+        _log(logging.INFO, "run_finished", **fields)
+    else:
+        _log(logging.ERROR, "run_failed", **fields)
+    _record(task, run)
+    if backlog is not None:
+        _submit(task, backlog)  # next missed slot ("all" catch-up), one at a time
+
+
+# -------------------------------------------------------------------
+# Persistent State + Catch-Up
+# -------------------------------------------------------------------
+
+PERSIST_STATE = os.environ.get("XYLO_SCHEDULER_PERSIST", "1") != "0"
+CATCHUP_POLICIES = ("once", "all", "skip")
+MAX_CATCHUP_RUNS = 100
+RUN_HISTORY_DAYS = int(os.environ.get("XYLO_SCHEDULER_HISTORY_DAYS", "30"))
+
+_state_loaded = False
+
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class _StateWriter:
+    """
+    Persists finished runs from a background thread, batching everything queued
+    into one transaction, so a burst of runs costs a few commits, not one each.
+    """
+
+    BATCH_LIMIT = 1000
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[tuple, tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, task_row: tuple, run_row: tuple):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="xylo-scheduler-state", daemon=True)
+                self._thread.start()
+        self._queue.put((task_row, run_row))
+
+    def flush(self):
+        """Block until everything queued so far is written."""
+        self._queue.join()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_LIMIT:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                _log(logging.ERROR, "state_persist_failed", runs=len(batch), error=f"{type(e).__name__}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _write(batch):
+        acct._ensure_schema()
+        conn = acct._get_conn()
+        try:
+            conn.executemany(
+                """
+                INSERT INTO scheduler_tasks (name, schedule, last_fire, last_run, last_status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    schedule = excluded.schedule,
+                    last_fire = COALESCE(excluded.last_fire, scheduler_tasks.last_fire),
+                    last_run = COALESCE(excluded.last_run, scheduler_tasks.last_run),
+                    last_status = excluded.last_status,
+                    updated_at = excluded.updated_at
+                """,
+                [task_row for task_row, _ in batch],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO scheduler_runs (run_id, task, scheduled_for, started_at, finished_at, status, error, manual) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [run_row for _, run_row in batch],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+_STATE_WRITER = _StateWriter()
+
+
+def _record(task: Dict[str, Any], run: TaskRun):
+    """
+    Note a finished (or skipped) run. A scheduled run marks its slot handled,
+    whatever the outcome; manual runs leave the schedule position alone.
+    """
+    if not run.manual:
+        with _COND:
+            if task["last_fire"] is None or run.scheduled_for > task["last_fire"]:
+                task["last_fire"] = run.scheduled_for
+    if not PERSIST_STATE:
+        return
+    task_row = (
+        task["name"],
+        task["schedule"],
+        None if run.manual else _iso(run.scheduled_for),
+        _iso(run.finished_at) if run.status != "skipped" else None,
+        run.status,
+        datetime.now().isoformat(),
+    )
+    run_row = (
+        run.run_id,
+        run.name,
+        _iso(run.scheduled_for),
+        _iso(run.started_at),
+        _iso(run.finished_at),
+        run.status,
+        run.error,
+        int(run.manual),
+    )
+    _STATE_WRITER.put(task_row, run_row)
+
+
+def flush_state():
+    """Wait until every finished run so far is persisted."""
+    _STATE_WRITER.flush()
+
+
+def _load_state(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Persisted state for all tasks (one query), or only 'names'.
+    """
+    if not PERSIST_STATE:
+        return {}
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    try:
+        if names is None:
+            rows = conn.execute("SELECT name, last_fire, last_run FROM scheduler_tasks").fetchall()
+        else:
+            marks = ",".join("?" * len(names))
+            rows = conn.execute(f"SELECT name, last_fire, last_run FROM scheduler_tasks WHERE name IN ({marks})", names).fetchall()
+    finally:
+        conn.close()
+    return {r["name"]: r for r in rows}
+
+
+def _missed_slots(trigger, last_fire: datetime, now: datetime, policy: str) -> List[datetime]:
+    slots: List[datetime] = []
+    if policy == "skip":
+        return slots
+    fire = trigger.next_after(last_fire)
+    while fire <= now:
+        slots.append(fire)
+        if policy == "once" or len(slots) >= MAX_CATCHUP_RUNS:
+            break
+        fire = trigger.next_after(fire)
+    return slots
+
+
+def _latest_slot(trigger, last_fire: datetime, now: datetime) -> datetime:
+    """The last slot at or before 'now' (the schedule's fire time, not 'now')."""
+    if isinstance(trigger, IntervalTrigger):
+        missed = int((now - last_fire).total_seconds() // trigger.seconds)
+        return last_fire + timedelta(seconds=missed * trigger.seconds)
+    slot = trigger.next_after(last_fire)
+    while True:
+        following = trigger.next_after(slot)
+        if following > now:
+            return slot
+        slot = following
+
+
+def _apply_state(task: Dict[str, Any], row, now: datetime) -> Tuple[datetime, Optional[datetime]]:
+    """
+    Merge a persisted row into 'task', queue its catch-up runs in task["_backlog"]
+    and return (next regular fire time, its slot). Caller holds _COND.
+    """
+    trigger = task["trigger"]
+    if row is not None:
+        last_run = _parse_dt(row["last_run"])
+        if last_run and (task["last_run"] is None or last_run > task["last_run"]):
+            task["last_run"] = last_run
+        last_fire = _parse_dt(row["last_fire"])
+        if last_fire and (task["last_fire"] is None or last_fire > task["last_fire"]):
+            task["last_fire"] = last_fire
+
+    if task["last_fire"] is None:
+        # never ran here before: no history to catch up on
+        if task["catchup"] == "skip":
+            return trigger.next_after(now), None
+        return _first_fire(trigger, task["last_run"], now)
+
+    missed = _missed_slots(trigger, task["last_fire"], now, task["catchup"])
+    if missed and task["catchup"] == "once":
+        # one run covers every missed slot up to now; it claims the latest
+        # one, so every instance catching up claims the same slot
+        _log(logging.INFO, "missed_runs", task=task["name"], since=missed[0].isoformat())
+        missed = [_latest_slot(trigger, task["last_fire"], now)]
+    task["_backlog"] = deque(missed)
+    if missed and task["catchup"] == "all" and len(missed) >= MAX_CATCHUP_RUNS:
+        _log(logging.WARNING, "catchup_capped", task=task["name"], runs=MAX_CATCHUP_RUNS)
+    upcoming = trigger.next_after(task["last_fire"])
+    return (upcoming if upcoming > now else trigger.next_after(now)), None
+
+
+def _start_catchup(task: Dict[str, Any]):
+    """Submit the first queued catch-up run; the rest follow one by one."""
+    with _COND:
+        if not task["_backlog"] or task["running"]:
+            return
+        slot = task["_backlog"].popleft()
+    _log(logging.INFO, "catchup_run", task=task["name"], slot=slot.isoformat())
+    _submit(task, slot)
+
+
+def restore_state():
+    """
+    Load persisted state for every registered task with a single query, plan
+    catch-up runs, and rebuild the run queue in one heapify. Called by
+    start_scheduler; later registrations load their own row.
+    """
+    global _state_loaded
+    state = _load_state()
+    now = datetime.now()
+    with _COND:
+        for task in TASK_REGISTRY.values():
+            fire_at, slot = _apply_state(task, state.get(task["name"]), now)
+            task["next_run"] = fire_at
+            task["_slot"] = slot or fire_at
+            task["_seq"] = next(_SEQ)
+        _HEAP[:] = [(t["next_run"].timestamp(), t["_seq"], t["name"]) for t in TASK_REGISTRY.values()]
+        heapq.heapify(_HEAP)
+        _state_loaded = True
+        tasks = list(TASK_REGISTRY.values())
+        _wake()
+    for task in tasks:
+        _start_catchup(task)
+
+
+def purge_run_history(days: Optional[int] = None) -> int:
+    """Delete scheduler_runs older than 'days' (default XYLO_SCHEDULER_HISTORY_DAYS)."""
+    cutoff = (datetime.now() - timedelta(days=days or RUN_HISTORY_DAYS)).isoformat()
+    acct._ensure_schema()
+    conn = acct._get_conn()
+    try:
+        cur = conn.execute("DELETE FROM scheduler_runs WHERE finished_at < ?", (cutoff,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# -------------------------------------------------------------------
+# Task Leases (one run per slot across processes)
+# -------------------------------------------------------------------
+
+LEASES_ENABLED = os.environ.get("XYLO_SCHEDULER_LEASES", "1") != "0"
+LEASE_TTL_SECONDS = float(os.environ.get("XYLO_SCHEDULER_LEASE_TTL", "60"))
+LEASE_HELD = "lease held by another scheduler instance"
+
+# Lease owner id of this process
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_renewer_started = False
+
+
+def acquire_lease(task_name: str, slot: Optional[str], after: Optional[str], owner: str, ttl: float) -> bool:
+    """
+    Take the lease on 'task_name' for 'ttl' seconds, in one atomic upsert.
+    It is granted when the lease is free, already 'owner's, or expired (a
+    crashed or hung owner is taken over). An owner's overlapping runs
+    (max_concurrency > 1) are counted, and release_lease() only frees the
+    lease when the last of them ends. A scheduled run also claims its
+    'slot', and only if every slot claimed before is earlier than 'after', so
+    each slot runs once however many instances fire it. Manual runs pass
+    slot=None and only need the lease.
+    """
+    acct._ensure_schema()
+    now = datetime.utcnow()
+    conn = acct._get_conn()
+    try:
+        cur = conn.execute(
+            """
+            INSERT INTO scheduler_leases(task, owner, holders, slot, acquired_at, expires_at)
+            VALUES (:task, :owner, 1, :slot, :now, :expires)
+            ON CONFLICT(task) DO UPDATE SET
+                holders = CASE WHEN scheduler_leases.owner = excluded.owner AND scheduler_leases.expires_at > excluded.acquired_at
+                               THEN COALESCE(scheduler_leases.holders, 0) + 1 ELSE 1 END,
+                owner = excluded.owner,
+                slot = COALESCE(excluded.slot, scheduler_leases.slot),
+                acquired_at = excluded.acquired_at,
+                expires_at = excluded.expires_at
+            WHERE (scheduler_leases.owner IS NULL OR scheduler_leases.owner = excluded.owner
+                   OR scheduler_leases.expires_at <= excluded.acquired_at)
+              AND (:slot IS NULL OR scheduler_leases.slot IS NULL OR scheduler_leases.slot < :after)
+            """,
+            {"task": task_name, "owner": owner, "slot": slot, "after": after or slot,
+             "now": now.isoformat(), "expires": (now + timedelta(seconds=ttl)).isoformat()},
+        )
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def release_lease(task_name: str, owner: str):
+    """
+    End one of 'owner's runs under the lease; the lease is given back when no
+    other run of the owner still holds it (its claimed slot stays recorded).
+    """
+    conn = acct._get_conn()
+    try:
+        conn.execute(
+            """
+            UPDATE scheduler_leases SET
+                holders = MAX(COALESCE(holders, 1) - 1, 0),
+                owner = CASE WHEN COALESCE(holders, 1) <= 1 THEN NULL ELSE owner END,
+                expires_at = CASE WHEN COALESCE(holders, 1) <= 1 THEN :now ELSE expires_at END
+            WHERE task = :task AND owner = :owner
+            """,
+            {"now": datetime.utcnow().isoformat(), "task": task_name, "owner": owner},
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def renew_leases(owner: str, task_names: List[str], ttl: float) -> int:
+    """Extend 'owner's leases on 'task_names' by 'ttl' seconds; returns how many it still held."""
+    if not task_names:
+        return 0
+    acct._ensure_schema()
+    expires = (datetime.utcnow() + timedelta(seconds=ttl)).isoformat()
+    conn = acct._get_conn()
+    try:
+        renewed = 0
+        for i in range(0, len(task_names), 500):
+            chunk = task_names[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            cur = conn.execute(
+                f"UPDATE scheduler_leases SET expires_at = ? WHERE owner = ? AND task IN ({marks})",
+                [expires, owner, *chunk],
+            )
+            renewed += cur.rowcount
+        conn.commit()
+        return renewed
+    finally:
+        conn.close()
+
+
+def _lease_args(task: Dict[str, Any], scheduled_for: Optional[datetime], manual: bool) -> tuple:
+    """
+    acquire_lease() arguments for one run. Daily/weekly/cron slots are the same
+    instant in every instance. Interval slots depend on when each instance
+    started, so a slot within half an interval of the last claimed one counts
+    as the same slot.
+    """
+    if manual or scheduled_for is None:
+        return task["name"], None, None, INSTANCE_ID, LEASE_TTL_SECONDS
+    after = scheduled_for
+    if isinstance(task["trigger"], IntervalTrigger):
+        after = scheduled_for - timedelta(seconds=task["trigger"].seconds / 2)
+    return task["name"], _iso(scheduled_for), _iso(after), INSTANCE_ID, LEASE_TTL_SECONDS
+
+
+def _lease_renewer():
+    """Keeps the leases of this instance's running tasks alive (every TTL/3)."""
+    while True:
+        time.sleep(LEASE_TTL_SECONDS / 3)
+        with _COND:
+            running = [t["name"] for t in TASK_REGISTRY.values() if t["running"]]
+        try:
+            renew_leases(INSTANCE_ID, running, LEASE_TTL_SECONDS)
+        except Exception as e:
+            _log(logging.ERROR, "lease_renewal_failed", tasks=len(running), error=f"{type(e).__name__}: {e}")
+
+
+def _ensure_lease_renewer():
+    global _renewer_started
+    with _COND:
+        if _renewer_started:
+            return
+        _renewer_started = True
+    threading.Thread(target=_lease_renewer, name="xylo-lease-renewer", daemon=True).start()
 
 
 # -------------------------------------------------------------------
@@ -82,39 +966,42 @@ def _should_run_interval(last_run: datetime, seconds: int) -> bool:
 # -------------------------------------------------------------------
 
 def _worker():
+    """
+    Sleeps until the earliest deadline (or a new registration), then hands what
+    is due to the pool. Idle cost is independent of how many tasks are registered.
+    """
     while True:
-        for name, task in TASK_REGISTRY.items():
-            schedule = task["schedule"]
-            func = task["func"]
-            last = task["last_run"]
+        with _COND:
+            while True:
+                now = time.time()
+                due, next_ts = _pop_due(now)
+                if due:
+                    break
+                timeout = _MAX_SLEEP_SECONDS if next_ts is None else min(next_ts - now, _MAX_SLEEP_SECONDS)
+                _COND.wait(timeout)
+        for task, slot in due:
+            _submit(task, slot)
 
-            try:
-                if schedule.startswith("daily@"):
-                    _, time_str = schedule.split("@")
-                    if _should_run_daily(last, time_str):
-                        print(f"[XYLO Scheduler] Running daily task: {name}")
-                        func()
-                        task["last_run"] = datetime.now()
-
-                elif schedule.startswith("weekly@"):
-                    _, weekday, time_str = schedule.split("@")
-                    if _should_run_weekly(last, weekday, time_str):
-                        print(f"[XYLO Scheduler] Running weekly task: {name}")
-                        func()
-                        task["last_run"] = datetime.now()
-
-                elif schedule.startswith("interval@"):
-                    _, seconds = schedule.split("@")
-                    seconds = int(seconds)
-                    if _should_run_interval(last, seconds):
-                        print(f"[XYLO Scheduler] Running interval task: {name}")
-                        func()
-                        task["last_run"] = datetime.now()
 
-            except Exception as e:
-                print(f"[XYLO Scheduler] Error running task {name}: {e}")
-
-        time.sleep(1)
+async def _async_worker():
+    """
+    _worker for the asyncio mode: the same heap, but waiting on an asyncio.Event
+    instead of the condition, so the loop runs as a task on the app's event loop.
+    """
+    while True:
+        with _COND:
+            now = time.time()
+            due, next_ts = _pop_due(now)
+            _async_wakeup.clear()  # registrations after this point set it again
+        for task, slot in due:
+            _submit(task, slot)
+        if due:
+            continue
+        timeout = _MAX_SLEEP_SECONDS if next_ts is None else min(next_ts - now, _MAX_SLEEP_SECONDS)
+        try:
+            await asyncio.wait_for(_async_wakeup.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
 
 
 # -------------------------------------------------------------------
@@ -122,20 +1009,102 @@ def _worker():
 # -------------------------------------------------------------------
 
 def start_scheduler():
-    """Start the automation engine in a background thread."""
-    thread = threading.Thread(target=_worker, daemon=True)
+    """Start the automation engine in a background thread (once per process)."""
+    global _started
+    with _COND:
+        if _started:
+            return
+        _started = True
+    restore_state()
+    thread = threading.Thread(target=_worker, name="xylo-scheduler", daemon=True)
     thread.start()
-    print("[XYLO Scheduler] Background scheduler started.")
+    _log(logging.INFO, "scheduler_started", mode="thread", tasks=len(TASK_REGISTRY))
+
+
+async def start_async_scheduler():
+    """
+    Start the scheduler as a task on the running event loop (e.g. from the
+    FastAPI lifespan) instead of a background thread. Async tasks run on this
+    loop and can share the app's clients; sync tasks still go to the pool.
+    """
+    global _started, _async_loop, _async_wakeup, _async_task
+    with _COND:
+        if _started:
+            return
+        _started = True
+        _async_loop = asyncio.get_running_loop()
+        _async_wakeup = asyncio.Event()
+    await _async_loop.run_in_executor(None, restore_state)  # one DB query; keep it off the loop
+    _async_task = _async_loop.create_task(_async_worker(), name="xylo-scheduler")
+    _log(logging.INFO, "scheduler_started", mode="async", tasks=len(TASK_REGISTRY))
+
+
+async def stop_async_scheduler(timeout: float = 10.0):
+    """
+    Stop the async scheduler: no new dispatches, wait up to 'timeout' seconds
+    for runs in flight (async runs still pending are then cancelled), flush
+    persisted state and shut the pool down.
+    """
+    global _started, _async_loop, _async_wakeup, _async_task
+    if _async_task is None:
+        return
+    _async_task.cancel()
+    try:
+        await _async_task
+    except asyncio.CancelledError:
+        pass
 
+    pending = [asyncio.wrap_future(f) for f in list(_INFLIGHT)]
+    if pending:
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        for f in not_done:
+            f.cancel()  # cancels async runs; sync runs already on a worker keep going
+    shutdown_executor(wait=False)
+    await asyncio.get_running_loop().run_in_executor(None, flush_state)
+    with _COND:
+        _started = False
+        _async_loop = _async_wakeup = _async_task = None
+    _log(logging.INFO, "scheduler_stopped", mode="async")
 
-def run_task_now(task_name: str):
-    """Manually trigger a task (used by API backend)."""
+
+def run_task_now(task_name: str) -> TaskRun:
+    """
+    Manually trigger a task (used by API backend). Returns immediately with a
+    TaskRun handle; call handle.wait() to block until it finishes.
+    """
     if task_name not in TASK_REGISTRY:
         raise ValueError(f"Task '{task_name}' not found.")
-    func = TASK_REGISTRY[task_name]["func"]
-    print(f"[XYLO Scheduler] Manually triggering: {task_name}")
-    func()
-    TASK_REGISTRY[task_name]["last_run"] = datetime.now()
+    return _submit(TASK_REGISTRY[task_name], None, manual=True)
+
+
+def get_metrics(task_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run metrics for every task (or one): counts by status, lag and duration
+    histograms (seconds), last error; plus scheduler-wide pool figures. A
+    steadily growing lag p99 with the pool busy means it needs more workers.
+    """
+    snapshot = _METRICS.snapshot(task_name)
+    with _COND:
+        for name, metrics in snapshot["tasks"].items():
+            task = TASK_REGISTRY.get(name)
+            if task is not None:
+                metrics["running"] = task["running"]
+                metrics["next_run"] = _iso(task["next_run"])
+        snapshot["scheduler"] = {
+            "started": _started,
+            "mode": "async" if _async_loop is not None else "thread",
+            "executor": EXECUTOR_KIND,
+            "workers": EXECUTOR_WORKERS,
+            "tasks": len(TASK_REGISTRY),
+            "in_flight": len(_INFLIGHT),
+            "instance": INSTANCE_ID,
+            "leases": LEASES_ENABLED,
+        }
+    return snapshot
+
+
+def reset_metrics():
+    _METRICS.reset()
 
 
 # -------------------------------------------------------------------
@@ -143,7 +1112,7 @@ def run_task_now(task_name: str):
 # -------------------------------------------------------------------
 
 def daily_summary():
-    print("[XYLO Automation] Generating daily financial summary (DEMO).")
+    _log(logging.INFO, "daily_summary", demo=True)
     # In production:
     # summary = accounting_engine.daily_summary()
     # email_service.send(summary)
@@ -151,18 +1120,31 @@ def daily_summary():
 
 
 def weekly_backup():
-    print("[XYLO Automation] Running weekly database backup (DEMO).")
+    _log(logging.INFO, "weekly_backup", demo=True)
     # Would run DB dump or upload to cloud storage here.
     pass
 
 
+def purge_idempotency_keys():
+    removed = acct.purge_expired_idempotency_keys()
+    _log(logging.INFO, "idempotency_keys_purged", removed=removed)
+
+
+def purge_scheduler_history():
+    removed = purge_run_history()
+    _log(logging.INFO, "scheduler_history_purged", removed=removed)
+
+
 # Register demo tasks
 register_task("daily_summary", "daily@22:00", daily_summary)
 register_task("weekly_backup", "weekly@sun@03:00", weekly_backup)
+register_task("purge_idempotency_keys", "interval@3600", purge_idempotency_keys)
+register_task("purge_scheduler_history", "interval@86400", purge_scheduler_history, catchup="skip")
 
 
 # For local demo testing:
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
     start_scheduler()
     while True:
         time.sleep(10)
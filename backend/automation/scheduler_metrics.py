@@ -0,0 +1,172 @@
+# backend/automation/scheduler_metrics.py
+"""
+XYLO — Scheduler Run Metrics
+
+In-process counters and fixed-bucket histograms for scheduler runs, per task:
+- scheduling lag: when the run actually started minus the slot it was meant
+  for. It includes time spent waiting for a free pool worker, so a growing lag
+  means the pool is too small
+- run duration
+- run counts by status (succeeded, failed, timed_out, skipped)
+- last status, last error and when it happened
+
+Histograms use fixed bucket bounds and only store buckets that were hit.
+Recording a run is a bisect plus a few integer updates under one lock. Memory
+is about 1 KB per task, however many runs are recorded. Quantiles are
+estimated as the upper bound of the bucket they fall in, capped at the largest
+value seen.
+"""
+
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+# Bucket upper bounds, in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600)
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+RUN_STATUSES = ("succeeded", "failed", "timed_out", "skipped")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. counts[i] holds values <= bounds[i] (and above the
+    previous bound); counts[len(bounds)] holds values above every bound.
+    Buckets never hit are absent.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                bound = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, []
+        for i, bound in enumerate(self.bounds + ("+Inf",)):
+            cumulative += self.counts.get(i, 0)
+            buckets.append({"le": bound, "count": cumulative})
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class TaskMetrics:
+    __slots__ = ("runs", "lag", "duration", "last_status", "last_finished_at", "last_error", "last_error_at")
+
+    def __init__(self):
+        self.runs: Dict[str, int] = {}
+        self.lag = Histogram(LAG_BUCKETS)
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.last_status: Optional[str] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": dict(dict.fromkeys(RUN_STATUSES, 0), **self.runs, total=sum(self.runs.values())),
+            "lag_seconds": self.lag.to_dict(),
+            "duration_seconds": self.duration.to_dict(),
+            "last_status": self.last_status,
+            "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at.isoformat() if self.last_error_at else None,
+        }
+
+
+class SchedulerMetrics:
+    """
+    Thread-safe registry of TaskMetrics, one per task name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, TaskMetrics] = {}
+
+    def observe(
+        self,
+        task: str,
+        status: str,
+        lag: Optional[float] = None,
+        duration: Optional[float] = None,
+        error: Optional[str] = None,
+        finished_at: Optional[datetime] = None,
+    ):
+        """
+        Record one finished run. 'lag' is None for manual runs and 'duration'
+        is None for runs that never started (skipped, or rejected by the pool).
+        """
+        with self._lock:
+            metrics = self._tasks.get(task)
+            if metrics is None:
+                metrics = self._tasks[task] = TaskMetrics()
+            metrics.runs[status] = metrics.runs.get(status, 0) + 1
+            if lag is not None:
+                metrics.lag.observe(max(lag, 0.0))
+            if duration is not None:
+                metrics.duration.observe(max(duration, 0.0))
+            metrics.last_status = status
+            metrics.last_finished_at = finished_at or datetime.now()
+            if error and status != "skipped":
+                metrics.last_error = error
+                metrics.last_error_at = metrics.last_finished_at
+
+    def snapshot(self, task: Optional[str] = None) -> Dict[str, Any]:
+        """
+        {"tasks": {name: metrics}, "totals": run counts by status}, optionally
+        for one task only.
+        """
+        with self._lock:
+            names = [task] if task is not None else sorted(self._tasks)
+            tasks = {name: self._tasks[name].to_dict() for name in names if name in self._tasks}
+        totals = dict.fromkeys(RUN_STATUSES, 0)
+        for metrics in tasks.values():
+            for status, n in metrics["runs"].items():
+                if status != "total":
+                    totals[status] = totals.get(status, 0) + n
+        totals["total"] = sum(totals.values())
+        return {"tasks": tasks, "totals": totals}
+
+    def forget(self, task: str):
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def reset(self):
+        with self._lock:
+            self._tasks.clear()
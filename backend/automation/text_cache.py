@@ -0,0 +1,182 @@
+# backend/automation/text_cache.py
+"""
+XYLO — Content-Addressed Text Cache
+
+On-disk cache for text extracted from invoice PDFs, so re-uploaded or re-parsed
+files (e.g. after a posting rules change) skip PDF decoding entirely.
+
+- Key: SHA-256 of the file bytes plus the extractor version, so a new parser
+  release or PyPDF2 upgrade never serves stale text
+- Entries are plain UTF-8 files sharded by the first two hex digits of the key
+- Size-bounded LRU: every hit refreshes the entry's mtime; when the cache grows
+  past its byte budget the least recently used entries are deleted
+- Writes are atomic (temp file + os.replace), so concurrent pool workers can
+  share one cache directory
+- hits / misses / evictions counters (per process) via stats()
+
+Config:
+    XYLO_TEXT_CACHE_DIR     cache directory (default backend/tmp/text_cache)
+    XYLO_TEXT_CACHE_MAX_MB  byte budget in MB (default 256, 0 disables the cache)
+"""
+
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.environ.get("XYLO_TEXT_CACHE_DIR", "backend/tmp/text_cache")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("XYLO_TEXT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+# After eviction the cache is trimmed to this fraction of its budget, so a full
+# cache doesn't rescan the directory on every insert
+_EVICT_TO = 0.8
+
+
+class TextCache:
+    """
+    Size-bounded LRU cache of extracted text on disk, keyed by content hash.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size: Optional[int] = None  # lazily measured on first insert
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(data: bytes, version: str) -> str:
+        digest = hashlib.sha256(version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def derive(key: str, part: str) -> str:
+        """
+        Key for one part of a keyed document (e.g. a single page).
+        """
+        return hashlib.sha256(f"{key}#{part}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".txt")
+
+    # --------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached text or None. A hit marks the entry most recently used.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except (FileNotFoundError, UnicodeDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+        if self._size is None:
+            self._size = self._measure()
+        else:
+            self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_or_extract(self, data: bytes, version: str, extract: Callable[[bytes], str]) -> str:
+        """
+        Cached text for 'data', calling extract(data) (and caching it) on a miss.
+        Exceptions from extract() propagate and nothing is cached.
+        """
+        if not self.enabled:
+            return extract(data)
+        key = self.key(data, version)
+        text = self.get(key)
+        if text is None:
+            text = extract(data)
+            self.put(key, text)
+        return text
+
+    # --------------------------------------------------------
+    def _entries(self):
+        """
+        Yields (mtime, size, path) for every cache entry.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".txt"):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    yield st.st_mtime, st.st_size, entry.path
+
+    def _measure(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is back under budget.
+        """
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        target = int(self.max_bytes * _EVICT_TO)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for _, _, path in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._measure(),
+            "max_bytes": self.max_bytes,
+            "directory": self.directory,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_text_cache() -> TextCache:
+    """
+    Process-wide cache configured from XYLO_TEXT_CACHE_DIR / XYLO_TEXT_CACHE_MAX_MB.
+    """
+    return TextCache()
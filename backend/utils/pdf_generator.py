@@ -8,40 +8,79 @@ This module generates professional PDF reports for:
 - Balance sheet snapshots
 - Trial balance tables
 
+Each report is split into a data step (accounting queries) and a render step
+(ReportLab layout, CPU-bound). render_reports() fetches each report's data
+once and renders a whole batch across a process pool, for month-end runs.
+
 These PDFs can be:
 - Downloaded via API
 - Emailed via email_service.py
 - Auto-generated via automation scheduler
 """
 
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Callable, Iterable, Iterator, Optional
 
 import backend.accounting_engine.stubs as acct
 
+# ReportLab is imported on first render, not at module import, to keep API cold start fast.
+
 
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
 
-styles = getSampleStyleSheet()
-TITLE = styles["Title"]
-HEADER = styles["Heading2"]
-NORMAL = styles["BodyText"]
+@lru_cache(maxsize=None)
+def _styles():
+    """
+    Returns (TITLE, HEADER, NORMAL) paragraph styles, built once on first use.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    return styles["Title"], styles["Heading2"], styles["BodyText"]
 
 
 def _timestamp():
     return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
 
+def _tb_table(tb: List[Dict[str, Any]]):
+    from reportlab.platypus import Table, TableStyle
+    from reportlab.lib import colors
+
+    tb_data = [["Account Code", "Account Name", "Type", "Debit", "Credit"]]
+    for row in tb:
+        tb_data.append([
+            row["account_code"],
+            row["account_name"],
+            row["type"],
+            f"{row['total_debit']:.2f}",
+            f"{row['total_credit']:.2f}",
+        ])
+
+    table = Table(tb_data)
+    table.setStyle(
+        TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ])
+    )
+    return table
+
+
 def _save_pdf(path: str, elements: List[Any]):
     """
     Builds the PDF document at the provided path.
     """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
     doc = SimpleDocTemplate(path, pagesize=A4)
     doc.build(elements)
     return path
@@ -51,15 +90,26 @@ def _save_pdf(path: str, elements: List[Any]):
 # 1. Daily Summary PDF
 # ------------------------------------------------------------
 
-def create_daily_summary_pdf(output_path: str) -> str:
+def daily_summary_data() -> Dict[str, Any]:
     today = datetime.utcnow().date().isoformat()
-    pnl = acct.compute_profit_and_loss(today, today)
-    tb = acct.compute_trial_balance(today, today)
+    return {
+        "date": today,
+        "generated_at": _timestamp(),
+        "pnl": acct.compute_profit_and_loss(today, today),
+        "trial_balance": acct.compute_trial_balance(today, today),
+    }
+
+
+def render_daily_summary_pdf(data: Dict[str, Any], output_path: str) -> str:
+    from reportlab.platypus import Paragraph, Spacer
+
+    TITLE, HEADER, NORMAL = _styles()
+    pnl = data["pnl"]
 
     elements = []
     elements.append(Paragraph("XYLO — Daily Summary Report", TITLE))
-    elements.append(Paragraph(f"Date: {today}", NORMAL))
-    elements.append(Paragraph(f"Generated at: {_timestamp()}", NORMAL))
+    elements.append(Paragraph(f"Date: {data['date']}", NORMAL))
+    elements.append(Paragraph(f"Generated at: {data['generated_at']}", NORMAL))
     elements.append(Spacer(1, 12))
 
     # P&L Section
@@ -71,41 +121,32 @@ def create_daily_summary_pdf(output_path: str) -> str:
 
     # Trial Balance Section
     elements.append(Paragraph("Trial Balance", HEADER))
+    elements.append(_tb_table(data["trial_balance"]))
 
-    tb_data = [["Account Code", "Account Name", "Type", "Debit", "Credit"]]
-    for row in tb:
-        tb_data.append([
-            row["account_code"],
-            row["account_name"],
-            row["type"],
-            f"{row['total_debit']:.2f}",
-            f"{row['total_credit']:.2f}",
-        ])
-
-    tb_table = Table(tb_data)
-    tb_table.setStyle(
-        TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ])
-    )
+    return _save_pdf(output_path, elements)
 
-    elements.append(tb_table)
 
-    return _save_pdf(output_path, elements)
+def create_daily_summary_pdf(output_path: str) -> str:
+    return render_daily_summary_pdf(daily_summary_data(), output_path)
 
 
 # ------------------------------------------------------------
 # 2. Profit & Loss PDF
 # ------------------------------------------------------------
 
-def create_pnl_pdf(output_path: str) -> str:
-    pnl = acct.compute_profit_and_loss()
+def pnl_data() -> Dict[str, Any]:
+    return {"generated_at": _timestamp(), "pnl": acct.compute_profit_and_loss()}
+
+
+def render_pnl_pdf(data: Dict[str, Any], output_path: str) -> str:
+    from reportlab.platypus import Paragraph, Spacer
+
+    TITLE, _, NORMAL = _styles()
+    pnl = data["pnl"]
 
     elements = [
         Paragraph("XYLO — Profit & Loss Report", TITLE),
-        Paragraph(f"Generated: {_timestamp()}", NORMAL),
+        Paragraph(f"Generated: {data['generated_at']}", NORMAL),
         Spacer(1, 12),
         Paragraph(f"Income: ₹{pnl['income']:.2f}", NORMAL),
         Paragraph(f"Expenses: ₹{pnl['expense']:.2f}", NORMAL),
@@ -115,16 +156,27 @@ def create_pnl_pdf(output_path: str) -> str:
     return _save_pdf(output_path, elements)
 
 
+def create_pnl_pdf(output_path: str) -> str:
+    return render_pnl_pdf(pnl_data(), output_path)
+
+
 # ------------------------------------------------------------
 # 3. Balance Sheet PDF
 # ------------------------------------------------------------
 
-def create_balance_sheet_pdf(output_path: str) -> str:
-    bs = acct.compute_balance_sheet()
+def balance_sheet_data() -> Dict[str, Any]:
+    return {"generated_at": _timestamp(), "balance_sheet": acct.compute_balance_sheet()}
+
+
+def render_balance_sheet_pdf(data: Dict[str, Any], output_path: str) -> str:
+    from reportlab.platypus import Paragraph, Spacer
+
+    TITLE, _, NORMAL = _styles()
+    bs = data["balance_sheet"]
 
     elements = [
         Paragraph("XYLO — Balance Sheet", TITLE),
-        Paragraph(f"Generated: {_timestamp()}", NORMAL),
+        Paragraph(f"Generated: {data['generated_at']}", NORMAL),
         Spacer(1, 12),
         Paragraph(f"Assets: ₹{bs['assets']:.2f}", NORMAL),
         Paragraph(f"Liabilities: ₹{bs['liabilities']:.2f}", NORMAL),
@@ -135,41 +187,164 @@ def create_balance_sheet_pdf(output_path: str) -> str:
     return _save_pdf(output_path, elements)
 
 
+def create_balance_sheet_pdf(output_path: str) -> str:
+    return render_balance_sheet_pdf(balance_sheet_data(), output_path)
+
+
 # ------------------------------------------------------------
 # 4. Trial Balance PDF
 # ------------------------------------------------------------
 
-def create_trial_balance_pdf(output_path: str) -> str:
-    tb = acct.compute_trial_balance()
+def trial_balance_data() -> Dict[str, Any]:
+    return {"generated_at": _timestamp(), "trial_balance": acct.compute_trial_balance()}
+
+
+def render_trial_balance_pdf(data: Dict[str, Any], output_path: str) -> str:
+    from reportlab.platypus import Paragraph, Spacer
+
+    TITLE, _, NORMAL = _styles()
 
     elements = [
         Paragraph("XYLO — Trial Balance", TITLE),
-        Paragraph(f"Generated: {_timestamp()}", NORMAL),
+        Paragraph(f"Generated: {data['generated_at']}", NORMAL),
         Spacer(1, 12),
+        _tb_table(data["trial_balance"]),
     ]
 
-    tb_data = [["Account Code", "Account Name", "Type", "Debit", "Credit"]]
-    for row in tb:
-        tb_data.append([
-            row["account_code"],
-            row["account_name"],
-            row["type"],
-            f"{row['total_debit']:.2f}",
-            f"{row['total_credit']:.2f}",
-        ])
+    return _save_pdf(output_path, elements)
 
-    table = Table(tb_data)
-    table.setStyle(
-        TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ])
-    )
 
-    elements.append(table)
+def create_trial_balance_pdf(output_path: str) -> str:
+    return render_trial_balance_pdf(trial_balance_data(), output_path)
+
 
-    return _save_pdf(output_path, elements)
+# ------------------------------------------------------------
+# 5. Batch Rendering
+# ------------------------------------------------------------
+
+# report name -> (data fetcher, renderer)
+REPORTS: Dict[str, tuple] = {
+    "daily_summary": (daily_summary_data, render_daily_summary_pdf),
+    "pnl": (pnl_data, render_pnl_pdf),
+    "balance_sheet": (balance_sheet_data, render_balance_sheet_pdf),
+    "trial_balance": (trial_balance_data, render_trial_balance_pdf),
+}
+
+
+def _render_one(report: str, data: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    """Worker entry point: render one PDF from already-fetched data."""
+    started = time.perf_counter()
+    try:
+        REPORTS[report][1](data, output_path)
+        result = {"report": report, "output_path": output_path, "ok": True}
+    except Exception as e:
+        result = {"report": report, "output_path": output_path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def render_reports(
+    jobs: Iterable[Dict[str, Any]],
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Render many PDFs across a process pool; yields one result per job in
+    completion order:
+        {"report", "output_path", "ok": True, "seconds"}
+        {"report", "output_path", "ok": False, "error": "...", "seconds"}
+
+    Each job is {"report": one of REPORTS, "output_path": ..., "data": ...}.
+    Jobs without "data" share one fetch per report type, done here in the
+    parent (so the database is queried once, not once per PDF); pass "data"
+    (e.g. from trial_balance_data()) to render prefetched figures, such as one
+    set per tenant. Workers only lay out and write PDFs. At most 4 x workers
+    jobs are in flight, so 'jobs' may be a lazy iterator. workers=1 renders
+    on the calling thread. A job that cannot be prepared (unknown report, or
+    its data fetch fails) yields a failed result like any other. 'progress'
+    is called after each PDF with {"done", "failed", "last"}.
+    """
+    workers = workers or os.cpu_count() or 1
+    fetched: Dict[str, Dict[str, Any]] = {}
+    counts = {"done": 0, "failed": 0}
+
+    def _prepare(job):
+        # -> ((report, data, output_path), None), or (None, failed result)
+        report, output_path = job.get("report"), job.get("output_path")
+        try:
+            if report not in REPORTS:
+                raise ValueError(f"Unknown report '{report}' (expected one of: {', '.join(REPORTS)})")
+            data = job.get("data")
+            if data is None:
+                if report not in fetched:
+                    try:
+                        fetched[report] = REPORTS[report][0]()
+                    except Exception as e:
+                        fetched[report] = e  # fail the rest of this report's jobs without refetching
+                data = fetched[report]
+                if isinstance(data, Exception):
+                    raise data
+            return (report, data, output_path), None
+        except Exception as e:
+            return None, {"report": report, "output_path": output_path, "ok": False,
+                          "error": f"{type(e).__name__}: {e}", "seconds": None}
+
+    def _finish(result):
+        counts["done"] += 1
+        counts["failed"] += 0 if result["ok"] else 1
+        if progress:
+            progress(dict(counts, last=result))
+        return result
+
+    if workers == 1:
+        for job in jobs:
+            args, failed = _prepare(job)
+            yield _finish(failed or _render_one(*args))
+        return
+
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while True:
+            for job in jobs:
+                args, failed = _prepare(job)
+                if failed:
+                    yield _finish(failed)
+                    continue
+                pending[pool.submit(_render_one, *args)] = (args[0], args[2])
+                if len(pending) >= workers * 4:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report, output_path = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # worker crashed or data could not be pickled
+                    result = {"report": report, "output_path": output_path, "ok": False,
+                              "error": f"{type(e).__name__}: {e}", "seconds": None}
+                yield _finish(result)
+
+
+def render_reports_batch(
+    jobs: Iterable[Dict[str, Any]],
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    render_reports, collected: {"rendered", "failed", "seconds", "errors", "results"}.
+    """
+    started = time.perf_counter()
+    results = list(render_reports(jobs, workers=workers, progress=progress))
+    errors = [{"output_path": r["output_path"], "error": r["error"]} for r in results if not r["ok"]]
+    return {
+        "rendered": len(results) - len(errors),
+        "failed": len(errors),
+        "seconds": round(time.perf_counter() - started, 4),
+        "errors": errors,
+        "results": results,
+    }
 
 
 # ------------------------------------------------------------
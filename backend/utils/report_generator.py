@@ -11,7 +11,7 @@ This module generates:
 
 It integrates with:
 - accounting_engine (data source)
-- email_service (optional attachments)
+- email outbox (daily summary mail, optional attachments)
 - automation scheduler (daily/weekly tasks)
 
 Supports exporting:
@@ -185,6 +185,27 @@ def generate_and_save_daily_report(output_dir: str = "samples/generated_reports"
     }
 
 
+# ------------------------------------------------------------
+# 8. Email Delivery
+# ------------------------------------------------------------
+def email_daily_summary(to: str, attachments: Optional[List[str]] = None) -> Optional[int]:
+    """
+    Queues today's summary as an email (text body, optional report files
+    attached) in the outbox and returns its id. Delivery and retries happen
+    in the background, so a slow mail server never holds up the caller.
+    """
+    from backend.automation import outbox
+
+    summary = generate_daily_summary()
+    return outbox.enqueue_email(
+        to=to,
+        subject=f"XYLO Daily Summary — {summary['date']}",
+        body=format_daily_summary_text(summary),
+        attachments=attachments,
+        dedupe_key=f"daily_summary:{summary['date']}:{to}",
+    )
+
+
 # Demo
 if __name__ == "__main__":
     result = generate_and_save_daily_report()
@@ -0,0 +1,103 @@
+# benchmarks/bench_csv_import.py
+"""
+XYLO — CSV Import Benchmark
+
+Generates a synthetic bank statement and measures:
+- parse/validate throughput of the parallel importer for 1, 2, 4, 8 workers
+  (rows are consumed and discarded, so this isolates the CPU-bound part)
+- optionally (--write) end-to-end import into a throwaway SQLite database,
+  for both the streaming and the parallel importer
+
+Usage:
+    python benchmarks/bench_csv_import.py                 # 1M rows
+    python benchmarks/bench_csv_import.py --rows 10000000 --workers 1 2 4 8
+    python benchmarks/bench_csv_import.py --rows 200000 --write
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DESCRIPTIONS = [
+    "Sale - Retail Customer",
+    "Purchase - Office Supplies",
+    "Electricity Bill",
+    "Salary - Staff",
+    "Payment Received - Customer",
+    "Internet Bill",
+    "Refund Issued - Order",
+]
+
+
+def generate_statement(path: str, rows: int, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("date,description,amount,currency,source,reference\n")
+        for i in range(rows):
+            f.write(
+                f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d},"
+                f"{rnd.choice(DESCRIPTIONS)} {i},"
+                f"{rnd.uniform(-20000, 60000):.2f},INR,bank_import,REF-{i}\n"
+            )
+    return path
+
+
+def bench_parse(path: str, workers: int, chunk_bytes: int) -> float:
+    from backend.accounting_engine.importer import iter_parsed_chunks
+
+    t0 = time.perf_counter()
+    n = 0
+    for rows, _ in iter_parsed_chunks(path, workers=workers, chunk_bytes=chunk_bytes):
+        n += len(rows)
+    return time.perf_counter() - t0
+
+
+def bench_write(path: str, workers: int, tmp: str) -> dict:
+    import backend.accounting_engine.stubs as acct
+    from backend.accounting_engine import importer
+
+    results = {}
+    for label, fn in (
+        ("stream", lambda: importer.import_transactions_stream(path, batch_size=5000)),
+        (f"parallel x{workers}", lambda: importer.import_transactions_parallel(path, workers=workers, batch_size=5000)),
+    ):
+        acct.DB_PATH = os.path.join(tmp, f"bench_{label.replace(' ', '_')}.db")
+        t0 = time.perf_counter()
+        summary = fn()
+        results[label] = (time.perf_counter() - t0, summary["count"])
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--chunk-mb", type=float, default=8.0)
+    ap.add_argument("--write", action="store_true", help="also benchmark end-to-end DB import")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        t0 = time.perf_counter()
+        generate_statement(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"Generated {args.rows:,} rows ({size_mb:.1f} MB) in {time.perf_counter() - t0:.1f}s")
+        print(f"CPU cores available: {os.cpu_count()}\n")
+
+        chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+        base = None
+        print(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+        for w in args.workers:
+            elapsed = bench_parse(path, w, chunk_bytes)
+            base = base or elapsed
+            print(f"{w:>8} {elapsed:>9.2f} {args.rows / elapsed:>12,.0f} {base / elapsed:>7.2f}x")
+
+        if args.write:
+            print("\nEnd-to-end import (SQLite writer):")
+            for label, (elapsed, count) in bench_write(path, max(args.workers), tmp).items():
+                print(f"  {label:14s} {elapsed:8.2f}s  {count / elapsed:>10,.0f} rows/s")
@@ -0,0 +1,80 @@
+# benchmarks/bench_email_attachments.py
+"""
+XYLO — Shared Attachment Encoding Benchmark
+
+Builds the same daily summary email (one PDF-sized attachment) for N
+recipients and compares:
+- per-message: open, read and base64-encode the file for every message (what
+  build_message used to do)
+- cached: email_service.AttachmentCache encodes the file once and every
+  message attaches the same part
+
+Reports build time and the memory still held by the built messages
+(tracemalloc), which is what a bulk send keeps alive until delivery.
+
+Usage:
+    python benchmarks/bench_email_attachments.py
+    python benchmarks/bench_email_attachments.py --messages 500 --size-mb 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend.automation.email_service as emailer  # noqa: E402
+
+
+def per_message(i, path):
+    msg = EmailMessage()
+    msg["From"] = emailer.SENDER_EMAIL
+    msg["To"] = f"customer{i}@example.com"
+    msg["Subject"] = "XYLO Daily Summary"
+    msg.set_content("Please find today's summary attached.")
+    with open(path, "rb") as f:
+        msg.add_attachment(f.read(), maintype="application", subtype="octet-stream",
+                           filename=path.split("/")[-1])
+    return msg
+
+
+def cached(i, path, cache):
+    return emailer.build_message(f"customer{i}@example.com", "XYLO Daily Summary",
+                                 "Please find today's summary attached.", [path], attachment_cache=cache)
+
+
+def measure(build, n):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    messages = [build(i) for i in range(n)]
+    elapsed = time.perf_counter() - t0
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del messages
+    return elapsed, held, peak
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=200)
+    ap.add_argument("--size-mb", type=float, default=2.0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "daily_summary.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+
+        cache = emailer.AttachmentCache()
+        print(f"{args.messages} emails, one {args.size_mb:g} MB attachment each "
+              f"(tracemalloc on, so times are inflated for both modes)\n")
+        print(f"{'mode':14s} {'seconds':>8s} {'msgs/s':>8s} {'held MB':>8s} {'peak MB':>8s}")
+        for name, build in (("per-message", lambda i: per_message(i, path)),
+                            ("cached", lambda i: cached(i, path, cache))):
+            elapsed, held, peak = measure(build, args.messages)
+            print(f"{name:14s} {elapsed:>8.2f} {args.messages / elapsed:>8,.0f} {held / 1e6:>8.1f} {peak / 1e6:>8.1f}")
+        print(f"\ncache: {cache.stats()}")
@@ -0,0 +1,197 @@
+# benchmarks/bench_email_pool.py
+"""
+XYLO — Pooled SMTP Benchmark
+
+Sends a batch of reminder-sized emails to a local stand-in SMTP server (stdlib
+socketserver, implicit TLS like port 465 with a throwaway self-signed cert) and
+compares:
+- per-message: new SSL context, connect, TLS handshake, login, send and quit
+  for every email, one after another (what send_email used to do)
+- pooled, 1 connection: one session reused for the whole batch
+- pooled, N connections: email_service.SMTPPool.send_many
+
+The server can add a fixed delay before every reply (--rtt) to model the
+network round trip to a real relay, and can close each session after
+--max-per-conn messages with "421" to exercise the pool's reconnects.
+
+Usage:
+    python benchmarks/bench_email_pool.py
+    python benchmarks/bench_email_pool.py --messages 1000 --pool-size 8 --rtt 0.01
+    python benchmarks/bench_email_pool.py --no-tls
+"""
+
+import argparse
+import os
+import shutil
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend.automation.email_service as emailer  # noqa: E402
+
+
+# ------------------------------------------------------------
+# Stand-in SMTP server
+# ------------------------------------------------------------
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, context=None, rtt=0.0, max_per_conn=0):
+        super().__init__(address, SMTPHandler)
+        self.context = context
+        self.rtt = rtt
+        self.max_per_conn = max_per_conn
+        self.lock = threading.Lock()
+        self.counts = {"connections": 0, "logins": 0, "messages": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        if self.server.context is not None:
+            self.request = self.server.context.wrap_socket(self.request, server_side=True)
+        super().setup()
+
+    def reply(self, *lines):
+        if self.server.rtt:
+            time.sleep(self.server.rtt)
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        self.server.count("connections")
+        sent = 0
+        self.reply("220 standin ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("utf-8", "replace").strip().split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-standin", "250-AUTH PLAIN", "250 8BITMIME")
+            elif verb == "AUTH":
+                self.server.count("logins")
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                if self.server.max_per_conn and sent >= self.server.max_per_conn:
+                    self.reply("421 4.7.0 Too many messages, closing connection")
+                    return
+                self.reply("250 OK")
+            elif verb in ("HELO", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                sent += 1
+                self.server.count("messages")
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def self_signed_cert(directory):
+    """(certfile, keyfile) for localhost via the openssl CLI, or None if unavailable."""
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+         "-days", "1", "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+# ------------------------------------------------------------
+# Senders
+# ------------------------------------------------------------
+def reminder(i):
+    return emailer.build_message(
+        to=f"customer{i}@example.com",
+        subject=f"Payment Reminder — Invoice INV-{10000 + i}",
+        body=f"Dear Customer,\n\nYour payment for invoice INV-{10000 + i} is overdue by 14 days.\n\n"
+             f"Amount Due: ₹{1250 + i:.2f}\n\nRegards,\nXYLO Automated Reminder System\n",
+    )
+
+
+def per_message(messages, port, tls, cafile):
+    import smtplib
+
+    failed = 0
+    for msg in messages:
+        try:
+            if tls:
+                context = ssl.create_default_context(cafile=cafile)
+                server = smtplib.SMTP_SSL("localhost", port, context=context)
+            else:
+                server = smtplib.SMTP("localhost", port)
+            with server:
+                server.login("bench", "secret")
+                server.send_message(msg)
+        except Exception:
+            failed += 1
+    return failed
+
+
+def pooled(messages, port, tls, cafile, size):
+    context = ssl.create_default_context(cafile=cafile) if tls else None
+    with emailer.SMTPPool(size=size, host="localhost", port=port, username="bench", password="secret",
+                          use_ssl=tls, context=context) as pool:
+        errors = pool.send_many(messages)
+        return sum(1 for e in errors if e), pool.stats()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=500)
+    ap.add_argument("--pool-size", type=int, default=4)
+    ap.add_argument("--rtt", type=float, default=0.002, help="server delay before each reply, seconds")
+    ap.add_argument("--max-per-conn", type=int, default=200, help="server closes a session after this many messages (0 = never)")
+    ap.add_argument("--no-tls", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = None if args.no_tls else self_signed_cert(tmp)
+        tls = cert is not None
+        server_context = None
+        if tls:
+            server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            server_context.load_cert_chain(*cert)
+        server = StandInSMTPServer(("localhost", 0), server_context, args.rtt, args.max_per_conn)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cafile = cert[0] if tls else None
+
+        messages = [reminder(i) for i in range(args.messages)]
+        print(f"{args.messages} emails to a stand-in SMTP server ({'implicit TLS' if tls else 'plain'},"
+              f" {args.rtt * 1000:g} ms per reply, session closed every {args.max_per_conn or '∞'} messages)\n")
+        print(f"{'mode':28s} {'seconds':>8s} {'emails/s':>9s} {'failed':>7s} {'sessions':>9s} {'logins':>7s} {'reconnects':>11s}")
+
+        def row(name, run):
+            before = dict(server.counts)
+            t0 = time.perf_counter()
+            failed, stats = run()
+            elapsed = time.perf_counter() - t0
+            sessions = server.counts["connections"] - before["connections"]
+            logins = server.counts["logins"] - before["logins"]
+            reconnects = stats["reconnects"] if stats else "-"
+            print(f"{name:28s} {elapsed:>8.2f} {args.messages / elapsed:>9,.0f} {failed:>7d} {sessions:>9d} {logins:>7d} {reconnects:>11}")
+
+        row("per-message connect+login", lambda: (per_message(messages, port, tls, cafile), None))
+        row("pooled, 1 connection", lambda: pooled(messages, port, tls, cafile, 1))
+        row(f"pooled, {args.pool_size} connections", lambda: pooled(messages, port, tls, cafile, args.pool_size))
+        server.shutdown()
@@ -0,0 +1,105 @@
+# benchmarks/bench_invoice_extract.py
+"""
+XYLO — Invoice Field Extraction Throughput
+
+Measures invoices/second for field extraction over a synthetic text corpus:
+- legacy: the original four-scan extraction (one re.search per pattern per field,
+  plus a full-text .replace(",", "") copy for the amount)
+- single-pass: invoice_parser.extract_fields (one compiled finditer per text)
+
+Usage:
+    python benchmarks/bench_invoice_extract.py
+    python benchmarks/bench_invoice_extract.py --invoices 20000 --lines 200
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.automation.invoice_parser import extract_fields  # noqa: E402
+
+
+def make_invoice(rnd: random.Random, line_items: int):
+    """Returns (text, grand_total)."""
+    total = 0.0
+    lines = [
+        f"{rnd.choice(['ACME Traders', 'Sharma Electricals', 'Blue Fern Foods'])} Pvt Ltd",
+        f"Invoice No: INV-{rnd.randint(1000, 99999)}",
+        f"From: Vendor {rnd.randint(1, 500)}",
+        f"Invoice Date: {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025",
+        "",
+    ]
+    for i in range(line_items):
+        qty, price = rnd.randint(1, 20), rnd.uniform(10, 5000)
+        total += qty * price
+        lines.append(f"Item {i:03d} description of goods  {qty} x {price:,.2f}  {qty * price:,.2f}")
+    grand = round(total * 1.18, 2)
+    lines += ["", f"Sub Total: {total:,.2f}", f"Tax: {total * 0.18:,.2f}", f"Grand Total: Rs {grand:,.2f}"]
+    return "\n".join(lines), grand
+
+
+def legacy_extract(text: str) -> dict:
+    """The pre-optimisation extraction path, kept here as the baseline."""
+    inv = None
+    for p in [r"(INV[-\s]?\d+)", r"Invoice\s*No[:\s]*([A-Za-z0-9-]+)", r"Bill\s*#\s*([A-Za-z0-9-]+)"]:
+        m = re.search(p, text, flags=re.IGNORECASE)
+        if m:
+            inv = m.group(1)
+            break
+    date = None
+    for p in [r"(\d{2}/\d{2}/\d{4})", r"(\d{4}-\d{2}-\d{2})", r"(\d{2}-\d{2}-\d{4})"]:
+        m = re.search(p, text)
+        if m:
+            try:
+                date = datetime.fromisoformat(m.group(1).replace("/", "-")).date().isoformat()
+                break
+            except Exception:
+                continue
+    vendor = None
+    for ln in text.split("\n"):
+        if ln.lower().startswith(("from", "vendor", "supplier")):
+            vendor = ln.split(":", 1)[-1].strip()
+            break
+    m = re.search(r"(\d+\.\d+|\d+)", text.replace(",", ""))
+    amount = float(m.group(1)) if m else None
+    return {"invoice_number": inv, "date": date, "vendor": vendor, "amount": amount}
+
+
+def bench(fn, corpus, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return len(corpus) / best
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--invoices", type=int, default=5000)
+    ap.add_argument("--lines", type=int, default=30, help="line items per invoice")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    labelled = [make_invoice(rnd, args.lines) for _ in range(args.invoices)]
+    corpus = [text for text, _ in labelled]
+    avg_kb = sum(map(len, corpus)) / len(corpus) / 1024
+    print(f"Corpus: {args.invoices:,} invoices, ~{avg_kb:.1f} KB each\n")
+
+    def amount_accuracy(fn):
+        return sum(abs((fn(text)["amount"] or 0) - grand) < 0.005 for text, grand in labelled) / len(labelled)
+
+    legacy = bench(legacy_extract, corpus, args.repeat)
+    single = bench(extract_fields, corpus, args.repeat)
+    print(f"{'':20s} {'invoices/s':>10s}   amount accuracy")
+    print(f"{'legacy (4 scans)':20s} {legacy:>10,.0f}   {amount_accuracy(legacy_extract):6.1%}")
+    print(f"{'single-pass':20s} {single:>10,.0f}   {amount_accuracy(extract_fields):6.1%}   ({single / legacy:.2f}x)")
@@ -0,0 +1,127 @@
+# benchmarks/bench_invoice_parser.py
+"""
+XYLO — Invoice Parser Benchmark & Accuracy Harness
+
+Runs invoice_parser.parse_invoice over a labelled corpus (see invoice_corpus.py)
+and reports:
+- throughput (files/s) and p50 / p99 / max latency, per format
+- per-field accuracy (invoice_number, date, vendor, amount), overall and per layout
+
+The PDF text cache is off unless --cache is given, so every run measures real
+extraction. Runs offline.
+
+Usage:
+    python benchmarks/bench_invoice_parser.py                      # generates 500 invoices in a temp dir
+    python benchmarks/bench_invoice_parser.py --corpus out/corpus  # reuse a generated corpus
+    python benchmarks/bench_invoice_parser.py --stream-pages --show-misses 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIELDS = ("invoice_number", "date", "vendor", "amount")
+
+
+def field_matches(field: str, parsed: Any, expected: Any) -> bool:
+    if field == "amount":
+        return parsed is not None and abs(float(parsed) - float(expected)) < 0.005
+    return parsed == expected
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run(corpus_dir: str, labels: List[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    from backend.automation.invoice_parser import parse_invoice
+
+    latencies = defaultdict(list)
+    correct = defaultdict(lambda: defaultdict(int))
+    totals = defaultdict(int)
+    misses = []
+
+    started = time.perf_counter()
+    for label in labels:
+        path = os.path.join(corpus_dir, label["file"])
+        t0 = time.perf_counter()
+        parsed = parse_invoice(path, **options)
+        latencies[label["format"]].append(time.perf_counter() - t0)
+
+        totals[label["layout"]] += 1
+        for field in FIELDS:
+            if field_matches(field, parsed[field], label[field]):
+                correct[label["layout"]][field] += 1
+            else:
+                misses.append((label["file"], field, parsed[field], label[field]))
+    elapsed = time.perf_counter() - started
+
+    return {"elapsed": elapsed, "latencies": latencies, "correct": correct, "totals": totals, "misses": misses}
+
+
+def report(result: Dict[str, Any], count: int, show_misses: int):
+    print(f"Parsed {count} files in {result['elapsed']:.2f}s ({count / result['elapsed']:,.1f} files/s)\n")
+
+    print(f"{'format':8s} {'files':>6s} {'files/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    rows = sorted(result["latencies"].items())
+    rows.append(("all", [t for _, values in rows for t in values]))
+    for fmt, values in rows:
+        values = sorted(values)
+        print(
+            f"{fmt:8s} {len(values):>6d} {len(values) / sum(values):>9,.1f}"
+            f" {percentile(values, 50) * 1000:>8.2f} {percentile(values, 99) * 1000:>8.2f} {values[-1] * 1000:>8.2f}"
+        )
+
+    print(f"\n{'layout':12s} {'files':>6s} " + " ".join(f"{f:>15s}" for f in FIELDS))
+    overall = defaultdict(int)
+    for layout in sorted(result["totals"]):
+        n = result["totals"][layout]
+        row = []
+        for field in FIELDS:
+            hits = result["correct"][layout][field]
+            overall[field] += hits
+            row.append(f"{hits / n:>15.1%}")
+        print(f"{layout:12s} {n:>6d} " + " ".join(row))
+    print(f"{'ALL':12s} {count:>6d} " + " ".join(f"{overall[f] / count:>15.1%}" for f in FIELDS))
+
+    if show_misses:
+        print("\nSample misses (file, field, parsed, expected):")
+        for miss in result["misses"][:show_misses]:
+            print("  ", miss)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default=None, help="corpus directory with labels.jsonl (default: generate one)")
+    ap.add_argument("--count", type=int, default=500, help="invoices to generate when --corpus is not given")
+    ap.add_argument("--pdf-ratio", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--stream-pages", action="store_true", help="parse PDFs page by page with early exit")
+    ap.add_argument("--cache", action="store_true", help="leave the PDF text cache enabled")
+    ap.add_argument("--show-misses", type=int, default=0)
+    args = ap.parse_args()
+
+    if not args.cache:
+        os.environ["XYLO_TEXT_CACHE_MAX_MB"] = "0"  # read before invoice_parser is imported
+
+    from invoice_corpus import generate_corpus, load_labels  # noqa: E402
+
+    options = {"stream_pages": args.stream_pages}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(tmp, "corpus")
+            t0 = time.perf_counter()
+            generate_corpus(corpus, args.count, args.pdf_ratio, args.seed)
+            print(f"Generated {args.count} invoices in {time.perf_counter() - t0:.1f}s")
+        labels = load_labels(corpus)
+        report(run(corpus, labels, options), len(labels), args.show_misses)
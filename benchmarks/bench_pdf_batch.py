@@ -0,0 +1,87 @@
+# benchmarks/bench_pdf_batch.py
+"""
+XYLO — Batch PDF Rendering Benchmark
+
+Renders a month-end batch of reports (daily summary, P&L, balance sheet and
+trial balance per tenant) with pdf_generator.render_reports and compares
+worker counts against the serial baseline (workers=1, the calling thread).
+
+Tenant figures are synthetic and prefetched, passed as each job's "data", so
+the timings only cover ReportLab layout and writing the files. --accounts
+sets the trial balance size per tenant (more rows, more pages, more CPU).
+Scaling is bounded by the number of cores: on a single-core machine every
+worker count takes about as long as the serial run.
+
+Usage:
+    python benchmarks/bench_pdf_batch.py
+    python benchmarks/bench_pdf_batch.py --tenants 200 --accounts 120 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils import pdf_generator as pdf  # noqa: E402
+
+TYPES = ("asset", "liability", "equity", "income", "expense")
+
+
+def tenant_data(tenant: int, accounts: int) -> dict:
+    rnd = random.Random(tenant)
+    tb = [
+        {
+            "account_code": f"{1000 + 10 * i}",
+            "account_name": f"Account {i} — tenant {tenant}",
+            "type": TYPES[i % len(TYPES)],
+            "total_debit": round(rnd.uniform(0, 1e6), 2),
+            "total_credit": round(rnd.uniform(0, 1e6), 2),
+        }
+        for i in range(accounts)
+    ]
+    income, expense = round(rnd.uniform(1e5, 1e7), 2), round(rnd.uniform(1e5, 1e7), 2)
+    pnl = {"income": income, "expense": expense, "profit": round(income - expense, 2)}
+    bs = {"assets": 1e6, "liabilities": 4e5, "equity": 6e5, "reconciles": 0.0}
+    stamp = "2025-01-31 23:59:59"
+    return {
+        "daily_summary": {"date": "2025-01-31", "generated_at": stamp, "pnl": pnl, "trial_balance": tb},
+        "pnl": {"generated_at": stamp, "pnl": pnl},
+        "balance_sheet": {"generated_at": stamp, "balance_sheet": bs},
+        "trial_balance": {"generated_at": stamp, "trial_balance": tb},
+    }
+
+
+def jobs_for(tenants: int, accounts: int, out_dir: str) -> list:
+    jobs = []
+    for t in range(tenants):
+        for report, data in tenant_data(t, accounts).items():
+            jobs.append({"report": report, "output_path": os.path.join(out_dir, f"tenant{t:04d}_{report}.pdf"), "data": data})
+    return jobs
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tenants", type=int, default=50)
+    ap.add_argument("--accounts", type=int, default=80, help="trial balance rows per tenant")
+    ap.add_argument("--workers", default=",".join(str(w) for w in sorted({1, 2, 4, cpus}) if w <= max(cpus, 2)),
+                    help="comma-separated worker counts (1 = serial on the calling thread)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        jobs = jobs_for(args.tenants, args.accounts, out_dir)
+        print(f"{len(jobs)} PDFs ({args.tenants} tenants x 4 reports, {args.accounts} trial balance rows), {cpus} CPU(s)\n")
+        print(f"{'workers':>7s} {'seconds':>8s} {'PDFs/s':>7s} {'speedup':>8s} {'failed':>7s}")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            t0 = time.perf_counter()
+            summary = pdf.render_reports_batch(jobs, workers=workers)
+            elapsed = time.perf_counter() - t0
+            baseline = baseline or elapsed
+            print(f"{workers:>7d} {elapsed:>8.2f} {len(jobs) / elapsed:>7.1f} {baseline / elapsed:>7.2f}x {summary['failed']:>7d}")
+            if summary["errors"]:
+                print(f"        first error: {summary['errors'][0]}")
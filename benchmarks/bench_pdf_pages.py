@@ -0,0 +1,112 @@
+# benchmarks/bench_pdf_pages.py
+"""
+XYLO — Page-Streaming PDF Extraction Benchmark
+
+Generates long (default 100-page) statement PDFs with ReportLab — header fields
+on page 1, transaction lines in between with a "Page Total" subtotal on every
+page, the statement total (labelled "Grand Total" or just "Total") on the last
+page — and compares
+per-document latency of:
+- full:        extract_text_from_pdf + extract_fields (decodes every page)
+- stream:      parse_invoice(stream_pages=True), stops once all fields are found
+- first/last:  parse_invoice(first_pages=1, last_pages=1)
+
+The text cache is disabled so every run decodes the PDF. Fields are checked
+against the generated ground truth; the page subtotals check that pages read
+out of order (page 1, last, then the middle) still give the document's total.
+
+Usage:
+    python benchmarks/bench_pdf_pages.py
+    python benchmarks/bench_pdf_pages.py --docs 10 --pages 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["XYLO_TEXT_CACHE_MAX_MB"] = "0"
+
+from backend.automation import invoice_parser as parser  # noqa: E402
+
+
+def make_statement(path: str, pages: int, rnd: random.Random) -> dict:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    number = f"INV-{rnd.randint(10000, 99999)}"
+    vendor = f"Vendor {rnd.randint(1, 500)} Traders"
+    day, month = rnd.randint(1, 28), rnd.randint(1, 12)
+    c = canvas.Canvas(path, pagesize=A4)
+    header = ["Statement of Account", f"Invoice No: {number}", f"From: {vendor}", f"Invoice Date: {day:02d}/{month:02d}/2025"]
+    for i, line in enumerate(header):
+        c.drawString(50, 800 - 14 * i, line)
+
+    total = 0.0
+    for page in range(pages):
+        if page:
+            c.showPage()
+        page_total = 0.0
+        for row in range(45 if page else 40):
+            amount = rnd.uniform(10, 9000)
+            page_total += amount
+            y = 730 - 15 * row if not page else 800 - 15 * row
+            c.drawString(50, y, f"2025-{month:02d}-{rnd.randint(1, 28):02d}  Txn {page:03d}-{row:02d} card purchase  {amount:,.2f}")
+        total += page_total
+        c.drawString(50, 80, f"Page Total: Rs {page_total:,.2f}")
+    grand = round(total, 2)
+    c.drawString(50, 60, f"{rnd.choice(['Grand Total', 'Total'])}: Rs {grand:,.2f}")
+    c.save()
+    return {"invoice_number": number, "vendor": vendor, "date": f"2025-{month:02d}-{day:02d}", "amount": grand}
+
+
+def full_parse(path: str) -> dict:
+    return parser.extract_fields(parser.extract_text_from_pdf(path, use_cache=False))
+
+
+MODES = {
+    "full": full_parse,
+    "stream": lambda p: parser.parse_invoice(p, stream_pages=True),
+    "first/last 1": lambda p: parser.parse_invoice(p, first_pages=1, last_pages=1),
+}
+
+
+def correct(fields: dict, truth: dict) -> bool:
+    return (
+        fields["invoice_number"] == truth["invoice_number"]
+        and fields["vendor"] == truth["vendor"]
+        and fields["date"] == truth["date"]
+        and abs((fields["amount"] or 0) - truth["amount"]) < 0.005
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5)
+    ap.add_argument("--pages", type=int, default=100)
+    args = ap.parse_args()
+
+    rnd = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"statement_{i}.pdf")
+            docs.append((path, make_statement(path, args.pages, rnd)))
+        print(f"Corpus: {args.docs} statements x {args.pages} pages\n")
+
+        print(f"{'mode':14s} {'p50 ms':>9s} {'max ms':>9s} {'correct':>8s} {'speedup':>8s}")
+        base = None
+        for label, fn in MODES.items():
+            times, ok = [], 0
+            for path, truth in docs:
+                t0 = time.perf_counter()
+                fields = fn(path)
+                times.append((time.perf_counter() - t0) * 1000)
+                ok += correct(fields, truth)
+            p50 = statistics.median(times)
+            base = base or p50
+            print(f"{label:14s} {p50:>9.1f} {max(times):>9.1f} {ok:>5d}/{len(docs):<2d} {base / p50:>7.1f}x")
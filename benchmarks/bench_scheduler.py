@@ -0,0 +1,97 @@
+# benchmarks/bench_scheduler.py
+"""
+XYLO — Scheduler Scaling Benchmark
+
+Registers N tasks (default 100k) and measures:
+- registration time (schedules are parsed once, at register_task)
+- dispatch throughput for a wave of N due tasks
+- idle CPU of the scheduler thread while nothing is due
+- scheduling lag of the wave (start time minus due time, from get_metrics),
+  which is where an undersized pool shows up
+- persisting the wave's run history, and restoring persisted state for every
+  task at start (one query + one heapify)
+- for comparison, the CPU cost of one sweep of the old 1-second polling loop
+  (re-parse every schedule string + datetime.now() per task)
+
+Task leases (two SQLite commits per run) are off unless --leases is given; see
+bench_scheduler_leases.py for their cost under multi-process contention.
+
+Usage:
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --tasks 100000 --idle 10
+    python benchmarks/bench_scheduler.py --tasks 5000 --leases
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("XYLO_DB", os.path.join(tempfile.mkdtemp(), "bench_scheduler.db"))
+os.environ["XYLO_SCHEDULER_LEASES"] = "1" if "--leases" in sys.argv else "0"  # read at import
+
+import backend.automation.scheduler as scheduler  # noqa: E402
+
+
+def legacy_sweep(tasks: int) -> float:
+    """CPU seconds for one pass of the pre-heap polling loop over 'tasks' interval tasks."""
+    registry = {f"t{i}": {"schedule": "interval@86400", "last_run": datetime.now()} for i in range(tasks)}
+    t0 = time.process_time()
+    for task in registry.values():
+        _, seconds = task["schedule"].split("@")
+        _ = datetime.now() >= task["last_run"] + scheduler.timedelta(seconds=int(seconds))
+    return time.process_time() - t0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=100_000)
+    ap.add_argument("--idle", type=float, default=5.0, help="seconds to sample idle CPU")
+    ap.add_argument("--leases", action="store_true", help="take a task lease for every run")
+    args = ap.parse_args()
+
+    fired = []
+    for name in list(scheduler.TASK_REGISTRY):
+        scheduler.unregister_task(name)
+
+    t0 = time.perf_counter()
+    for i in range(args.tasks):
+        scheduler.register_task(f"tenant_{i}", "interval@86400", lambda: fired.append(1))
+    reg = time.perf_counter() - t0
+    print(f"register_task x{args.tasks:,}: {reg:.2f}s ({args.tasks / reg:,.0f}/s)")
+
+    t0 = time.perf_counter()
+    scheduler.start_scheduler()
+    while len(fired) < args.tasks:
+        time.sleep(0.01)
+    wave = time.perf_counter() - t0
+    print(f"dispatch wave of {args.tasks:,} due tasks: {wave:.2f}s ({args.tasks / wave:,.0f} tasks/s)")
+
+    metrics = scheduler.get_metrics()
+    lags = sorted(m["lag_seconds"]["max"] for m in metrics["tasks"].values() if m["lag_seconds"]["count"])
+    if lags:
+        print(
+            f"wave lag over {metrics['scheduler']['workers']} {metrics['scheduler']['executor']} workers:"
+            f" p50 {lags[len(lags) // 2] * 1000:.0f} ms, max {lags[-1] * 1000:.0f} ms"
+        )
+
+    t0 = time.perf_counter()
+    scheduler.flush_state()
+    print(f"persist run history: {time.perf_counter() - t0:.2f}s after the wave (batched writer)")
+
+    t0 = time.perf_counter()
+    scheduler.restore_state()
+    restore = time.perf_counter() - t0
+    print(f"restore_state for {len(scheduler.TASK_REGISTRY):,} tasks: {restore * 1000:.0f} ms")
+
+    time.sleep(0.5)  # let the last reschedules settle
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(args.idle)
+    idle_cpu = time.process_time() - cpu0
+    print(f"idle: {idle_cpu * 1000:.1f} ms CPU over {time.perf_counter() - wall0:.1f}s ({idle_cpu / args.idle:.3%} of a core)")
+
+    sweep = legacy_sweep(args.tasks)
+    print(f"legacy 1s polling: {sweep * 1000:.0f} ms CPU per sweep ({min(sweep, 1.0):.1%} of a core at 1 sweep/s)")
@@ -0,0 +1,166 @@
+# benchmarks/bench_scheduler_leases.py
+"""
+XYLO — Scheduler Lease Contention Benchmark
+
+Starts N processes that act like API replicas each running the scheduler, all
+sharing one SQLite database, and measures:
+- contention: every process fires the same slots of the same tasks at the
+  same moment (one slot every --interval seconds, or back to back with 0) and
+  calls acquire_lease / release_lease around each run. Checks that each slot
+  is run by exactly one process and reports acquire latency (p50 / p99) and
+  lease operations per second
+- renewal and stale takeover: one process takes a short lease, renews it for a
+  while, then dies without releasing it. Another process polls for it. Checks
+  that it never gets the lease while the holder is alive and reports how long
+  after the crash the takeover happened (bounded by the TTL)
+
+Usage:
+    python benchmarks/bench_scheduler_leases.py
+    python benchmarks/bench_scheduler_leases.py --procs 8 --slots 200 --tasks 5
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("XYLO_DB", os.path.join(tempfile.mkdtemp(), "bench_leases.db"))
+
+BASE_SLOT = datetime(2025, 1, 1, 22, 0)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(pct / 100 * len(sorted_values)))]
+
+
+def replica(index, tasks, slots, interval, ttl, barrier, results):
+    import backend.automation.scheduler as scheduler
+
+    owner = f"replica-{index}"
+    won, latencies, errors = [], [], 0
+    barrier.wait()
+    start = time.perf_counter()
+    for n in range(slots):
+        delay = start + n * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)  # every replica fires slot n at the same moment
+        slot = (BASE_SLOT + timedelta(minutes=n)).isoformat()
+        for task in tasks:
+            t0 = time.perf_counter()
+            try:
+                acquired = scheduler.acquire_lease(task, slot, None, owner, ttl)
+            except sqlite3.OperationalError:  # database locked past the busy timeout
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+            if acquired:
+                won.append((task, n))
+                scheduler.release_lease(task, owner)
+    results.put((index, won, latencies, errors))
+
+
+def holder(ttl, hold, results):
+    import backend.automation.scheduler as scheduler
+
+    assert scheduler.acquire_lease("takeover", None, None, "holder", ttl)
+    results.put(("acquired", time.time()))
+    until = time.time() + hold
+    while time.time() < until:
+        time.sleep(ttl / 3)
+        scheduler.renew_leases("holder", ["takeover"], ttl)
+    results.put(("crashed", time.time()))
+    results.close()
+    results.join_thread()  # flush the queue before dying
+    os._exit(0)  # no release, like a killed worker
+
+
+def contender(ttl, timeout, results):
+    import backend.automation.scheduler as scheduler
+
+    until = time.time() + timeout
+    while time.time() < until:
+        if scheduler.acquire_lease("takeover", None, None, "contender", ttl):
+            results.put(("taken_over", time.time()))
+            return
+        time.sleep(0.02)
+    results.put(("taken_over", None))
+
+
+def contention(ctx, procs, tasks, slots, interval, ttl):
+    barrier, results = ctx.Barrier(procs + 1), ctx.Queue()
+    workers = [ctx.Process(target=replica, args=(i, tasks, slots, interval, ttl, barrier, results)) for i in range(procs)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    collected = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - t0
+    for w in workers:
+        w.join()
+
+    runs = Counter(run for _, won, _, _ in collected for run in won)
+    latencies = sorted(t for _, _, lat, _ in collected for t in lat)
+    errors = sum(e for _, _, _, e in collected)
+    per_replica = {i: len(won) for i, won, _, _ in sorted(collected)}
+    total = len(tasks) * slots
+    duplicates = sum(1 for n in runs.values() if n > 1)
+
+    print(f"{procs} processes x {len(tasks)} tasks x {slots} slots ({total:,} slots, {len(latencies):,} acquire attempts)")
+    print(f"  slots run once: {sum(1 for n in runs.values() if n == 1):,}   run twice or more: {duplicates}"
+          f"   not run (a later slot was already claimed): {total - len(runs):,}")
+    print(f"  runs per process: {per_replica}")
+    print(f"  acquire latency: p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms,"
+          f" max {latencies[-1] * 1000:.2f} ms" if latencies else "  no successful lease operations")
+    print(f"  {len(latencies) / elapsed:,.0f} acquire attempts/s over {elapsed:.2f}s, {errors} 'database is locked' errors")
+    return duplicates == 0
+
+
+def takeover(ctx, ttl, hold):
+    results = ctx.Queue()
+    h = ctx.Process(target=holder, args=(ttl, hold, results))
+    h.start()
+    assert results.get()[0] == "acquired"
+    c = ctx.Process(target=contender, args=(ttl, hold + ttl * 5, results))
+    c.start()
+    events = dict(results.get() for _ in range(2))
+    h.join()
+    c.join()
+
+    crashed, taken = events["crashed"], events["taken_over"]
+    print(f"renewal + takeover (TTL {ttl:g}s, holder renews for {hold:g}s then dies)")
+    if taken is None:
+        print("  contender never got the lease")
+        return False
+    early = taken < crashed
+    print(f"  taken over {taken - crashed:+.2f}s after the crash"
+          f" ({'BEFORE the holder died' if early else 'holder kept it while alive'})")
+    return not early
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--tasks", type=int, default=3)
+    ap.add_argument("--slots", type=int, default=200)
+    ap.add_argument("--interval", type=float, default=0.02, help="seconds between slots (0 = back to back)")
+    ap.add_argument("--ttl", type=float, default=1.0, help="lease TTL for the takeover check, seconds")
+    ap.add_argument("--hold", type=float, default=3.0, help="seconds the holder renews before dying")
+    args = ap.parse_args()
+
+    import backend.accounting_engine.stubs as acct
+
+    acct._ensure_schema()
+    ctx = mp.get_context("spawn")  # fresh interpreters, like separate uvicorn workers
+    tasks = [f"task_{i}" for i in range(args.tasks)]
+    ok = contention(ctx, args.procs, tasks, args.slots, args.interval, ttl=60)
+    print()
+    ok = takeover(ctx, args.ttl, args.hold) and ok
+    sys.exit(0 if ok else 1)
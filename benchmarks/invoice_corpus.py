@@ -0,0 +1,177 @@
+# benchmarks/invoice_corpus.py
+"""
+XYLO — Synthetic Invoice Corpus Generator
+
+Writes labelled synthetic invoices (plain text and PDF) for measuring
+invoice_parser accuracy and speed. Fully offline: text is generated locally and
+PDFs are drawn with ReportLab.
+
+Variety covered:
+- layouts: labelled header, bill, INV-prefixed, minimal, receipt, statement
+- date formats: 05/06/2025, 2025-06-05, 05-06-2025, 05.06.2025,
+  5 Jun 2025, Jun 5, 2025
+- number formats: 1,200.00 / 1200.50 / Rs 1240.50 / INR 1,240 / ₹ 1,240.50 / $ 99.00
+- vendor labels: "From:", "From", "Vendor:", "Vendor Name:", "Supplier:",
+  "Supplier Details:"
+- distractors: line items, sub totals, tax lines, due dates, page breaks,
+  lines that start with a vendor keyword inside a longer word ("Fromage ...")
+
+Ground truth goes to labels.jsonl (one JSON object per file):
+    {"file", "format", "layout", "invoice_number", "date", "vendor", "amount"}
+Fields a layout never states (e.g. a receipt with no vendor line) are still
+labelled with the true value, so parser misses show up as accuracy loss.
+
+Usage:
+    python benchmarks/invoice_corpus.py out/corpus --count 500 --pdf-ratio 0.3
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+VENDORS = ["ACME Traders", "Sharma Electricals", "Blue Fern Foods", "Northwind Supplies", "Kaveri Textiles", "Orbit Logistics"]
+ITEMS = ["Copper wire 2.5mm", "A4 paper ream", "Basmati rice 25kg", "LED panel 18W", "Freight charges", "Packing material"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+DATE_FORMATS = [
+    lambda d: d.strftime("%d/%m/%Y"),
+    lambda d: d.isoformat(),
+    lambda d: d.strftime("%d-%m-%Y"),
+    lambda d: d.strftime("%d.%m.%Y"),
+    lambda d: f"{d.day} {MONTHS[d.month - 1]} {d.year}",
+    lambda d: f"{MONTHS[d.month - 1]} {d.day}, {d.year}",
+]
+
+# PDF text uses the standard Helvetica font, which has no ₹ glyph
+AMOUNT_FORMATS = [
+    ("{:,.2f}", True),
+    ("{:.2f}", True),
+    ("Rs {:.2f}", True),
+    ("Rs. {:,.2f}", True),
+    ("INR {:,.2f}", True),
+    ("₹ {:,.2f}", False),
+    ("$ {:,.2f}", True),
+]
+
+LINES_PER_PAGE = 48
+
+
+def _amount(rnd: random.Random, value: float, pdf: bool) -> str:
+    fmt = rnd.choice([f for f, pdf_ok in AMOUNT_FORMATS if pdf_ok or not pdf])
+    return fmt.format(value)
+
+
+def _items(rnd: random.Random, count: int, pdf: bool) -> Tuple[List[str], float]:
+    lines, subtotal = [], 0.0
+    for i in range(count):
+        qty, price = rnd.randint(1, 12), round(rnd.uniform(5, 4000), 2)
+        subtotal += qty * price
+        lines.append(f"{i + 1:>3}. {rnd.choice(ITEMS):24s} {qty:>3} x {price:,.2f}   {qty * price:,.2f}")
+    return lines, round(subtotal, 2)
+
+
+def make_invoice(rnd: random.Random, pdf: bool = False, items: int = 0) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Returns (lines, labels) for one synthetic invoice.
+    """
+    vendor = rnd.choice(VENDORS) + rnd.choice(["", " Pvt Ltd", " & Co"])
+    issued = date(rnd.choice([2024, 2025]), rnd.randint(1, 12), rnd.randint(1, 28))
+    due = date.fromordinal(issued.toordinal() + rnd.choice([7, 15, 30]))
+    fmt_date = rnd.choice(DATE_FORMATS)
+    item_lines, subtotal = _items(rnd, items or rnd.randint(3, 25), pdf)
+    tax = round(subtotal * rnd.choice([0.05, 0.12, 0.18]), 2)
+    total = round(subtotal + tax, 2)
+    layout = rnd.choice(["labelled", "bill", "inv_prefix", "minimal", "receipt", "statement"])
+
+    if layout == "labelled":
+        number = str(rnd.randint(1000, 999999))
+        head = [f"{vendor}", "TAX INVOICE", f"Invoice No: {number}", "Fromage Deli catering order ref: 1142",
+                f"From: {vendor}", f"Invoice Date: {fmt_date(issued)}", f"Due Date: {fmt_date(due)}"]
+        foot = [f"Sub Total: {subtotal:,.2f}", f"GST: {tax:,.2f}", f"Grand Total: {_amount(rnd, total, pdf)}"]
+    elif layout == "bill":
+        number = f"B-{rnd.randint(100, 99999):05d}"
+        head = [f"Bill # {number}", f"{rnd.choice(['Supplier', 'Supplier Details'])}: {vendor}", f"Bill Date: {fmt_date(issued)}"]
+        foot = [f"Tax: {tax:,.2f}", f"Amount Due: {_amount(rnd, total, pdf)}"]
+    elif layout == "inv_prefix":
+        number = f"INV-{rnd.randint(1000, 99999)}"
+        head = [f"{number}", f"{rnd.choice(['Vendor', 'Vendor Name'])}: {vendor}", f"Date: {fmt_date(issued)}"]
+        foot = [f"Total Amount: {_amount(rnd, total, pdf)}"]
+    elif layout == "minimal":
+        number = str(rnd.randint(10, 9999))
+        head = [f"Invoice # {number}", f"From {vendor}", f"{fmt_date(issued)}"]
+        foot = [f"Balance Due: {_amount(rnd, total, pdf)}"]
+    elif layout == "receipt":
+        number = f"INV{rnd.randint(100, 9999)}"
+        head = [f"RECEIPT {number}", f"{vendor}", f"{fmt_date(issued)}"]
+        item_lines = item_lines[:1]
+        total = subtotal = round(float(item_lines[0].rsplit(" ", 1)[1].replace(",", "")), 2)
+        foot = [f"Amount: {_amount(rnd, total, pdf)}"]
+    else:  # statement: long, totals at the very end
+        number = f"INV-{rnd.randint(1000, 99999)}"
+        head = ["STATEMENT OF ACCOUNT", f"Invoice No: {number}", f"From: {vendor}", f"Invoice Date: {fmt_date(issued)}"]
+        item_lines, subtotal = _items(rnd, items or rnd.randint(60, 200), pdf)
+        tax = round(subtotal * 0.18, 2)
+        total = round(subtotal + tax, 2)
+        foot = [f"Sub Total: {subtotal:,.2f}", f"Tax: {tax:,.2f}", f"Grand Total: {_amount(rnd, total, pdf)}"]
+
+    lines = head + [""] + item_lines + [""] + foot + ["", "Thank you for your business."]
+    labels = {"layout": layout, "invoice_number": number, "date": issued.isoformat(), "vendor": vendor, "amount": total}
+    return lines, labels
+
+
+def write_pdf(path: str, lines: List[str]):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for i, line in enumerate(lines):
+        if i and i % LINES_PER_PAGE == 0:
+            c.showPage()
+        c.drawString(50, 800 - 15 * (i % LINES_PER_PAGE), line)
+    c.save()
+
+
+def generate_corpus(out_dir: str, count: int, pdf_ratio: float = 0.3, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Writes 'count' invoices plus labels.jsonl into out_dir; returns the labels.
+    """
+    rnd = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    labels = []
+    for i in range(count):
+        pdf = rnd.random() < pdf_ratio
+        lines, label = make_invoice(rnd, pdf=pdf)
+        name = f"invoice_{i:05d}.{'pdf' if pdf else 'txt'}"
+        path = os.path.join(out_dir, name)
+        if pdf:
+            write_pdf(path, lines)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        labels.append(dict(file=name, format="pdf" if pdf else "txt", **label))
+
+    with open(os.path.join(out_dir, "labels.jsonl"), "w", encoding="utf-8") as f:
+        for label in labels:
+            f.write(json.dumps(label, ensure_ascii=False) + "\n")
+    return labels
+
+
+def load_labels(corpus_dir: str) -> List[Dict[str, Any]]:
+    with open(os.path.join(corpus_dir, "labels.jsonl"), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate a labelled synthetic invoice corpus.")
+    ap.add_argument("out_dir")
+    ap.add_argument("--count", type=int, default=500)
+    ap.add_argument("--pdf-ratio", type=float, default=0.3, help="fraction of invoices written as PDF")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    written = generate_corpus(args.out_dir, args.count, args.pdf_ratio, args.seed)
+    pdfs = sum(1 for label in written if label["format"] == "pdf")
+    print(f"Wrote {len(written)} invoices ({pdfs} PDF) + labels.jsonl to {args.out_dir}")
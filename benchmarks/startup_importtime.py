@@ -0,0 +1,107 @@
+# benchmarks/startup_importtime.py
+"""
+XYLO — API Cold Start Budget
+
+Runs `python -X importtime` on the API entry modules in a fresh interpreter and
+fails (exit code 1) if:
+- the cumulative import time of any module exceeds its budget
+- a heavy optional dependency (ReportLab, PyPDF2) is imported at startup
+- importing creates the SQLite database (DB init belongs in the lifespan hook)
+
+Usage:
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --scale 2 --runs 5
+
+Timings are the best (minimum) of several runs to keep the check stable on
+noisy CI machines. Scale all budgets with --scale or XYLO_STARTUP_BUDGET_SCALE
+on slower hardware.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that an API worker imports on boot -> cumulative import budget (ms).
+# backend.api.main is dominated by FastAPI/Pydantic; the rest should be near-free.
+BUDGETS_MS = {
+    "backend.api.main": 1000.0,
+    "backend.api.adapter_accounting": 100.0,
+    "backend.api.invoice_adapter": 100.0,
+    "backend.utils.pdf_generator": 100.0,
+}
+
+# Must only be imported on first use
+LAZY_MODULES = ["reportlab", "PyPDF2"]
+
+DEFAULT_SCALE = float(os.environ.get("XYLO_STARTUP_BUDGET_SCALE", "1.0"))
+
+
+def _measure(module: str, db_path: str) -> Dict[str, int]:
+    """
+    Imports 'module' in a fresh interpreter; returns {module_name: cumulative_us}.
+    """
+    env = dict(os.environ, XYLO_DB=db_path, PYTHONPATH=REPO_ROOT)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |   cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cumulative_us, name = [p.strip() for p in line.replace("import time:", "|", 1).split("|")]
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def run(scale: float, runs: int) -> List[str]:
+    failures = []
+    for module, budget_ms in BUDGETS_MS.items():
+        budget_ms *= scale
+        best_us = None
+        loaded = set()
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "startup_check.db")
+            for _ in range(runs):
+                timings = _measure(module, db_path)
+                best_us = timings[module] if best_us is None else min(best_us, timings[module])
+                loaded.update(timings)
+            db_created = os.path.exists(db_path)
+
+        eager = [m for m in LAZY_MODULES if m in loaded]
+        print(f"{module:40s} {best_us / 1000:8.1f} ms  (budget {budget_ms:.0f} ms)")
+
+        if best_us / 1000 > budget_ms:
+            failures.append(f"{module} took {best_us / 1000:.1f} ms (budget {budget_ms:.0f} ms)")
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+        if db_created:
+            failures.append(f"{module} touches the database at import time")
+    return failures
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fail if API cold start regresses.")
+    ap.add_argument("--scale", type=float, default=DEFAULT_SCALE, help="multiply every budget by this factor")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    problems = run(args.scale, args.runs)
+    if problems:
+        print("\nCold start regression:")
+        for p in problems:
+            print(f"- {p}")
+        sys.exit(1)
+    print("\nCold start OK.")